@@ -0,0 +1,178 @@
+"""
+Benchmark for the group balances computation.
+Seeds a group with many expenses and compares query count and latency
+of the previous per-member loop against the aggregate balance engine
+and the group_member_balances ledger read.
+
+Usage:
+    python benchmark_balances.py [--expenses 10000] [--members 4] [--database-url sqlite:///./benchmark.db]
+
+Never point --database-url at the production database: the script
+creates its own tables and seed data.
+"""
+import argparse
+import random
+import sys
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.user import User
+from models.expense import (
+    Expense, ExpenseGroup, GroupMember, ExpenseParticipant, GroupMemberBalance, DivisionType, ExpenseTag
+)
+from schemas.expense import Balance
+from utils.balances import compute_group_balances, read_group_balances
+
+
+def legacy_group_balances(db, group_id):
+    """Per-member loop used by GET /groups/{group_id}/balances before the aggregate engine"""
+    members = db.query(GroupMember).filter(GroupMember.group_id == group_id).all()
+
+    balances = []
+    for member in members:
+        user = db.query(User).filter(User.id == member.user_id).first()
+
+        total_paid = db.query(Expense).filter(
+            Expense.group_id == group_id,
+            Expense.paid_by_id == member.user_id
+        ).with_entities(Expense.importo).all()
+        total_paid_sum = sum([expense[0] for expense in total_paid])
+
+        participants = db.query(ExpenseParticipant).join(Expense).filter(
+            Expense.group_id == group_id,
+            ExpenseParticipant.user_id == member.user_id
+        ).all()
+
+        total_owed_sum = 0
+        for participant in participants:
+            expense = db.query(Expense).filter(Expense.id == participant.expense_id).first()
+            if expense.division_type == "Uguale":
+                num_participants = len(expense.participants)
+                total_owed_sum += expense.importo / num_participants
+            elif expense.division_type == "Importi esatti":
+                total_owed_sum += participant.importo or 0
+            elif expense.division_type == "Percentuale":
+                total_owed_sum += (expense.importo * (participant.percentuale or 0)) / 100
+
+        balances.append(Balance(
+            user_id=member.user_id,
+            user_name=f"{user.nome} {user.cognome}",
+            total_paid=total_paid_sum,
+            total_owed=total_owed_sum,
+            balance=total_paid_sum - total_owed_sum
+        ))
+
+    return balances
+
+
+def seed(db, num_expenses, num_members):
+    """Create a group with num_members users and num_expenses mixed expenses"""
+    users = [
+        User(email=f"bench{i}@example.com", nome=f"Utente{i}", cognome="Benchmark", hashed_password="x")
+        for i in range(num_members)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    group = ExpenseGroup(nome="Casa", descrizione="Benchmark", creator_id=users[0].id)
+    db.add(group)
+    db.flush()
+    db.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+
+    tags = [tag.value for tag in ExpenseTag]
+    division_types = list(DivisionType)
+    for i in range(num_expenses):
+        division_type = division_types[i % len(division_types)]
+        importo = round(random.uniform(5, 500), 2)
+        expense = Expense(
+            descrizione=f"Spesa {i}",
+            importo=importo,
+            tag=random.choice(tags),
+            division_type=division_type,
+            paid_by_id=random.choice(users).id,
+            group_id=group.id
+        )
+        if division_type == DivisionType.IMPORTI_ESATTI:
+            quota = importo / num_members
+            expense.participants = [ExpenseParticipant(user_id=user.id, importo=quota) for user in users]
+        elif division_type == DivisionType.PERCENTUALE:
+            expense.participants = [ExpenseParticipant(user_id=user.id, percentuale=100 / num_members) for user in users]
+        else:
+            expense.participants = [ExpenseParticipant(user_id=user.id) for user in users]
+        db.add(expense)
+
+        if i % 1000 == 999:
+            db.flush()
+
+    db.flush()
+
+    # Fill the ledger as the expense write paths would have done
+    for balance in compute_group_balances(db, group.id):
+        db.add(GroupMemberBalance(
+            group_id=group.id,
+            user_id=balance.user_id,
+            total_paid=balance.total_paid,
+            total_owed=balance.total_owed
+        ))
+
+    db.commit()
+    return group.id
+
+
+def measure(engine, session_factory, label, func, group_id):
+    """Run func once and report latency and number of SQL statements"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    db = session_factory()
+    try:
+        start = time.perf_counter()
+        result = func(db, group_id)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    print(f"{label:<12} {len(statements):>8} queries {elapsed * 1000:>12.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group balances")
+    parser.add_argument("--expenses", type=int, default=10000)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--database-url", default="sqlite:///./benchmark_balances.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    print(f"Seeding group with {args.expenses} expenses and {args.members} members...")
+    db = session_factory()
+    try:
+        group_id = seed(db, args.expenses, args.members)
+    finally:
+        db.close()
+
+    legacy = measure(engine, session_factory, "legacy", legacy_group_balances, group_id)
+    aggregate = measure(engine, session_factory, "aggregate", compute_group_balances, group_id)
+    ledger = measure(engine, session_factory, "ledger", read_group_balances, group_id)
+
+    for current in (aggregate, ledger):
+        for old, new in zip(legacy, current):
+            if old.user_id != new.user_id or abs(old.balance - new.balance) > 0.01:
+                print(f"✗ Mismatch for user {old.user_id}: {old.balance:.2f} != {new.balance:.2f}")
+                return 1
+
+    print("✓ Results match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
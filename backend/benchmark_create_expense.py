@@ -0,0 +1,103 @@
+"""
+Statement count check for the create_expense write path.
+Creates expenses with a growing number of participants on a throwaway database
+and verifies that the number of SQL statements per call does not grow with them.
+
+Usage:
+    python benchmark_create_expense.py [--members 20] [--database-url sqlite:///./benchmark_create_expense.db]
+
+Never point --database-url at the production database: the script
+drops and recreates all tables.
+"""
+import argparse
+import sys
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.user import User
+from models.expense import ExpenseGroup, GroupMember, ExpenseTag, DivisionType
+from schemas.expense import ExpenseCreate
+from routers.expenses import create_expense
+
+
+def new_expense(group_id, payer_id, participant_ids):
+    return ExpenseCreate(
+        descrizione="Spesa",
+        importo=100,
+        tag=ExpenseTag.ALTRO,
+        division_type=DivisionType.UGUALE,
+        paid_by_id=payer_id,
+        group_id=group_id,
+        participants=[{"user_id": user_id} for user_id in participant_ids]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that create_expense issues a constant number of statements")
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--database-url", default="sqlite:///./benchmark_create_expense.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    try:
+        users = [
+            User(email=f"bench{i}@example.com", nome=f"Utente{i}", cognome="Benchmark", hashed_password="x")
+            for i in range(args.members)
+        ]
+        db.add_all(users)
+        db.flush()
+        group = ExpenseGroup(nome="Casa", creator_id=users[0].id)
+        db.add(group)
+        db.flush()
+        db.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+        db.commit()
+        group_id = group.id
+        user_ids = [user.id for user in users]
+    finally:
+        db.close()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = session_factory()
+    try:
+        current_user = db.query(User).filter(User.id == user_ids[0]).first()
+
+        # Warm up: the first expense creates the ledger and rollup rows of every member
+        create_expense(new_expense(group_id, user_ids[0], user_ids), db=db, current_user=current_user)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        counts = {}
+        for num_participants in sorted({1, 2, args.members // 2, args.members}):
+            statements.clear()
+            start = time.perf_counter()
+            create_expense(
+                new_expense(group_id, user_ids[0], user_ids[:num_participants]),
+                db=db,
+                current_user=current_user
+            )
+            elapsed = time.perf_counter() - start
+            counts[num_participants] = len(statements)
+            print(f"{num_participants:>4} participants   {len(statements):>3} statements   {elapsed * 1000:7.1f} ms")
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        db.close()
+
+    if len(set(counts.values())) == 1:
+        print("✓ Statement count does not depend on the number of participants")
+        return 0
+
+    print("✗ Statement count grows with the number of participants")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
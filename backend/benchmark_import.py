@@ -0,0 +1,103 @@
+"""
+Throughput benchmark for the bulk expense import.
+Generates synthetic CSV rows and imports them into a throwaway database,
+reporting rows per second and the number of SQL statements issued.
+
+Usage:
+    python benchmark_import.py [--rows 10000] [--members 4] [--database-url sqlite:///./benchmark_import.db]
+
+Never point --database-url at the production database: the script
+drops and recreates all tables.
+"""
+import argparse
+import io
+import random
+import sys
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.user import User
+from models.expense import ExpenseGroup, GroupMember, ExpenseTag, DivisionType
+from utils.expense_import import import_expenses, read_csv_rows, BATCH_SIZE
+
+
+def generate_csv(num_rows, user_ids):
+    """Synthetic CSV export with a mix of division types and a few invalid rows"""
+    lines = ["descrizione,importo,tag,division_type,paid_by_id,participants,created_at"]
+    tags = [tag.value for tag in ExpenseTag]
+    for i in range(num_rows):
+        division_type = list(DivisionType)[i % 3]
+        importo = round(random.uniform(5, 500), 2)
+        if division_type == DivisionType.IMPORTI_ESATTI:
+            participants = ";".join(f"{user_id}:{importo / len(user_ids):.2f}" for user_id in user_ids)
+        elif division_type == DivisionType.PERCENTUALE:
+            participants = ";".join(f"{user_id}:{100 / len(user_ids)}" for user_id in user_ids)
+        else:
+            participants = ";".join(str(user_id) for user_id in user_ids)
+        # One row in a thousand has an invalid amount, to exercise the error report
+        amount = "n/a" if i % 1000 == 999 else str(importo)
+        lines.append(
+            f"Spesa {i},{amount},{random.choice(tags)},{division_type.value},"
+            f"{random.choice(user_ids)},{participants},2024-01-01T12:00:00"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk expense import")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--database-url", default="sqlite:///./benchmark_import.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    try:
+        users = [
+            User(email=f"bench{i}@example.com", nome=f"Utente{i}", cognome="Benchmark", hashed_password="x")
+            for i in range(args.members)
+        ]
+        db.add_all(users)
+        db.flush()
+        group = ExpenseGroup(nome="Casa", creator_id=users[0].id)
+        db.add(group)
+        db.flush()
+        db.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+        db.commit()
+        group_id = group.id
+        user_ids = [user.id for user in users]
+    finally:
+        db.close()
+
+    data = generate_csv(args.rows, user_ids)
+    print(f"Importing {args.rows} rows ({len(data) / 1024:.0f} KiB) with batch size {args.batch_size}...")
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    db = session_factory()
+    try:
+        start = time.perf_counter()
+        result = import_expenses(db, group_id, read_csv_rows(io.StringIO(data)), batch_size=args.batch_size)
+        db.commit()
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    print(f"Imported {result.imported}, failed {result.failed}")
+    print(f"{len(statements)} SQL statements, {elapsed:.2f}s, {args.rows / elapsed:.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,6 +28,10 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: Optional[str] = ""
     GOOGLE_REDIRECT_URI: Optional[str] = None
 
+    # Expense receipts
+    RECEIPT_STORAGE_DIR: str = "./uploads/receipts"
+    RECEIPT_MAX_SIZE: int = 15 * 1024 * 1024  # 15 MB
+
     @model_validator(mode='after')
     def set_redirect_uri(self):
         # Auto-configure redirect URI based on backend URL if not set
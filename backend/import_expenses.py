@@ -0,0 +1,92 @@
+"""
+Import expenses into a group from a CSV or NDJSON file.
+Rows are validated against ExpenseCreate and inserted in batches
+inside a single transaction; invalid rows are reported and skipped.
+
+Usage:
+    python import_expenses.py <group_id> <file> --user-email <email> [--format csv|ndjson] [--dry-run]
+
+CSV columns: descrizione, importo, tag, division_type, paid_by_id, participants, created_at
+(participants: "1;2;3" or "1:20;2:30" for exact amounts / percentages)
+"""
+import argparse
+import sys
+import time
+from database import SessionLocal
+from models.user import User
+from models.expense import ExpenseGroup, GroupMember
+from utils.expense_import import import_expenses, read_csv_rows, read_ndjson_rows, BATCH_SIZE
+from utils.notifications import notify_expense_group_members
+from utils.settlement import settlement_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import expenses into a group")
+    parser.add_argument("group_id", type=int)
+    parser.add_argument("file")
+    parser.add_argument("--user-email", required=True, help="Member performing the import")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, do not insert")
+    args = parser.parse_args()
+
+    file_format = args.format or ("ndjson" if args.file.lower().endswith((".ndjson", ".jsonl")) else "csv")
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == args.user_email).first()
+        group = db.query(ExpenseGroup).filter(ExpenseGroup.id == args.group_id).first()
+        if not user or not group:
+            print("✗ User or group not found")
+            return 1
+
+        is_member = db.query(GroupMember).filter(
+            GroupMember.group_id == group.id,
+            GroupMember.user_id == user.id
+        ).first()
+        if not is_member:
+            print(f"✗ {user.email} is not a member of '{group.nome}'")
+            return 1
+
+        print(f"Importing {args.file} ({file_format}) into '{group.nome}'...")
+        start = time.perf_counter()
+        with open(args.file, encoding="utf-8-sig", newline="") as stream:
+            rows = read_ndjson_rows(stream) if file_format == "ndjson" else read_csv_rows(stream)
+            result = import_expenses(db, group.id, rows, batch_size=args.batch_size, dry_run=args.dry_run)
+
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        elapsed = time.perf_counter() - start
+
+        for error in result.errors:
+            print(f"  Row {error.row}: {error.error}")
+
+        total = result.imported + result.failed
+        print(f"\n{'Validated' if args.dry_run else 'Imported'} {result.imported} expenses, {result.failed} rows failed")
+        print(f"{total} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s)")
+
+        if not args.dry_run and result.imported:
+            settlement_cache.invalidate(group.id)
+            notify_expense_group_members(
+                db=db,
+                group_id=group.id,
+                notification_type="expense_group",
+                title="Spese importate",
+                message=f"{user.nome} ha importato {result.imported} spese in '{group.nome}'",
+                exclude_user_id=user.id
+            )
+
+        return 0 if result.failed == 0 else 2
+
+    except Exception as e:
+        print(f"✗ Import failed: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,6 +6,8 @@ from starlette.middleware.sessions import SessionMiddleware
 from database import engine, Base
 from routers import auth, users, expenses, shopping_lists, gym, notifications, oauth
 from config import settings
+from utils.recurring import run_scheduler
+from utils.thumbnails import shutdown_thumbnail_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -17,23 +20,65 @@ except Exception as e:
     print(f"Migration warning: {e}")
 
 try:
-    from migrate_expense_tags import migrate_tags
-    migrate_tags()
+    from migrate_tag_table import migrate as migrate_tag_table
+    migrate_tag_table()
 except Exception as e:
     print(f"Migration warning (expense tags): {e}")
 
-try:
-    from fix_tag_case import fix_tag_case
-    fix_tag_case()
-except Exception as e:
-    print(f"Migration warning (fix tag case): {e}")
-
 try:
     from migrate_workout_days import migrate as migrate_workout_days
     migrate_workout_days()
 except Exception as e:
     print(f"Migration warning (workout days): {e}")
 
+try:
+    from migrate_item_names import migrate as migrate_item_names
+    migrate_item_names()
+except Exception as e:
+    print(f"Migration warning (shopping item names): {e}")
+
+try:
+    from migrate_list_versions import migrate as migrate_list_versions
+    migrate_list_versions()
+except Exception as e:
+    print(f"Migration warning (shopping list versions): {e}")
+
+try:
+    from migrate_item_timestamps import migrate as migrate_item_timestamps
+    migrate_item_timestamps()
+except Exception as e:
+    print(f"Migration warning (shopping item timestamps): {e}")
+
+try:
+    from migrate_foreign_keys import migrate as migrate_foreign_keys
+    migrate_foreign_keys()
+except Exception as e:
+    print(f"Migration warning (foreign key cascades): {e}")
+
+try:
+    from migrate_indexes import migrate as migrate_indexes
+    migrate_indexes()
+except Exception as e:
+    print(f"Migration warning (indexes): {e}")
+
+try:
+    from migrate_search_indexes import migrate as migrate_search_indexes
+    migrate_search_indexes()
+except Exception as e:
+    print(f"Migration warning (search indexes): {e}")
+
+try:
+    from rebuild_balances import migrate as migrate_balance_ledger
+    migrate_balance_ledger()
+except Exception as e:
+    print(f"Migration warning (balance ledger): {e}")
+
+try:
+    from rebuild_analytics import migrate as migrate_analytics_rollup
+    migrate_analytics_rollup()
+except Exception as e:
+    print(f"Migration warning (analytics rollup): {e}")
+
 app = FastAPI(
     title="Gestionale API",
     description="API per la gestione di spese, liste della spesa e schede palestra",
@@ -64,6 +109,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -75,6 +121,15 @@ app.include_router(shopping_lists.router, prefix="/api/shopping-lists", tags=["L
 app.include_router(gym.router, prefix="/api/gym", tags=["Schede Palestra"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["Notifiche"])
 
+@app.on_event("startup")
+async def start_recurring_expenses():
+    """Create recurring expenses that fell due while the instance was asleep, then keep checking"""
+    app.state.recurring_scheduler = asyncio.create_task(run_scheduler())
+
+@app.on_event("shutdown")
+def stop_thumbnail_workers():
+    shutdown_thumbnail_pool()
+
 @app.get("/")
 def read_root():
     return {
@@ -0,0 +1,55 @@
+"""
+Migration script for the ON DELETE CASCADE foreign keys.
+Groups, expenses, shopping lists, workout cards and days are deleted with a single
+DELETE (passive_deletes=True on their relationships): their children are removed by
+the database, so every foreign key declared with ondelete="CASCADE" on the models is
+recreated with it here. PostgreSQL only: SQLite can't alter a constraint, and its
+tables get the cascades from Base.metadata.create_all.
+"""
+import sys
+from sqlalchemy import inspect, text
+from database import engine, Base
+import models  # noqa: F401 - register all models with Base
+
+
+def migrate():
+    """Run the migration. Safe to call at every boot."""
+    if engine.dialect.name != "postgresql":
+        print("✓ Foreign key cascades are altered on PostgreSQL only. Skipping.")
+        return
+
+    inspector = inspect(engine)
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for foreign_key in table.foreign_keys:
+                if foreign_key.ondelete != "CASCADE":
+                    continue
+
+                column_name = foreign_key.parent.name
+                existing = [
+                    existing_key for existing_key in inspector.get_foreign_keys(table.name)
+                    if existing_key["constrained_columns"] == [column_name]
+                ]
+                if any(existing_key["options"].get("ondelete", "").upper() == "CASCADE" for existing_key in existing):
+                    print(f"✓ {table.name}.{column_name} already cascades. Skipping.")
+                    continue
+
+                print(f"Adding ON DELETE CASCADE to {table.name}.{column_name}...")
+                for existing_key in existing:
+                    connection.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{existing_key["name"]}"'))
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT {table.name}_{column_name}_fkey "
+                    f"FOREIGN KEY ({column_name}) REFERENCES {foreign_key.column.table.name}({foreign_key.column.name}) "
+                    f"ON DELETE CASCADE"
+                ))
+                print(f"✓ {table.name}.{column_name} cascades")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
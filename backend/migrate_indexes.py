@@ -0,0 +1,41 @@
+"""
+Migration script to create indexes declared on the models.
+Base.metadata.create_all only creates indexes together with new tables,
+so indexes added later to existing tables are created here.
+"""
+from sqlalchemy import inspect
+from database import engine, Base
+import models  # noqa: F401 - register all models with Base
+
+# Indexes added after their table already existed in production
+INDEXES = [
+    ("expenses", "ix_expenses_group_created_id"),
+    ("expense_participants", "ix_expense_participants_user_expense"),
+    ("expenses", "ix_expenses_group_tag"),
+    ("shopping_lists", "ix_shopping_lists_owner_id"),
+    ("shopping_items", "ix_shopping_items_shopping_list_id"),
+    ("shared_lists", "ix_shared_lists_user_list"),
+    ("shopping_items", "ix_shopping_items_to_buy"),
+]
+
+
+def migrate():
+    """Create any missing index listed in INDEXES"""
+    inspector = inspect(engine)
+
+    for table_name, index_name in INDEXES:
+        table = Base.metadata.tables[table_name]
+        index = next(index for index in table.indexes if index.name == index_name)
+
+        existing = {existing_index["name"] for existing_index in inspector.get_indexes(table_name)}
+        if index_name in existing:
+            print(f"✓ Index {index_name} already exists. Skipping.")
+            continue
+
+        print(f"Creating index {index_name} on {table_name}...")
+        index.create(bind=engine)
+        print(f"✓ Index {index_name} created")
+
+
+if __name__ == "__main__":
+    migrate()
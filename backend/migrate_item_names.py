@@ -0,0 +1,77 @@
+"""
+Migration script to add shopping_items.normalized_name and its unique index.
+Fills the column with normalize_item_name(nome), computed in Python since
+accent stripping has no portable SQL equivalent. Items that were already
+duplicates in a list (the old ilike check was racy and ignored accents) are
+kept: the extra copies get a key suffixed with their id, so nothing is lost
+and the first copy (open items first) stays the one new additions clash with.
+Edits that keep the name key (e.g. only quantita or the case changed) keep the
+suffixed key; renaming to another name gives the copy a regular key.
+"""
+import sys
+from sqlalchemy import inspect, text
+from database import engine
+from models.shopping import ShoppingItem, normalize_item_name
+
+INDEX_NAME = "uq_shopping_items_list_name"
+
+
+def migrate():
+    """Run the migration. Safe to call at every boot."""
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("shopping_items")}
+    indexes = {index["name"] for index in inspector.get_indexes("shopping_items")}
+
+    if "normalized_name" in columns and INDEX_NAME in indexes:
+        print("✓ Shopping item names already normalized. Skipping migration.")
+        return
+
+    with engine.begin() as connection:
+        if "normalized_name" not in columns:
+            print("Adding normalized_name to shopping_items...")
+            connection.execute(text("ALTER TABLE shopping_items ADD COLUMN normalized_name VARCHAR"))
+
+        rows = connection.execute(text(
+            "SELECT id, shopping_list_id, nome, normalized_name FROM shopping_items "
+            "ORDER BY shopping_list_id, normalized_name IS NULL, completato, id"
+        )).all()
+
+        seen = set()
+        updates = []
+        duplicates = 0
+        for item_id, list_id, nome, normalized_name in rows:
+            if normalized_name is not None:
+                seen.add((list_id, normalized_name))
+                continue
+
+            key = normalize_item_name(nome)
+            if (list_id, key) in seen:
+                key = f"{key}#{item_id}"
+                duplicates += 1
+            seen.add((list_id, key))
+            updates.append({"id": item_id, "normalized_name": key})
+
+        if updates:
+            connection.execute(
+                text("UPDATE shopping_items SET normalized_name = :normalized_name WHERE id = :id"),
+                updates
+            )
+            print(f"✓ Normalized {len(updates)} item names ({duplicates} existing duplicates kept)")
+
+        if engine.dialect.name == "postgresql":
+            connection.execute(text("ALTER TABLE shopping_items ALTER COLUMN normalized_name SET NOT NULL"))
+
+    if INDEX_NAME not in indexes:
+        print(f"Creating index {INDEX_NAME}...")
+        index = next(index for index in ShoppingItem.__table__.indexes if index.name == INDEX_NAME)
+        index.create(bind=engine)
+        print(f"✓ Index {INDEX_NAME} created")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,36 @@
+"""
+Migration script for the offline replay of shopping lists.
+Adds shopping_items.completato_changed_at and quantita_changed_at, left NULL for
+existing rows: any replayed change wins over a value never changed since then.
+The shopping_client_mutations table is created by Base.metadata.create_all.
+"""
+import sys
+from sqlalchemy import inspect, text
+from database import engine
+
+COLUMNS = ["completato_changed_at", "quantita_changed_at"]
+
+
+def migrate():
+    """Run the migration. Safe to call at every boot."""
+    inspector = inspect(engine)
+    existing = {column["name"] for column in inspector.get_columns("shopping_items")}
+
+    with engine.begin() as connection:
+        for column_name in COLUMNS:
+            if column_name in existing:
+                print(f"✓ shopping_items.{column_name} already exists. Skipping.")
+                continue
+
+            print(f"Adding {column_name} to shopping_items...")
+            connection.execute(text(f"ALTER TABLE shopping_items ADD COLUMN {column_name} TIMESTAMP WITH TIME ZONE"))
+            print(f"✓ shopping_items.{column_name} added")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,49 @@
+"""
+Migration script for delta sync of shopping lists.
+Adds shopping_lists.version and shopping_items.list_version (0 for existing rows:
+clients start with a full sync anyway) and the index used by GET /{id}/changes.
+Also adds shopping_items.version, checked by item updates for optimistic concurrency.
+The shopping_item_tombstones table is created by Base.metadata.create_all.
+"""
+import sys
+from sqlalchemy import inspect, text
+from database import engine
+from models.shopping import ShoppingItem
+
+INDEX_NAME = "ix_shopping_items_list_version"
+
+COLUMNS = [
+    ("shopping_lists", "version"),
+    ("shopping_items", "list_version"),
+    ("shopping_items", "version"),
+]
+
+
+def migrate():
+    """Run the migration. Safe to call at every boot."""
+    inspector = inspect(engine)
+
+    with engine.begin() as connection:
+        for table_name, column_name in COLUMNS:
+            if column_name in {column["name"] for column in inspector.get_columns(table_name)}:
+                print(f"✓ {table_name}.{column_name} already exists. Skipping.")
+                continue
+
+            print(f"Adding {column_name} to {table_name}...")
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} INTEGER NOT NULL DEFAULT 0"))
+            print(f"✓ {table_name}.{column_name} added")
+
+    if INDEX_NAME not in {index["name"] for index in inspector.get_indexes("shopping_items")}:
+        print(f"Creating index {INDEX_NAME}...")
+        index = next(index for index in ShoppingItem.__table__.indexes if index.name == INDEX_NAME)
+        index.create(bind=engine)
+        print(f"✓ Index {INDEX_NAME} created")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,44 @@
+"""
+Migration script to create the indexes used by GET /expenses/search.
+PostgreSQL only: enables pg_trgm and creates GIN indexes for the full-text
+search on expense descriptions and the trigram matches on descriptions and
+group names. On other databases search falls back to LIKE and needs no index.
+"""
+from sqlalchemy import text
+from database import engine
+from utils.search import TEXT_SEARCH_CONFIG
+
+SEARCH_INDEXES = [
+    (
+        "ix_expenses_descrizione_fts",
+        f"CREATE INDEX IF NOT EXISTS ix_expenses_descrizione_fts ON expenses "
+        f"USING gin (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(descrizione, '')))"
+    ),
+    (
+        "ix_expenses_descrizione_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_expenses_descrizione_trgm ON expenses "
+        "USING gin (descrizione gin_trgm_ops)"
+    ),
+    (
+        "ix_expense_groups_nome_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_expense_groups_nome_trgm ON expense_groups "
+        "USING gin (nome gin_trgm_ops)"
+    ),
+]
+
+
+def migrate():
+    """Create the search indexes. Safe to call at every boot."""
+    if engine.dialect.name != "postgresql":
+        print("✓ Search indexes are PostgreSQL only. Skipping.")
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for index_name, statement in SEARCH_INDEXES:
+            connection.execute(text(statement))
+            print(f"✓ Index {index_name} ready")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,85 @@
+"""
+Migration script to move expense tags into the expense_tags table.
+Seeds the canonical tags, converts expenses.tag (free text, any case,
+legacy names) into expenses.tag_id once, then drops the old column.
+Replaces the boot-time rescans of migrate_expense_tags.py and fix_tag_case.py.
+"""
+import sys
+from sqlalchemy import inspect, text
+from database import engine, SessionLocal
+from models.expense import Tag, ExpenseMonthlyTotal, ExpenseTag, TAG_IDS, LEGACY_TAGS
+
+
+def seed_tags():
+    """Insert any canonical tag missing from expense_tags"""
+    db = SessionLocal()
+    try:
+        existing = {position for (position,) in db.query(Tag.id)}
+        missing = [Tag(id=position, nome=tag.value) for tag, position in TAG_IDS.items() if position not in existing]
+        if missing:
+            db.add_all(missing)
+            db.commit()
+            print(f"✓ Added {len(missing)} tags to expense_tags")
+    finally:
+        db.close()
+
+
+def migrate():
+    """Run the migration. Safe to call at every boot: it only rescans on the first run."""
+    seed_tags()
+
+    inspector = inspect(engine)
+    expense_columns = {column["name"] for column in inspector.get_columns("expenses")}
+
+    if "tag" not in expense_columns:
+        print("✓ Expense tags already use expense_tags. Skipping migration.")
+    else:
+        print("Converting expense tags to expense_tags ids...")
+        is_postgres = engine.dialect.name == "postgresql"
+        names = {tag.value.lower(): tag for tag in ExpenseTag}
+        names.update(LEGACY_TAGS)
+
+        with engine.begin() as connection:
+            if "tag_id" not in expense_columns:
+                connection.execute(text("ALTER TABLE expenses ADD COLUMN tag_id INTEGER REFERENCES expense_tags(id)"))
+
+            # The old column may still be the PostgreSQL expensetag ENUM: compare as text
+            for name, tag in names.items():
+                result = connection.execute(
+                    text("UPDATE expenses SET tag_id = :tag_id WHERE tag_id IS NULL AND LOWER(CAST(tag AS VARCHAR)) = :name"),
+                    {"tag_id": TAG_IDS[tag], "name": name}
+                )
+                if result.rowcount:
+                    print(f"  '{name}' → {tag.value}: {result.rowcount} expenses")
+
+            result = connection.execute(
+                text("UPDATE expenses SET tag_id = :tag_id WHERE tag_id IS NULL"),
+                {"tag_id": TAG_IDS[ExpenseTag.ALTRO]}
+            )
+            if result.rowcount:
+                print(f"  Unknown tags → {ExpenseTag.ALTRO.value}: {result.rowcount} expenses")
+
+            if is_postgres:
+                connection.execute(text("ALTER TABLE expenses ALTER COLUMN tag_id SET NOT NULL"))
+            connection.execute(text("ALTER TABLE expenses DROP COLUMN tag"))
+            if is_postgres:
+                connection.execute(text("DROP TYPE IF EXISTS expensetag"))
+
+        print("✓ Expense tags converted")
+
+    # The analytics rollup is derived data: recreate it with tag ids, rebuild_analytics refills it
+    rollup_columns = {column["name"] for column in inspector.get_columns("expense_monthly_totals")}
+    if "tag" in rollup_columns:
+        print("Recreating expense_monthly_totals with tag ids...")
+        ExpenseMonthlyTotal.__table__.drop(bind=engine)
+        ExpenseMonthlyTotal.__table__.create(bind=engine)
+        print("✓ expense_monthly_totals recreated")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
@@ -1,17 +1,28 @@
 from .user import User
-from .expense import Expense, ExpenseGroup, GroupMember, ExpenseParticipant
-from .shopping import ShoppingList, ShoppingItem, SharedList
+from .expense import (
+    Tag, Expense, ExpenseGroup, GroupMember, ExpenseParticipant, ExpenseReceipt, GroupMemberBalance, ExpenseMonthlyTotal,
+    RecurringExpense, RecurringExpenseParticipant
+)
+from .shopping import ShoppingList, ShoppingItem, ShoppingItemTombstone, ShoppingClientMutation, SharedList
 from .gym import WorkoutCard, Exercise
 from .notification import Notification
 
 __all__ = [
     "User",
+    "Tag",
     "Expense",
     "ExpenseGroup",
     "GroupMember",
     "ExpenseParticipant",
+    "ExpenseReceipt",
+    "GroupMemberBalance",
+    "ExpenseMonthlyTotal",
+    "RecurringExpense",
+    "RecurringExpenseParticipant",
     "ShoppingList",
     "ShoppingItem",
+    "ShoppingItemTombstone",
+    "ShoppingClientMutation",
     "SharedList",
     "WorkoutCard",
     "Exercise",
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import event, Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from datetime import datetime, timezone
 import enum
 import secrets
 
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
 class ExpenseTag(str, enum.Enum):
     BOLLETTA_ACQUA = "Bolletta Acqua"
     BOLLETTA_LUCE = "Bolletta Luce"
@@ -19,11 +23,56 @@ class ExpenseTag(str, enum.Enum):
     SVAGO = "Svago/Intrattenimento"
     ALTRO = "Altro"
 
+# Canonical tag ids, stored in expense_tags: new tags are appended, never reordered
+TAG_IDS = {tag: position for position, tag in enumerate(ExpenseTag, start=1)}
+TAGS_BY_ID = {position: tag for tag, position in TAG_IDS.items()}
+
+# Names used by older versions of the app, still accepted on input
+LEGACY_TAGS = {
+    "bolletta": ExpenseTag.ALTRO,
+    "spesa": ExpenseTag.SPESA_ALIMENTARE,
+    "cani": ExpenseTag.ANIMALI,
+}
+_TAG_NAMES = {tag.value.lower(): tag for tag in ExpenseTag}
+
+
+def parse_tag(value) -> ExpenseTag:
+    """Canonical tag for a name in any case (or a legacy name). Raises ValueError if unknown."""
+    if isinstance(value, ExpenseTag):
+        return value
+    name = str(value).strip().lower()
+    tag = _TAG_NAMES.get(name) or LEGACY_TAGS.get(name)
+    if tag is None:
+        raise ValueError(f"Tag non valido: '{value}'")
+    return tag
+
+
+def tag_id(value) -> int:
+    """Id of a tag in expense_tags"""
+    return TAG_IDS[parse_tag(value)]
+
 class DivisionType(str, enum.Enum):
     UGUALE = "Uguale"
     IMPORTI_ESATTI = "Importi esatti"
     PERCENTUALE = "Percentuale"
 
+class RecurrenceFrequency(str, enum.Enum):
+    SETTIMANALE = "Settimanale"
+    MENSILE = "Mensile"
+    ANNUALE = "Annuale"
+
+class Tag(Base):
+    """Canonical expense tags, seeded from ExpenseTag with the ids in TAG_IDS"""
+    __tablename__ = "expense_tags"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    nome = Column(String(50), unique=True, nullable=False)
+
+@event.listens_for(Tag.__table__, "after_create")
+def seed_tags(table, connection, **kw):
+    """Fill expense_tags as soon as it is created"""
+    connection.execute(table.insert(), [{"id": position, "nome": tag.value} for tag, position in TAG_IDS.items()])
+
 class ExpenseGroup(Base):
     __tablename__ = "expense_groups"
 
@@ -37,14 +86,17 @@ class ExpenseGroup(Base):
 
     # Relationships
     creator = relationship("User")
-    members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
-    expenses = relationship("Expense", back_populates="group", cascade="all, delete-orphan")
+    members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan", passive_deletes=True)
+    expenses = relationship("Expense", back_populates="group", cascade="all, delete-orphan", passive_deletes=True)
+    balances = relationship("GroupMemberBalance", cascade="all, delete-orphan", passive_deletes=True)
+    monthly_totals = relationship("ExpenseMonthlyTotal", cascade="all, delete-orphan", passive_deletes=True)
+    recurring_expenses = relationship("RecurringExpense", back_populates="group", cascade="all, delete-orphan", passive_deletes=True)
 
 class GroupMember(Base):
     __tablename__ = "group_members"
 
     id = Column(Integer, primary_key=True, index=True)
-    group_id = Column(Integer, ForeignKey("expense_groups.id"))
+    group_id = Column(Integer, ForeignKey("expense_groups.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.id"))
     joined_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -54,27 +106,71 @@ class GroupMember(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Keyset pagination of a group's history (ORDER BY created_at DESC, id DESC)
+        Index("ix_expenses_group_created_id", "group_id", "created_at", "id"),
+        # Tag filters within a group
+        Index("ix_expenses_group_tag", "group_id", "tag_id"),
+    )
+    # Fetch server defaults (created_at) with the INSERT instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     descrizione = Column(String)
     importo = Column(Float, nullable=False)
-    tag = Column(String(50), nullable=False)  # Changed from SQLEnum to String to match PostgreSQL values
+    tag_id = Column(Integer, ForeignKey("expense_tags.id"), nullable=False)
     division_type = Column(SQLEnum(DivisionType), nullable=False, default=DivisionType.UGUALE)
     paid_by_id = Column(Integer, ForeignKey("users.id"))
-    group_id = Column(Integer, ForeignKey("expense_groups.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    group_id = Column(Integer, ForeignKey("expense_groups.id", ondelete="CASCADE"))
+    # Set in Python on every insert path (create, import, recurring): on SQLite the stored
+    # value then has the same format as a bound cursor, so keyset comparisons are exact
+    created_at = Column(DateTime(timezone=True), default=_utc_now, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     paid_by = relationship("User")
     group = relationship("ExpenseGroup", back_populates="expenses")
-    participants = relationship("ExpenseParticipant", back_populates="expense", cascade="all, delete-orphan")
+    participants = relationship("ExpenseParticipant", back_populates="expense", cascade="all, delete-orphan", passive_deletes=True)
+    receipts = relationship("ExpenseReceipt", back_populates="expense", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def tag(self) -> ExpenseTag:
+        return TAGS_BY_ID[self.tag_id]
+
+    @tag.setter
+    def tag(self, value):
+        self.tag_id = tag_id(value)
+
+class ExpenseReceipt(Base):
+    """Receipt photo (or PDF) attached to an expense; the file lives in utils.storage"""
+    __tablename__ = "expense_receipts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False, index=True)
+    uploaded_by_id = Column(Integer, ForeignKey("users.id"))
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)  # Strong ETag of the file
+    storage_key = Column(String, nullable=False)
+    thumbnail_key = Column(String)  # Set once the thumbnail has been generated
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    expense = relationship("Expense", back_populates="receipts")
+
+    @property
+    def has_thumbnail(self) -> bool:
+        return self.thumbnail_key is not None
 
 class ExpenseParticipant(Base):
     __tablename__ = "expense_participants"
+    __table_args__ = (
+        Index("ix_expense_participants_user_expense", "user_id", "expense_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    expense_id = Column(Integer, ForeignKey("expenses.id"))
+    expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.id"))
     importo = Column(Float)  # Per divisione per importi esatti
     percentuale = Column(Float)  # Per divisione per percentuale
@@ -82,3 +178,75 @@ class ExpenseParticipant(Base):
     # Relationships
     expense = relationship("Expense", back_populates="participants")
     user = relationship("User")
+
+class GroupMemberBalance(Base):
+    """Running totals per group member, kept up to date by the expense write paths"""
+    __tablename__ = "group_member_balances"
+    __table_args__ = (
+        UniqueConstraint("group_id", "user_id", name="uq_group_member_balances_group_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("expense_groups.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    total_paid = Column(Float, nullable=False, default=0)
+    total_owed = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExpenseMonthlyTotal(Base):
+    """Spending rollup per group, month, tag and member, kept up to date by the expense write paths"""
+    __tablename__ = "expense_monthly_totals"
+    __table_args__ = (
+        UniqueConstraint("group_id", "month", "tag_id", "user_id", name="uq_expense_monthly_totals_key"),
+        Index("ix_expense_monthly_totals_user_month", "user_id", "month"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("expense_groups.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)  # First day of the month
+    tag_id = Column(Integer, ForeignKey("expense_tags.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    total_paid = Column(Float, nullable=False, default=0)
+    total_owed = Column(Float, nullable=False, default=0)
+
+class RecurringExpense(Base):
+    """Template of an expense repeated on a schedule, materialized by utils.recurring"""
+    __tablename__ = "recurring_expenses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("expense_groups.id", ondelete="CASCADE"), nullable=False, index=True)
+    creator_id = Column(Integer, ForeignKey("users.id"))
+    descrizione = Column(String)
+    importo = Column(Float, nullable=False)
+    tag_id = Column(Integer, ForeignKey("expense_tags.id"), nullable=False)
+    division_type = Column(SQLEnum(DivisionType), nullable=False, default=DivisionType.UGUALE)
+    paid_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    frequency = Column(SQLEnum(RecurrenceFrequency), nullable=False, default=RecurrenceFrequency.MENSILE)
+    interval = Column(Integer, nullable=False, default=1)  # Every N weeks/months/years
+    start_date = Column(Date, nullable=False)  # First occurrence, also the day of the month used
+    end_date = Column(Date)  # Last possible occurrence (optional)
+    next_run = Column(Date, nullable=False, index=True)  # Next occurrence still to be created
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    group = relationship("ExpenseGroup", back_populates="recurring_expenses")
+    participants = relationship("RecurringExpenseParticipant", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def tag(self) -> ExpenseTag:
+        return TAGS_BY_ID[self.tag_id]
+
+    @tag.setter
+    def tag(self, value):
+        self.tag_id = tag_id(value)
+
+class RecurringExpenseParticipant(Base):
+    __tablename__ = "recurring_expense_participants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recurring_expense_id = Column(Integer, ForeignKey("recurring_expenses.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    importo = Column(Float)
+    percentuale = Column(Float)
@@ -15,26 +15,26 @@ class WorkoutCard(Base):
 
     # Relationships
     user = relationship("User")
-    days = relationship("WorkoutDay", back_populates="workout_card", cascade="all, delete-orphan", order_by="WorkoutDay.ordine")
+    days = relationship("WorkoutDay", back_populates="workout_card", cascade="all, delete-orphan", passive_deletes=True, order_by="WorkoutDay.ordine")
 
 class WorkoutDay(Base):
     __tablename__ = "workout_days"
 
     id = Column(Integer, primary_key=True, index=True)
-    workout_card_id = Column(Integer, ForeignKey("workout_cards.id"))
+    workout_card_id = Column(Integer, ForeignKey("workout_cards.id", ondelete="CASCADE"))
     nome = Column(String, nullable=False)  # es: "Giorno 1 - Petto/Tricipiti", "Lunedì", etc.
     ordine = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     workout_card = relationship("WorkoutCard", back_populates="days")
-    exercises = relationship("Exercise", back_populates="workout_day", cascade="all, delete-orphan", order_by="Exercise.ordine")
+    exercises = relationship("Exercise", back_populates="workout_day", cascade="all, delete-orphan", passive_deletes=True, order_by="Exercise.ordine")
 
 class Exercise(Base):
     __tablename__ = "exercises"
 
     id = Column(Integer, primary_key=True, index=True)
-    workout_day_id = Column(Integer, ForeignKey("workout_days.id"))
+    workout_day_id = Column(Integer, ForeignKey("workout_days.id", ondelete="CASCADE"))
     nome = Column(String, nullable=False)
     serie = Column(Integer)
     ripetizioni = Column(String)
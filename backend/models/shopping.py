@@ -1,34 +1,66 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from database import Base
+from datetime import datetime, timezone
 import secrets
+import unicodedata
+
+def normalize_item_name(nome: str) -> str:
+    """Name key used to detect duplicate items: case-folded, without accents, single spaces"""
+    decomposed = unicodedata.normalize("NFKD", nome.casefold())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.split())
 
 class ShoppingList(Base):
     __tablename__ = "shopping_lists"
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
     share_token = Column(String, unique=True, index=True, default=lambda: secrets.token_urlsafe(32))
+    version = Column(Integer, nullable=False, default=0)  # Bumped by every change, see GET /{id}/changes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     owner = relationship("User")
-    items = relationship("ShoppingItem", back_populates="shopping_list", cascade="all, delete-orphan")
-    shared_with = relationship("SharedList", back_populates="shopping_list", cascade="all, delete-orphan")
+    items = relationship("ShoppingItem", back_populates="shopping_list", cascade="all, delete-orphan", passive_deletes=True)
+    shared_with = relationship("SharedList", back_populates="shopping_list", cascade="all, delete-orphan", passive_deletes=True)
+    tombstones = relationship("ShoppingItemTombstone", cascade="all, delete-orphan", passive_deletes=True)
+    client_mutations = relationship("ShoppingClientMutation", cascade="all, delete-orphan", passive_deletes=True)
 
 class ShoppingItem(Base):
     __tablename__ = "shopping_items"
+    __table_args__ = (
+        # One item per name in a list, enforced by INSERT ... ON CONFLICT
+        Index("uq_shopping_items_list_name", "shopping_list_id", "normalized_name", unique=True),
+        # Items changed since a list version
+        Index("ix_shopping_items_list_version", "shopping_list_id", "list_version"),
+        # Items still to buy: only the uncompleted rows are indexed
+        Index(
+            "ix_shopping_items_to_buy",
+            "shopping_list_id",
+            postgresql_where=text("completato = false"),
+            sqlite_where=text("completato = 0")
+        ),
+    )
+    # Fetch server defaults (created_at, updated_at) with the INSERT/UPDATE instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id"))
+    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"), index=True)
     nome = Column(String, nullable=False)
+    normalized_name = Column(String, nullable=False)  # normalize_item_name(nome), kept in sync by _set_normalized_name
     quantita = Column(String)
     note = Column(String)
     completato = Column(Boolean, default=False)
     completed_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    version = Column(Integer, nullable=False, default=0)  # Bumped at every change, for optimistic concurrency
+    list_version = Column(Integer, nullable=False, default=0)  # List version of the last change to the item
+    # When completato/quantita last changed, for last-writer-wins replay of offline changes
+    completato_changed_at = Column(DateTime(timezone=True), nullable=True)
+    quantita_changed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -36,11 +68,56 @@ class ShoppingItem(Base):
     shopping_list = relationship("ShoppingList", back_populates="items")
     completed_by = relationship("User")
 
+    @validates("nome")
+    def _set_normalized_name(self, key, nome):
+        # Same key (e.g. only the case changed): keep the stored one, which may be the
+        # id-suffixed key migrate_item_names gave to legacy duplicates
+        if self.nome is None or normalize_item_name(nome) != normalize_item_name(self.nome):
+            self.normalized_name = normalize_item_name(nome)
+        return nome
+
+    @validates("completato", "quantita")
+    def _set_changed_at(self, key, value):
+        # Server time for online changes; replay_mutations overrides it with the client time
+        if value != getattr(self, key):
+            setattr(self, f"{key}_changed_at", datetime.now(timezone.utc))
+        return value
+
+class ShoppingItemTombstone(Base):
+    """Deleted item, kept so that delta sync clients learn about the deletion"""
+    __tablename__ = "shopping_item_tombstones"
+    __table_args__ = (
+        Index("ix_shopping_item_tombstones_list_version", "shopping_list_id", "list_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"), nullable=False)
+    item_id = Column(Integer, nullable=False)
+    list_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ShoppingClientMutation(Base):
+    """Offline change already replayed, so that a client retrying its queue doesn't apply it twice"""
+    __tablename__ = "shopping_client_mutations"
+    __table_args__ = (
+        Index("uq_shopping_client_mutations_list_client_id", "shopping_list_id", "client_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"), nullable=False)
+    client_id = Column(String, nullable=False)  # Generated by the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class SharedList(Base):
     __tablename__ = "shared_lists"
+    __table_args__ = (
+        # Lists shared with a user
+        Index("ix_shared_lists_user_list", "shared_with_id", "shopping_list_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id"))
+    shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"))
     shared_with_id = Column(Integer, ForeignKey("users.id"))
     shared_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -0,0 +1,126 @@
+"""
+Rebuild or verify the expense_monthly_totals rollup used by the analytics endpoints.
+Replays the full expense history month by month, reports the rows that
+drifted and (unless --verify is given) fixes them.
+
+Usage:
+    python rebuild_analytics.py            # rebuild and report drift
+    python rebuild_analytics.py --verify   # report drift only, exit 1 if any
+"""
+import sys
+from sqlalchemy.orm import selectinload
+from database import SessionLocal
+from models.expense import Expense, ExpenseMonthlyTotal, TAGS_BY_ID
+from utils.analytics import rollup_deltas
+
+TOLERANCE = 0.005
+YIELD_PER = 1000
+
+
+def rebuild_analytics(fix: bool = True) -> int:
+    """Compare the rollup with the expense history. Returns the number of drifted rows."""
+    db = SessionLocal()
+
+    try:
+        expected = {}
+        expenses = db.query(Expense)\
+            .options(selectinload(Expense.participants))\
+            .order_by(Expense.id)\
+            .yield_per(YIELD_PER)
+        for expense in expenses:
+            for (month, tag_id, user_id), (paid, owed) in rollup_deltas(expense).items():
+                key = (expense.group_id, month, tag_id, user_id)
+                total_paid, total_owed = expected.get(key, (0.0, 0.0))
+                expected[key] = (total_paid + paid, total_owed + owed)
+
+        actual = {
+            (row.group_id, row.month, row.tag_id, row.user_id): row
+            for row in db.query(ExpenseMonthlyTotal).all()
+        }
+
+        drift = 0
+        for key, (total_paid, total_owed) in expected.items():
+            row = actual.pop(key, None)
+            if row is None:
+                drift += 1
+                print(f"  Missing group {key[0]} {key[1]:%Y-%m} {TAGS_BY_ID[key[2]].value} user {key[3]}: paid {total_paid:.2f}, owed {total_owed:.2f}")
+                if fix:
+                    db.add(ExpenseMonthlyTotal(
+                        group_id=key[0],
+                        month=key[1],
+                        tag_id=key[2],
+                        user_id=key[3],
+                        total_paid=total_paid,
+                        total_owed=total_owed
+                    ))
+            elif abs(row.total_paid - total_paid) > TOLERANCE or abs(row.total_owed - total_owed) > TOLERANCE:
+                drift += 1
+                print(
+                    f"  Drift group {key[0]} {key[1]:%Y-%m} {TAGS_BY_ID[key[2]].value} user {key[3]}: "
+                    f"paid {row.total_paid:.2f} → {total_paid:.2f}, owed {row.total_owed:.2f} → {total_owed:.2f}"
+                )
+                if fix:
+                    row.total_paid = total_paid
+                    row.total_owed = total_owed
+
+        # Rows left over have no expense behind them any more
+        for key, row in actual.items():
+            if abs(row.total_paid) <= TOLERANCE and abs(row.total_owed) <= TOLERANCE:
+                continue
+            drift += 1
+            print(f"  Stale row group {key[0]} {key[1]:%Y-%m} {TAGS_BY_ID[key[2]].value} user {key[3]}")
+            if fix:
+                db.delete(row)
+
+        if fix:
+            db.commit()
+
+        return drift
+
+    except Exception as e:
+        print(f"Error rebuilding analytics: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def migrate():
+    """Fill the rollup on first boot, when it is still empty but expenses already exist"""
+    db = SessionLocal()
+    try:
+        has_rollup = db.query(ExpenseMonthlyTotal.id).first() is not None
+        has_expenses = db.query(Expense.id).first() is not None
+    finally:
+        db.close()
+
+    if has_rollup or not has_expenses:
+        print("✓ Analytics rollup already initialized. Skipping rebuild.")
+        return
+
+    print("Initializing analytics rollup from expense history...")
+    rebuild_analytics(fix=True)
+    print("✓ Analytics rollup initialized")
+
+
+if __name__ == "__main__":
+    verify_only = "--verify" in sys.argv[1:]
+    print("=" * 60)
+    print("Verify Analytics Rollup" if verify_only else "Rebuild Analytics Rollup")
+    print("=" * 60)
+    try:
+        drift = rebuild_analytics(fix=not verify_only)
+    except Exception as e:
+        print(f"\n✗ Failed: {e}")
+        sys.exit(1)
+
+    if drift == 0:
+        print("\n✓ Rollup is consistent with the expense history.")
+        sys.exit(0)
+
+    if verify_only:
+        print(f"\n✗ {drift} rows drifted.")
+        sys.exit(1)
+
+    print(f"\n✓ Fixed {drift} rows.")
+    sys.exit(0)
@@ -0,0 +1,126 @@
+"""
+Rebuild or verify the group_member_balances ledger.
+Recomputes every member's totals from the full expense history,
+reports the rows that drifted and (unless --verify is given) fixes them.
+
+Usage:
+    python rebuild_balances.py            # rebuild and report drift
+    python rebuild_balances.py --verify   # report drift only, exit 1 if any
+"""
+import sys
+from sqlalchemy import func
+from database import SessionLocal
+from models.expense import GroupMember, GroupMemberBalance
+from utils.balances import paid_totals, owed_totals
+
+TOLERANCE = 0.005
+
+
+def rebuild_balances(fix: bool = True) -> int:
+    """Compare the ledger with the expense history. Returns the number of drifted rows."""
+    db = SessionLocal()
+
+    try:
+        paid = paid_totals(db)
+        owed = owed_totals(db)
+
+        expected_rows = db.query(
+            GroupMember.group_id,
+            GroupMember.user_id,
+            func.coalesce(paid.c.total_paid, 0),
+            func.coalesce(owed.c.total_owed, 0)
+        ).outerjoin(paid, (paid.c.group_id == GroupMember.group_id) & (paid.c.user_id == GroupMember.user_id))\
+            .outerjoin(owed, (owed.c.group_id == GroupMember.group_id) & (owed.c.user_id == GroupMember.user_id))\
+            .all()
+        expected = {
+            (group_id, user_id): (total_paid, total_owed)
+            for group_id, user_id, total_paid, total_owed in expected_rows
+        }
+
+        actual = {
+            (row.group_id, row.user_id): row
+            for row in db.query(GroupMemberBalance).all()
+        }
+
+        drift = 0
+        for key, (total_paid, total_owed) in expected.items():
+            row = actual.pop(key, None)
+            if row is None:
+                drift += 1
+                print(f"  Missing group {key[0]} user {key[1]}: paid {total_paid:.2f}, owed {total_owed:.2f}")
+                if fix:
+                    db.add(GroupMemberBalance(
+                        group_id=key[0],
+                        user_id=key[1],
+                        total_paid=total_paid,
+                        total_owed=total_owed
+                    ))
+            elif abs(row.total_paid - total_paid) > TOLERANCE or abs(row.total_owed - total_owed) > TOLERANCE:
+                drift += 1
+                print(
+                    f"  Drift group {key[0]} user {key[1]}: "
+                    f"paid {row.total_paid:.2f} → {total_paid:.2f}, owed {row.total_owed:.2f} → {total_owed:.2f}"
+                )
+                if fix:
+                    row.total_paid = total_paid
+                    row.total_owed = total_owed
+
+        # Rows left over belong to users who are no longer members
+        for key, row in actual.items():
+            drift += 1
+            print(f"  Stale row group {key[0]} user {key[1]}")
+            if fix:
+                db.delete(row)
+
+        if fix:
+            db.commit()
+
+        return drift
+
+    except Exception as e:
+        print(f"Error rebuilding balances: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def migrate():
+    """Fill the ledger on first boot, when it is still empty but groups already exist"""
+    db = SessionLocal()
+    try:
+        has_ledger = db.query(GroupMemberBalance.id).first() is not None
+        has_members = db.query(GroupMember.id).first() is not None
+    finally:
+        db.close()
+
+    if has_ledger or not has_members:
+        print("✓ Balance ledger already initialized. Skipping rebuild.")
+        return
+
+    print("Initializing balance ledger from expense history...")
+    rebuild_balances(fix=True)
+    print("✓ Balance ledger initialized")
+
+
+if __name__ == "__main__":
+    verify_only = "--verify" in sys.argv[1:]
+    print("=" * 60)
+    print("Verify Balance Ledger" if verify_only else "Rebuild Balance Ledger")
+    print("=" * 60)
+    try:
+        drift = rebuild_balances(fix=not verify_only)
+    except Exception as e:
+        print(f"\n✗ Failed: {e}")
+        sys.exit(1)
+
+    if drift == 0:
+        print("\n✓ Ledger is consistent with the expense history.")
+        sys.exit(0)
+
+    if verify_only:
+        print(f"\n✗ {drift} rows drifted.")
+        sys.exit(1)
+
+    print(f"\n✓ Fixed {drift} rows.")
+    sys.exit(0)
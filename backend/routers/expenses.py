@@ -1,16 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+import io
+import uuid
+from config import settings
 from database import get_db
 from models.user import User
-from models.expense import Expense, ExpenseGroup, GroupMember, ExpenseParticipant
+from models.expense import (
+    Expense, ExpenseGroup, GroupMember, ExpenseParticipant, ExpenseReceipt, GroupMemberBalance, ExpenseTag, TAG_IDS,
+    RecurringExpense, RecurringExpenseParticipant
+)
 from schemas.expense import (
-    ExpenseCreate, ExpenseUpdate, Expense as ExpenseSchema,
-    GroupCreate, GroupUpdate, Group as GroupSchema,
-    GroupMemberCreate, Balance
+    ExpenseCreate, ExpenseUpdate, ExpenseParticipantCreate, Expense as ExpenseSchema, ExpenseSearchResult,
+    ExpenseReceipt as ExpenseReceiptSchema,
+    GroupCreate, GroupUpdate, Group as GroupSchema, GroupSummary,
+    GroupMemberCreate, Balance, MyBalances, Transfer, ExpenseImportResult,
+    MonthlyTotal, UserMonthlyTotal,
+    RecurringExpenseCreate, RecurringExpenseUpdate, RecurringExpense as RecurringExpenseSchema
 )
 from auth import get_current_user
-from utils.notifications import notify_expense_group_members
+from utils.notifications import notify_expense_group_members, enqueue_notifications, push_notifications
+from utils.balances import (
+    read_group_balances, read_user_balances, expense_deltas, merge_deltas, apply_balance_deltas,
+    seed_member_balance, remove_member_balance
+)
+from utils.settlement import get_settlement, settlement_cache
+from utils.analytics import (
+    rollup_deltas, merge_rollup_deltas, apply_rollup_deltas,
+    group_monthly_totals, user_monthly_totals
+)
+from utils.pagination import (
+    encode_cursor, decode_time_cursor, decode_rank_cursor, before_keyset, below_rank_keyset, set_next_cursor
+)
+from utils.search import expense_search
+from utils.expense_import import import_expenses, read_csv_rows, read_ndjson_rows
+from utils.expense_export import stream_expenses_csv, stream_expenses_ndjson
+from utils.recurring import first_occurrence_from
+from utils.storage import ReceiptStorage, get_receipt_storage
+from utils.thumbnails import THUMBNAIL_CONTENT_TYPES
+from utils.receipts import (
+    RECEIPT_CONTENT_TYPES, store_receipt, generate_receipt_thumbnail, delete_receipt_files, receipt_response
+)
 
 router = APIRouter()
 
@@ -33,18 +66,68 @@ def create_group(
 
     return db_group
 
-@router.get("/groups", response_model=List[GroupSchema])
+@router.get("/groups", response_model=List[GroupSummary])
 def get_groups(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get groups where user is a member
-    groups = db.query(ExpenseGroup).join(GroupMember).filter(
+    # Groups where user is a member, with counts and balance aggregated in SQL.
+    # The expense list of a group is served by GET /expenses?group_id=...
+    my_group_ids = db.query(GroupMember.group_id).filter(
         GroupMember.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return groups
+    )
+
+    member_counts = db.query(
+        GroupMember.group_id,
+        func.count(GroupMember.id).label("member_count")
+    ).filter(GroupMember.group_id.in_(my_group_ids))\
+        .group_by(GroupMember.group_id)\
+        .subquery()
+
+    expense_stats = db.query(
+        Expense.group_id,
+        func.count(Expense.id).label("expense_count"),
+        func.max(func.coalesce(Expense.updated_at, Expense.created_at)).label("last_expense_at")
+    ).filter(Expense.group_id.in_(my_group_ids))\
+        .group_by(Expense.group_id)\
+        .subquery()
+
+    rows = db.query(
+        ExpenseGroup,
+        func.coalesce(member_counts.c.member_count, 0),
+        func.coalesce(expense_stats.c.expense_count, 0),
+        func.coalesce(expense_stats.c.last_expense_at, ExpenseGroup.updated_at, ExpenseGroup.created_at),
+        func.coalesce(GroupMemberBalance.total_paid - GroupMemberBalance.total_owed, 0)
+    ).join(GroupMember, and_(
+        GroupMember.group_id == ExpenseGroup.id,
+        GroupMember.user_id == current_user.id
+    )).outerjoin(member_counts, member_counts.c.group_id == ExpenseGroup.id)\
+        .outerjoin(expense_stats, expense_stats.c.group_id == ExpenseGroup.id)\
+        .outerjoin(GroupMemberBalance, and_(
+            GroupMemberBalance.group_id == ExpenseGroup.id,
+            GroupMemberBalance.user_id == current_user.id
+        ))\
+        .order_by(ExpenseGroup.id)\
+        .offset(skip).limit(limit).all()
+
+    return [
+        GroupSummary(
+            id=group.id,
+            nome=group.nome,
+            descrizione=group.descrizione,
+            creator_id=group.creator_id,
+            share_token=group.share_token,
+            created_at=group.created_at,
+            updated_at=group.updated_at,
+            member_count=member_count,
+            expense_count=expense_count,
+            last_activity=last_activity,
+            my_balance=my_balance
+        )
+        for group, member_count, expense_count, last_activity, my_balance in rows
+    ]
 
 @router.get("/groups/{group_id}", response_model=GroupSchema)
 def get_group(
@@ -113,7 +196,9 @@ def get_group_by_token(
                 user_id=current_user.id
             )
             db.add(member)
+            seed_member_balance(db, group.id, current_user.id)
             db.commit()
+            settlement_cache.invalidate(group.id)
             db.refresh(group)
 
             # Notify other members
@@ -163,7 +248,8 @@ def update_group(
 def delete_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
 ):
     group = db.query(ExpenseGroup).filter(ExpenseGroup.id == group_id).first()
     if not group:
@@ -178,8 +264,15 @@ def delete_group(
             detail="Solo il creatore può eliminare il gruppo"
         )
 
+    receipt_keys = db.query(ExpenseReceipt.storage_key, ExpenseReceipt.thumbnail_key)\
+        .join(Expense, Expense.id == ExpenseReceipt.expense_id)\
+        .filter(Expense.group_id == group_id)\
+        .all()
+
     db.delete(group)
     db.commit()
+    settlement_cache.invalidate(group_id)
+    delete_receipt_files(storage, receipt_keys)
     return None
 
 # Group members endpoints
@@ -211,7 +304,9 @@ def add_group_member(
 
     db_member = GroupMember(group_id=group_id, user_id=member.user_id)
     db.add(db_member)
+    seed_member_balance(db, group_id, member.user_id)
     db.commit()
+    settlement_cache.invalidate(group_id)
 
     # Get the added user
     added_user = db.query(User).filter(User.id == member.user_id).first()
@@ -260,7 +355,9 @@ def remove_group_member(
         )
 
     db.delete(member)
+    remove_member_balance(db, group_id, user_id)
     db.commit()
+    settlement_cache.invalidate(group_id)
     return None
 
 # Expenses endpoints
@@ -270,9 +367,92 @@ def create_expense(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Create an expense in a single transaction. The expense, its participants, the ledger,
+    the rollup and the notifications take one statement each, whatever the number of participants.
+    """
+    # Members and group name in one query: used for the access check and as notification recipients
+    members = db.query(GroupMember.user_id, ExpenseGroup.nome)\
+        .join(ExpenseGroup, ExpenseGroup.id == GroupMember.group_id)\
+        .filter(GroupMember.group_id == expense.group_id)\
+        .all()
+    member_ids = {user_id for user_id, _ in members}
+
+    if current_user.id not in member_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+    group_name = members[0].nome
+
+    # Create expense with its participants, reading generated values back with RETURNING
+    expense_data = expense.dict(exclude={'participants', 'tag'})
+    expense_id, created_at = db.execute(
+        insert(Expense)
+        .values(**expense_data, tag_id=TAG_IDS[expense.tag])
+        .returning(Expense.id, Expense.created_at)
+    ).one()
+
+    participants = []
+    if expense.participants:
+        participants = db.execute(
+            insert(ExpenseParticipant)
+            .values([
+                {"expense_id": expense_id, **participant.dict()}
+                for participant in expense.participants
+            ])
+            .returning(
+                ExpenseParticipant.id,
+                ExpenseParticipant.expense_id,
+                ExpenseParticipant.user_id,
+                ExpenseParticipant.importo,
+                ExpenseParticipant.percentuale
+            )
+        ).all()
+
+    # Update the balance ledger and the monthly rollup in the same transaction
+    apply_balance_deltas(db, expense.group_id, expense_deltas(expense))
+    apply_rollup_deltas(db, expense.group_id, rollup_deltas(expense, created_at=created_at))
+
+    # Notify group members in the same transaction
+    notifications = enqueue_notifications(
+        db=db,
+        user_ids=sorted(member_ids - {current_user.id}),
+        notification_type="expense_group",
+        title="Nuova spesa aggiunta",
+        message=f"{current_user.nome} ha aggiunto una spesa di €{expense.importo:.2f} per '{expense.descrizione}' in '{group_name}'",
+        reference_id=expense.group_id,
+        reference_type="expense_group"
+    )
+
+    db.commit()
+    settlement_cache.invalidate(expense.group_id)
+    push_notifications(notifications)
+
+    return {
+        **expense.dict(),
+        "id": expense_id,
+        "created_at": created_at,
+        "updated_at": None,
+        "participants": [participant._asdict() for participant in participants],
+    }
+
+@router.post("/groups/{group_id}/expenses/import", response_model=ExpenseImportResult)
+def import_group_expenses(
+    group_id: int,
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import many expenses from a CSV or NDJSON file in a single transaction.
+    Invalid rows are skipped and reported with their row number.
+    """
     # Check if user is member of the group
     member = db.query(GroupMember).filter(
-        GroupMember.group_id == expense.group_id,
+        GroupMember.group_id == group_id,
         GroupMember.user_id == current_user.id
     ).first()
 
@@ -282,48 +462,97 @@ def create_expense(
             detail="Non sei membro di questo gruppo"
         )
 
-    # Create expense
-    expense_data = expense.dict(exclude={'participants'})
-    db_expense = Expense(**expense_data)
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    if format is None:
+        format = "ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
 
-    # Add participants
-    for participant in expense.participants:
-        db_participant = ExpenseParticipant(
-            expense_id=db_expense.id,
-            **participant.dict()
+    # Stream the upload line by line instead of reading it in memory
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = read_ndjson_rows(stream) if format == "ndjson" else read_csv_rows(stream)
+
+    try:
+        result = import_expenses(db, group_id, rows, dry_run=dry_run)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Il file deve essere codificato in UTF-8"
         )
-        db.add(db_participant)
+    finally:
+        stream.detach()
 
-    db.commit()
-    db.refresh(db_expense)
+    if dry_run or result.imported == 0:
+        db.rollback()
+        return result
 
-    # Get group info for notification
-    group = db.query(ExpenseGroup).filter(ExpenseGroup.id == expense.group_id).first()
+    db.commit()
+    settlement_cache.invalidate(group_id)
 
-    # Notify group members
+    # One summary notification instead of one per expense
+    group = db.query(ExpenseGroup).filter(ExpenseGroup.id == group_id).first()
     notify_expense_group_members(
         db=db,
-        group_id=expense.group_id,
+        group_id=group_id,
         notification_type="expense_group",
-        title="Nuova spesa aggiunta",
-        message=f"{current_user.nome} ha aggiunto una spesa di €{db_expense.importo:.2f} per '{db_expense.descrizione}' in '{group.nome}'",
+        title="Spese importate",
+        message=f"{current_user.nome} ha importato {result.imported} spese in '{group.nome}'",
         exclude_user_id=current_user.id
     )
 
-    return db_expense
+    return result
+
+@router.get("/groups/{group_id}/expenses/export")
+def export_group_expenses(
+    group_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream all expenses of a group as CSV or NDJSON, oldest first"""
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+
+    if format == "ndjson":
+        content, media_type = stream_expenses_ndjson(group_id), "application/x-ndjson"
+    else:
+        content, media_type = stream_expenses_csv(group_id), "text/csv"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="spese-gruppo-{group_id}.{format}"'}
+    )
 
 @router.get("/expenses", response_model=List[ExpenseSchema])
 def get_expenses(
+    response: Response,
     group_id: int = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    tag: Optional[ExpenseTag] = None,
+    paid_by_id: Optional[int] = None,
+    participant_id: Optional[int] = None,
+    min_importo: Optional[float] = None,
+    max_importo: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Expense)
+    """
+    List expenses, newest first.
+    Pass the X-Next-Cursor response header back as cursor to get the next page.
+    """
+    query = db.query(Expense).options(selectinload(Expense.participants))
 
     if group_id:
         # Check if user is member of the group
@@ -339,10 +568,106 @@ def get_expenses(
             )
 
         query = query.filter(Expense.group_id == group_id)
+    else:
+        # Only expenses of the groups the user belongs to
+        query = query.filter(Expense.group_id.in_(
+            db.query(GroupMember.group_id).filter(GroupMember.user_id == current_user.id)
+        ))
+
+    # Filters
+    if tag:
+        query = query.filter(Expense.tag_id == TAG_IDS[tag])
+    if paid_by_id is not None:
+        query = query.filter(Expense.paid_by_id == paid_by_id)
+    if participant_id is not None:
+        query = query.filter(Expense.participants.any(ExpenseParticipant.user_id == participant_id))
+    if min_importo is not None:
+        query = query.filter(Expense.importo >= min_importo)
+    if max_importo is not None:
+        query = query.filter(Expense.importo <= max_importo)
+    if date_from:
+        query = query.filter(Expense.created_at >= date_from)
+    if date_to:
+        query = query.filter(Expense.created_at < date_to)
+
+    # Keyset pagination on (created_at, id); skip is kept for older clients
+    if cursor:
+        created_at, expense_id = decode_time_cursor(cursor)
+        query = query.filter(before_keyset(Expense.created_at, Expense.id, created_at, expense_id))
+    elif skip:
+        query = query.offset(skip)
+
+    expenses = query.order_by(Expense.created_at.desc(), Expense.id.desc()).limit(limit + 1).all()
+
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        set_next_cursor(response, encode_cursor(expenses[-1].created_at, expenses[-1].id))
 
-    expenses = query.offset(skip).limit(limit).all()
     return expenses
 
+@router.get("/expenses/search", response_model=List[ExpenseSearchResult])
+def search_expenses(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    group_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search expenses by description or group name, best matches first.
+    Pass the X-Next-Cursor response header back as cursor to get the next page.
+    """
+    match, rank = expense_search(db, q.strip())
+    rank = rank.label("rank")
+
+    query = db.query(Expense, ExpenseGroup.nome, rank)\
+        .join(ExpenseGroup, ExpenseGroup.id == Expense.group_id)\
+        .options(selectinload(Expense.participants))\
+        .filter(match)
+
+    if group_id:
+        # Check if user is member of the group
+        member = db.query(GroupMember).filter(
+            GroupMember.group_id == group_id,
+            GroupMember.user_id == current_user.id
+        ).first()
+
+        if not member:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Non sei membro di questo gruppo"
+            )
+
+        query = query.filter(Expense.group_id == group_id)
+    else:
+        # Only expenses of the groups the user belongs to
+        query = query.filter(Expense.group_id.in_(
+            db.query(GroupMember.group_id).filter(GroupMember.user_id == current_user.id)
+        ))
+
+    # Keyset pagination on (rank, id)
+    if cursor:
+        last_rank, expense_id = decode_rank_cursor(cursor)
+        query = query.filter(below_rank_keyset(rank.element, Expense.id, last_rank, expense_id))
+
+    rows = query.order_by(rank.desc(), Expense.id.desc()).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_expense, _, last_rank = rows[-1]
+        set_next_cursor(response, encode_cursor(last_rank, last_expense.id))
+
+    return [
+        ExpenseSearchResult(
+            **ExpenseSchema.model_validate(expense).model_dump(),
+            group_name=group_name,
+            rank=expense_rank
+        )
+        for expense, group_name, expense_rank in rows
+    ]
+
 @router.get("/expenses/{expense_id}", response_model=ExpenseSchema)
 def get_expense(
     expense_id: int,
@@ -370,6 +695,27 @@ def get_expense(
 
     return expense
 
+def _sync_participants(expense: Expense, participants: List[ExpenseParticipantCreate]):
+    """
+    Turn the expense participants into the given set with minimal writes:
+    removed users are deleted, changed shares updated and new users inserted, all in the next flush.
+    """
+    wanted = {participant.user_id: participant for participant in participants}
+    kept = []
+    for participant in expense.participants:
+        new = wanted.pop(participant.user_id, None)
+        if new is None:
+            continue  # Removed (or duplicated) participant: deleted as an orphan
+        # Unchanged values do not produce an UPDATE
+        participant.importo = new.importo
+        participant.percentuale = new.percentuale
+        kept.append(participant)
+
+    expense.participants = kept + [
+        ExpenseParticipant(**participant.dict())
+        for participant in wanted.values()
+    ]
+
 @router.put("/expenses/{expense_id}", response_model=ExpenseSchema)
 def update_expense(
     expense_id: int,
@@ -403,11 +749,37 @@ def update_expense(
             detail="Solo chi ha pagato può modificare la spesa"
         )
 
-    # Update expense fields
-    for key, value in expense_update.dict(exclude_unset=True).items():
+    update_data = expense_update.dict(exclude_unset=True, exclude={'participants'})
+    participants = expense_update.participants
+
+    if participants is not None:
+        if not participants:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La spesa deve avere almeno un partecipante"
+            )
+
+        member_ids = {
+            user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == expense.group_id)
+        }
+        if any(participant.user_id not in member_ids for participant in participants):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Tutti i partecipanti devono essere membri del gruppo"
+            )
+
+    # Update expense fields, moving the ledger and the rollup from the old to the new amounts
+    old_deltas = expense_deltas(expense, sign=-1)
+    old_monthly_deltas = rollup_deltas(expense, sign=-1)
+    for key, value in update_data.items():
         setattr(expense, key, value)
+    if participants is not None:
+        _sync_participants(expense, participants)
+    apply_balance_deltas(db, expense.group_id, merge_deltas(old_deltas, expense_deltas(expense)))
+    apply_rollup_deltas(db, expense.group_id, merge_rollup_deltas(old_monthly_deltas, rollup_deltas(expense)))
 
     db.commit()
+    settlement_cache.invalidate(expense.group_id)
     db.refresh(expense)
     return expense
 
@@ -415,7 +787,8 @@ def update_expense(
 def delete_expense(
     expense_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
 ):
     expense = db.query(Expense).filter(Expense.id == expense_id).first()
     if not expense:
@@ -430,8 +803,188 @@ def delete_expense(
             detail="Solo chi ha pagato può eliminare la spesa"
         )
 
+    group_id = expense.group_id
+    receipt_keys = [(receipt.storage_key, receipt.thumbnail_key) for receipt in expense.receipts]
+    apply_balance_deltas(db, group_id, expense_deltas(expense, sign=-1))
+    apply_rollup_deltas(db, group_id, rollup_deltas(expense, sign=-1))
     db.delete(expense)
     db.commit()
+    settlement_cache.invalidate(group_id)
+    delete_receipt_files(storage, receipt_keys)
+    return None
+
+# Receipt endpoints
+def _get_member_expense(db: Session, expense_id: int, current_user: User) -> Expense:
+    """Expense the current user can see, 404/403 otherwise"""
+    expense = db.query(Expense).filter(Expense.id == expense_id).first()
+    if not expense:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Spesa non trovata"
+        )
+
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == expense.group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non hai accesso a questa spesa"
+        )
+
+    return expense
+
+def _get_receipt(db: Session, expense_id: int, receipt_id: int, current_user: User) -> ExpenseReceipt:
+    _get_member_expense(db, expense_id, current_user)
+
+    receipt = db.query(ExpenseReceipt).filter(
+        ExpenseReceipt.id == receipt_id,
+        ExpenseReceipt.expense_id == expense_id
+    ).first()
+    if not receipt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scontrino non trovato"
+        )
+
+    return receipt
+
+@router.post("/expenses/{expense_id}/receipts", response_model=ExpenseReceiptSchema, status_code=status.HTTP_201_CREATED)
+def upload_expense_receipt(
+    expense_id: int,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
+):
+    """
+    Attach a receipt photo or PDF to an expense.
+    The file is copied to storage in chunks, never whole in memory;
+    the thumbnail of a photo is generated after the response.
+    """
+    _get_member_expense(db, expense_id, current_user)
+
+    content_type = (file.content_type or "").split(";")[0].strip().lower()
+    if content_type not in RECEIPT_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Formato non supportato: carica una foto (JPEG, PNG, WebP, HEIC) o un PDF"
+        )
+
+    key = f"{expense_id}/{uuid.uuid4().hex}"
+    size, sha256 = store_receipt(storage, key, file, settings.RECEIPT_MAX_SIZE)
+    if size == 0:
+        storage.delete(key)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Il file è vuoto"
+        )
+
+    receipt = ExpenseReceipt(
+        expense_id=expense_id,
+        uploaded_by_id=current_user.id,
+        filename=(file.filename or "scontrino").replace("\\", "/").rsplit("/", 1)[-1][:255],
+        content_type=content_type,
+        size=size,
+        sha256=sha256,
+        storage_key=key
+    )
+    db.add(receipt)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        storage.delete(key)
+        raise
+    db.refresh(receipt)
+
+    if content_type in THUMBNAIL_CONTENT_TYPES:
+        background_tasks.add_task(generate_receipt_thumbnail, receipt.id, storage, key)
+
+    return receipt
+
+@router.get("/expenses/{expense_id}/receipts", response_model=List[ExpenseReceiptSchema])
+def get_expense_receipts(
+    expense_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _get_member_expense(db, expense_id, current_user)
+
+    return db.query(ExpenseReceipt)\
+        .filter(ExpenseReceipt.expense_id == expense_id)\
+        .order_by(ExpenseReceipt.id)\
+        .all()
+
+@router.get("/expenses/{expense_id}/receipts/{receipt_id}")
+def download_expense_receipt(
+    expense_id: int,
+    receipt_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
+):
+    """Download a receipt, with Range requests and a strong ETag"""
+    receipt = _get_receipt(db, expense_id, receipt_id, current_user)
+
+    return receipt_response(
+        request,
+        storage,
+        receipt.storage_key,
+        etag=f'"{receipt.sha256}"',
+        content_type=receipt.content_type,
+        filename=receipt.filename
+    )
+
+@router.get("/expenses/{expense_id}/receipts/{receipt_id}/thumbnail")
+def download_expense_receipt_thumbnail(
+    expense_id: int,
+    receipt_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
+):
+    receipt = _get_receipt(db, expense_id, receipt_id, current_user)
+
+    if not receipt.has_thumbnail:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Anteprima non disponibile"
+        )
+
+    return receipt_response(
+        request,
+        storage,
+        receipt.thumbnail_key,
+        etag=f'"{receipt.sha256}-thumb"',
+        content_type="image/jpeg"
+    )
+
+@router.delete("/expenses/{expense_id}/receipts/{receipt_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_expense_receipt(
+    expense_id: int,
+    receipt_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    storage: ReceiptStorage = Depends(get_receipt_storage)
+):
+    receipt = _get_receipt(db, expense_id, receipt_id, current_user)
+
+    if receipt.uploaded_by_id != current_user.id and receipt.expense.paid_by_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo chi ha caricato lo scontrino o chi ha pagato può eliminarlo"
+        )
+
+    receipt_keys = [(receipt.storage_key, receipt.thumbnail_key)]
+    db.delete(receipt)
+    db.commit()
+    delete_receipt_files(storage, receipt_keys)
     return None
 
 # Balance endpoints
@@ -453,44 +1006,221 @@ def get_group_balances(
             detail="Non sei membro di questo gruppo"
         )
 
-    # Get all members
-    members = db.query(GroupMember).filter(GroupMember.group_id == group_id).all()
+    return read_group_balances(db, group_id)
 
-    balances = []
-    for member in members:
-        user = db.query(User).filter(User.id == member.user_id).first()
+@router.get("/balances", response_model=MyBalances)
+def get_my_balances(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Paid, owed and net of the current user in every group, plus the grand total"""
+    return read_user_balances(db, current_user.id)
 
-        # Calculate total paid
-        total_paid = db.query(Expense).filter(
-            Expense.group_id == group_id,
-            Expense.paid_by_id == member.user_id
-        ).with_entities(Expense.importo).all()
-        total_paid_sum = sum([expense[0] for expense in total_paid])
+@router.get("/groups/{group_id}/settlement", response_model=List[Transfer])
+def get_group_settlement(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Minimal list of transfers that settles all debts in the group"""
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
 
-        # Calculate total owed
-        participants = db.query(ExpenseParticipant).join(Expense).filter(
-            Expense.group_id == group_id,
-            ExpenseParticipant.user_id == member.user_id
-        ).all()
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+
+    return get_settlement(db, group_id)
+
+# Analytics endpoints
+@router.get("/groups/{group_id}/analytics", response_model=List[MonthlyTotal])
+def get_group_analytics(
+    group_id: int,
+    year: Optional[int] = None,
+    tag: Optional[ExpenseTag] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Totals paid and owed per month, tag and member of a group"""
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
 
-        total_owed_sum = 0
-        for participant in participants:
-            expense = db.query(Expense).filter(Expense.id == participant.expense_id).first()
-            if expense.division_type == "Uguale":
-                num_participants = len(expense.participants)
-                total_owed_sum += expense.importo / num_participants
-            elif expense.division_type == "Importi esatti":
-                total_owed_sum += participant.importo or 0
-            elif expense.division_type == "Percentuale":
-                total_owed_sum += (expense.importo * (participant.percentuale or 0)) / 100
-
-        balance = Balance(
-            user_id=member.user_id,
-            user_name=f"{user.nome} {user.cognome}",
-            total_paid=total_paid_sum,
-            total_owed=total_owed_sum,
-            balance=total_paid_sum - total_owed_sum
-        )
-        balances.append(balance)
-
-    return balances
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+
+    return group_monthly_totals(db, group_id, year=year, tag=tag)
+
+@router.get("/analytics", response_model=List[UserMonthlyTotal])
+def get_my_analytics(
+    year: Optional[int] = None,
+    tag: Optional[ExpenseTag] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Totals paid and owed per month and tag by the current user, across all groups"""
+    return user_monthly_totals(db, current_user.id, year=year, tag=tag)
+
+# Recurring expenses endpoints
+def _check_recurring_members(db: Session, group_id: int, paid_by_id: Optional[int], participants):
+    """Payer and participants of a recurring expense must be group members"""
+    member_ids = {
+        user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)
+    }
+    user_ids = {participant.user_id for participant in participants or []}
+    if paid_by_id is not None:
+        user_ids.add(paid_by_id)
+
+    if not user_ids <= member_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chi paga e i partecipanti devono essere membri del gruppo"
+        )
+
+def _get_recurring_expense(db: Session, recurring_id: int, current_user: User) -> RecurringExpense:
+    recurring = db.query(RecurringExpense).filter(RecurringExpense.id == recurring_id).first()
+    if not recurring:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Spesa ricorrente non trovata"
+        )
+
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == recurring.group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non hai accesso a questa spesa ricorrente"
+        )
+
+    return recurring
+
+@router.post("/groups/{group_id}/recurring", response_model=RecurringExpenseSchema, status_code=status.HTTP_201_CREATED)
+def create_recurring_expense(
+    group_id: int,
+    recurring: RecurringExpenseCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create a recurring expense: occurrences from start_date on are added automatically"""
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+
+    if not recurring.participants:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La spesa deve avere almeno un partecipante"
+        )
+    _check_recurring_members(db, group_id, recurring.paid_by_id, recurring.participants)
+
+    db_recurring = RecurringExpense(
+        **recurring.dict(exclude={'participants'}),
+        group_id=group_id,
+        creator_id=current_user.id,
+        next_run=recurring.start_date
+    )
+    db_recurring.participants = [
+        RecurringExpenseParticipant(**participant.dict())
+        for participant in recurring.participants
+    ]
+    db.add(db_recurring)
+    db.commit()
+    db.refresh(db_recurring)
+    return db_recurring
+
+@router.get("/groups/{group_id}/recurring", response_model=List[RecurringExpenseSchema])
+def get_recurring_expenses(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Check if user is member of the group
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == current_user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Non sei membro di questo gruppo"
+        )
+
+    return db.query(RecurringExpense)\
+        .options(selectinload(RecurringExpense.participants))\
+        .filter(RecurringExpense.group_id == group_id)\
+        .order_by(RecurringExpense.next_run, RecurringExpense.id)\
+        .all()
+
+@router.put("/recurring/{recurring_id}", response_model=RecurringExpenseSchema)
+def update_recurring_expense(
+    recurring_id: int,
+    recurring_update: RecurringExpenseUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Change a recurring expense. Occurrences already created are not modified."""
+    recurring = _get_recurring_expense(db, recurring_id, current_user)
+
+    update_data = recurring_update.dict(exclude_unset=True, exclude={'participants'})
+    participants = recurring_update.participants
+    if participants is not None and not participants:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La spesa deve avere almeno un partecipante"
+        )
+    _check_recurring_members(db, recurring.group_id, update_data.get("paid_by_id"), participants)
+
+    was_active = recurring.active
+    for key, value in update_data.items():
+        setattr(recurring, key, value)
+    if participants is not None:
+        recurring.participants = [
+            RecurringExpenseParticipant(**participant.dict())
+            for participant in participants
+        ]
+
+    # Resumed or rescheduled: start again from the next occurrence, instead of
+    # creating every occurrence missed while paused (or under the old schedule)
+    rescheduled = any(key in update_data for key in ("start_date", "frequency", "interval"))
+    if recurring.active and (rescheduled or not was_active):
+        recurring.next_run = first_occurrence_from(recurring, datetime.now(timezone.utc).date())
+
+    db.commit()
+    db.refresh(recurring)
+    return recurring
+
+@router.delete("/recurring/{recurring_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_recurring_expense(
+    recurring_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stop a recurring expense. Occurrences already created are kept."""
+    recurring = _get_recurring_expense(db, recurring_id, current_user)
+    db.delete(recurring)
+    db.commit()
+    return None
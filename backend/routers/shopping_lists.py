@@ -1,19 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List
 from database import get_db
 from models.user import User
-from models.shopping import ShoppingList, ShoppingItem, SharedList
+from models.shopping import ShoppingList, ShoppingItem, ShoppingItemTombstone, SharedList
 from schemas.shopping import (
-    ShoppingListCreate, ShoppingListUpdate, ShoppingList as ShoppingListSchema,
-    ShoppingItemCreate, ShoppingItemUpdate, ShoppingItem as ShoppingItemSchema,
+    ShoppingListCreate, ShoppingListUpdate, ShoppingList as ShoppingListSchema, ShoppingListSummary,
+    ShoppingListChanges, ShoppingListToBuy,
+    ShoppingItemCreate, ShoppingItemUpdate, ShoppingItem as ShoppingItemSchema, ShoppingItemSuggestion,
+    ShoppingItemBatch, ShoppingItemBatchResult,
+    ShoppingListReplay, ShoppingListReplayResult,
     UserBasic
 )
 from auth import get_current_user
-from utils.notifications import notify_shopping_list_members
+from utils.notifications import (
+    notify_shopping_list_members, shopping_list_member_ids, enqueue_notifications, push_notifications
+)
+from utils.shopping_items import (
+    apply_item_operations, replay_mutations, insert_items, update_item, duplicate_item_error,
+    accessible_lists, bump_list_version, record_deletions
+)
+from utils.http_cache import etag_matches
+from utils.suggestions import get_suggestions, record_item_names, suggestion_cache
+from utils.list_events import (
+    ITEM_ADDED, ITEM_UPDATED, ITEM_COMPLETED,
+    item_event, item_deleted_event, operation_events, replay_events, publish_list_events
+)
 
 router = APIRouter()
 
+def _get_member_list(db: Session, list_id: int, current_user: User) -> ShoppingList:
+    """List the current user owns or is shared on, 404/403 otherwise"""
+    shopping_list = db.query(ShoppingList).filter(ShoppingList.id == list_id).first()
+    if not shopping_list:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lista non trovata"
+        )
+
+    if shopping_list.owner_id != current_user.id:
+        shared = db.query(SharedList).filter(
+            SharedList.shopping_list_id == list_id,
+            SharedList.shared_with_id == current_user.id
+        ).first()
+        if not shared:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Non hai accesso a questa lista"
+            )
+
+    return shopping_list
+
+def _describe_items(items: List[ShoppingItem]) -> str:
+    return f"'{items[0].nome}'" if len(items) == 1 else f"{len(items)} articoli"
+
+def _enqueue_list_update(
+    db: Session,
+    shopping_list: ShoppingList,
+    current_user: User,
+    added: list,
+    completed: list
+) -> list:
+    """One notification to the other members for items added and completed together"""
+    if not (added or completed):
+        return []
+
+    actions = []
+    if added:
+        actions.append(f"aggiunto {_describe_items(added)}")
+    if completed:
+        actions.append(f"completato {_describe_items(completed)}")
+
+    return enqueue_notifications(
+        db=db,
+        user_ids=shopping_list_member_ids(db, shopping_list.id, exclude_user_id=current_user.id),
+        notification_type="shopping_list",
+        title="Lista aggiornata",
+        message=f"{current_user.nome} ha {' e '.join(actions)} nella lista '{shopping_list.nome}'",
+        reference_id=shopping_list.id,
+        reference_type="shopping_list"
+    )
+
+def _own_lists_first(user_id: int):
+    """ORDER BY clause: owned lists, then shared ones, oldest first"""
+    return (ShoppingList.owner_id != user_id), ShoppingList.id
+
 # Shopping Lists endpoints
 @router.post("/", response_model=ShoppingListSchema, status_code=status.HTTP_201_CREATED)
 def create_shopping_list(
@@ -34,21 +107,84 @@ def get_shopping_lists(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get lists owned by user
-    owned_lists = db.query(ShoppingList).filter(
-        ShoppingList.owner_id == current_user.id
-    ).all()
-
-    # Get lists shared with user
-    shared_list_ids = db.query(SharedList.shopping_list_id).filter(
-        SharedList.shared_with_id == current_user.id
-    ).all()
-    shared_lists = db.query(ShoppingList).filter(
-        ShoppingList.id.in_([sl_id[0] for sl_id in shared_list_ids])
-    ).all()
-
-    all_lists = owned_lists + shared_lists
-    return all_lists[skip:skip + limit]
+    """Owned and shared lists with their items, in two queries however many lists there are"""
+    return db.query(ShoppingList)\
+        .options(joinedload(ShoppingList.owner))\
+        .options(selectinload(ShoppingList.items))\
+        .filter(accessible_lists(current_user.id))\
+        .order_by(*_own_lists_first(current_user.id))\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
+
+@router.get("/summary", response_model=List[ShoppingListSummary])
+def get_shopping_lists_summary(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Owned and shared lists with item counts instead of the items, in one query"""
+    item_count = select(func.count(ShoppingItem.id))\
+        .where(ShoppingItem.shopping_list_id == ShoppingList.id)\
+        .correlate(ShoppingList)\
+        .scalar_subquery()
+    completed_count = select(func.coalesce(func.sum(case((ShoppingItem.completato.is_(True), 1), else_=0)), 0))\
+        .where(ShoppingItem.shopping_list_id == ShoppingList.id)\
+        .correlate(ShoppingList)\
+        .scalar_subquery()
+
+    rows = db.query(ShoppingList, item_count, completed_count)\
+        .options(joinedload(ShoppingList.owner))\
+        .filter(accessible_lists(current_user.id))\
+        .order_by(*_own_lists_first(current_user.id))\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
+
+    shopping_lists = []
+    for shopping_list, items, completed in rows:
+        shopping_list.item_count = items
+        shopping_list.completed_count = completed
+        shopping_lists.append(shopping_list)
+
+    return shopping_lists
+
+@router.get("/to-buy", response_model=List[ShoppingListToBuy])
+def get_items_to_buy(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Uncompleted items of every owned and shared list, grouped by list, in one query
+    served by the partial index ix_shopping_items_to_buy. Lists with nothing to buy are left out.
+    """
+    rows = db.query(ShoppingItem, ShoppingList.nome, ShoppingList.owner_id)\
+        .join(ShoppingList, ShoppingItem.shopping_list_id == ShoppingList.id)\
+        .filter(accessible_lists(current_user.id), ShoppingItem.completato == False)\
+        .order_by(*_own_lists_first(current_user.id), ShoppingItem.normalized_name)\
+        .all()
+
+    to_buy = []
+    for item, nome, owner_id in rows:
+        if not to_buy or to_buy[-1].id != item.shopping_list_id:
+            to_buy.append(ShoppingListToBuy(id=item.shopping_list_id, nome=nome, owner_id=owner_id, items=[]))
+        to_buy[-1].items.append(ShoppingItemSchema.model_validate(item))
+
+    return to_buy
+
+@router.get("/suggestions", response_model=List[ShoppingItemSuggestion])
+def get_item_suggestions(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Item names starting with q (or with a word starting with q) among the items of
+    the user's lists, most added first. Served from memory after the first call.
+    """
+    return get_suggestions(db, current_user.id, q, limit)
 
 @router.get("/{list_id}", response_model=ShoppingListSchema)
 def get_shopping_list(
@@ -119,6 +255,8 @@ def get_shopping_list_by_token(
             db.add(shared)
             db.commit()
             db.refresh(shopping_list)
+            # The list's items are now part of the user's history
+            suggestion_cache.invalidate(current_user.id)
 
             # Notify other members
             notify_shopping_list_members(
@@ -158,6 +296,7 @@ def update_shopping_list(
 
     for key, value in shopping_list_update.dict(exclude_unset=True).items():
         setattr(shopping_list, key, value)
+    shopping_list.version = ShoppingList.version + 1
 
     db.commit()
     db.refresh(shopping_list)
@@ -186,6 +325,53 @@ def delete_shopping_list(
     db.commit()
     return None
 
+@router.get("/{list_id}/changes", response_model=ShoppingListChanges)
+def get_shopping_list_changes(
+    list_id: int,
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Items created, updated or deleted after the since version (0: the whole list).
+    Pass the returned version as since on the next call. With the ETag in
+    If-None-Match the answer is an empty 304 until something changes.
+    """
+    shopping_list = _get_member_list(db, list_id, current_user)
+
+    etag = f'"{shopping_list.version}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # A cursor from the future (e.g. a restored backup) can't be trusted: start over
+    full = since == 0 or since > shopping_list.version
+
+    items = db.query(ShoppingItem).filter(ShoppingItem.shopping_list_id == list_id)
+    if not full:
+        items = items.filter(ShoppingItem.list_version > since)
+    items = items.order_by(ShoppingItem.id).all()
+
+    deleted_item_ids = []
+    if not full:
+        deleted_item_ids = [
+            item_id for (item_id,) in db.query(ShoppingItemTombstone.item_id).filter(
+                ShoppingItemTombstone.shopping_list_id == list_id,
+                ShoppingItemTombstone.list_version > since
+            )
+        ]
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return ShoppingListChanges(
+        version=shopping_list.version,
+        nome=shopping_list.nome,
+        full=full,
+        items=items,
+        deleted_item_ids=deleted_item_ids
+    )
+
 # Shopping Items endpoints
 @router.post("/{list_id}/items", response_model=ShoppingItemSchema, status_code=status.HTTP_201_CREATED)
 def create_shopping_item(
@@ -213,22 +399,19 @@ def create_shopping_item(
                 detail="Non hai accesso a questa lista"
             )
 
-    # Check if item with same name already exists (case-insensitive)
-    existing_item = db.query(ShoppingItem).filter(
-        ShoppingItem.shopping_list_id == list_id,
-        ShoppingItem.nome.ilike(item.nome.strip())
-    ).first()
-
-    if existing_item:
+    # Items with the same name (ignoring case, accents and spaces) are rejected by the unique index
+    version = bump_list_version(db, list_id)
+    inserted = insert_items(db, [{**item.dict(), "shopping_list_id": list_id, "list_version": version}])
+    if not inserted:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"L'articolo '{item.nome}' è già presente nella lista"
+            detail=duplicate_item_error(item.nome)
         )
-
-    db_item = ShoppingItem(**item.dict(), shopping_list_id=list_id)
-    db.add(db_item)
+    db_item = inserted[0]
     db.commit()
-    db.refresh(db_item)
+    publish_list_events(db, list_id, [item_event(ITEM_ADDED, db_item, version)])
+    record_item_names(db, list_id, [db_item.nome])
 
     # Notify other members
     notify_shopping_list_members(
@@ -242,6 +425,97 @@ def create_shopping_item(
 
     return db_item
 
+@router.post("/{list_id}/items/batch", response_model=ShoppingItemBatchResult)
+def apply_shopping_item_operations(
+    list_id: int,
+    batch: ShoppingItemBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add, update, complete and delete many items of a list in one transaction.
+    Operations are applied in order; failed ones are reported by index and skipped.
+    Members get a single notification for the whole batch.
+    """
+    shopping_list = _get_member_list(db, list_id, current_user)
+
+    version, results, added, completed = apply_item_operations(db, list_id, batch.operations, current_user.id)
+    failed = sum(1 for result in results if not result.success)
+    if failed == len(results):
+        # Nothing went through: keep the list version (additions may have bumped it before conflicting)
+        db.rollback()
+        return ShoppingItemBatchResult(applied=0, failed=failed, results=results)
+
+    notifications = _enqueue_list_update(db, shopping_list, current_user, added, completed)
+
+    db.commit()
+    publish_list_events(db, list_id, operation_events(batch.operations, results, version))
+    record_item_names(db, list_id, [row.nome for row in added])
+    push_notifications(notifications)
+
+    return ShoppingItemBatchResult(applied=len(results) - failed, failed=failed, results=results)
+
+@router.post("/{list_id}/replay", response_model=ShoppingListReplayResult)
+def replay_shopping_list_mutations(
+    list_id: int,
+    replay: ShoppingListReplay,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply the changes queued by a client while offline, in one transaction, and
+    return the whole list as the server sees it. Mutations already replayed are
+    skipped; conflicts are settled last-writer-wins on completato and quantita.
+    """
+    shopping_list = _get_member_list(db, list_id, current_user)
+
+    version, changed, results, items, added, completed = replay_mutations(
+        db, list_id, replay.mutations, current_user.id
+    )
+    # Serialized before the commit expires the items
+    replayed = ShoppingListReplayResult(version=version, nome=shopping_list.nome, items=items, results=results)
+    if not changed and all(result.status == "duplicate" for result in results):
+        # A queue resent after a lost response: nothing to commit, publish or notify
+        db.rollback()
+        return replayed
+
+    notifications = _enqueue_list_update(db, shopping_list, current_user, added, completed)
+    events = replay_events(replay.mutations, results, items, added, completed, version) if changed else []
+    added_names = [item.nome for item in added]
+
+    db.commit()
+    publish_list_events(db, list_id, events)
+    record_item_names(db, list_id, added_names)
+    push_notifications(notifications)
+
+    return replayed
+
+@router.delete("/{list_id}/items/completed", status_code=status.HTTP_204_NO_CONTENT)
+def clear_completed_items(
+    list_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete every completed item of the list with one DELETE, leaving a tombstone for each"""
+    _get_member_list(db, list_id, current_user)
+
+    version = bump_list_version(db, list_id)
+    deleted_ids = db.execute(
+        delete(ShoppingItem)
+        .where(ShoppingItem.shopping_list_id == list_id, ShoppingItem.completato == True)
+        .returning(ShoppingItem.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if not deleted_ids:
+        # Nothing changed: keep the list version
+        db.rollback()
+        return None
+
+    record_deletions(db, list_id, deleted_ids, version)
+    db.commit()
+    publish_list_events(db, list_id, [item_deleted_event(item_id, version) for item_id in deleted_ids])
+    return None
+
 @router.put("/{list_id}/items/{item_id}", response_model=ShoppingItemSchema)
 def update_shopping_item(
     list_id: int,
@@ -250,58 +524,61 @@ def update_shopping_item(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Check access to list
-    shopping_list = db.query(ShoppingList).filter(ShoppingList.id == list_id).first()
-    if not shopping_list:
+    # The access check is part of the list version UPDATE: on the happy path the
+    # list and the item are each updated with a single statement
+    list_version = bump_list_version(db, list_id, current_user.id)
+    if list_version is None:
+        _get_member_list(db, list_id, current_user)
+
+    try:
+        item, is_being_completed = update_item(
+            db,
+            list_id,
+            item_id,
+            item_update.model_dump(exclude_unset=True, exclude={"version"}),
+            item_update.version,
+            list_version,
+            current_user.id
+        )
+    except IntegrityError:
+        # Renamed to the name of another item of the list
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Lista non trovata"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_item_error(item_update.nome)
         )
 
-    if shopping_list.owner_id != current_user.id:
-        shared = db.query(SharedList).filter(
-            SharedList.shopping_list_id == list_id,
-            SharedList.shared_with_id == current_user.id
+    if item is None:
+        exists = db.query(ShoppingItem.id).filter(
+            ShoppingItem.id == item_id,
+            ShoppingItem.shopping_list_id == list_id
         ).first()
-        if not shared:
+        db.rollback()
+        if not exists:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Non hai accesso a questa lista"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Articolo non trovato"
             )
-
-    item = db.query(ShoppingItem).filter(
-        ShoppingItem.id == item_id,
-        ShoppingItem.shopping_list_id == list_id
-    ).first()
-
-    if not item:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Articolo non trovato"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="L'articolo è stato modificato da qualcun altro: ricarica la lista"
         )
 
-    # Check if item is being marked as completed
-    was_completed_before = item.completato
-    is_being_completed = item_update.completato is True and not was_completed_before
-
-    for key, value in item_update.dict(exclude_unset=True).items():
-        setattr(item, key, value)
-
-    # If marking as completed, save who completed it
-    if item_update.completato is True:
-        item.completed_by_id = current_user.id
-
+    item = ShoppingItemSchema.model_validate(item)
     db.commit()
-    db.refresh(item)
+    publish_list_events(db, list_id, [
+        item_event(ITEM_COMPLETED if is_being_completed else ITEM_UPDATED, item, list_version)
+    ])
 
     # Notify other members if item was completed
     if is_being_completed:
+        list_name = db.query(ShoppingList.nome).filter(ShoppingList.id == list_id).scalar()
         notify_shopping_list_members(
             db=db,
             shopping_list_id=list_id,
             notification_type="shopping_list",
             title="Articolo completato",
-            message=f"{current_user.nome} ha completato '{item.nome}' nella lista '{shopping_list.nome}'",
+            message=f"{current_user.nome} ha completato '{item.nome}' nella lista '{list_name}'",
             exclude_user_id=current_user.id
         )
 
@@ -344,6 +621,9 @@ def delete_shopping_item(
             detail="Articolo non trovato"
         )
 
+    version = bump_list_version(db, list_id)
+    record_deletions(db, list_id, [item.id], version)
     db.delete(item)
     db.commit()
+    publish_list_events(db, list_id, [item_deleted_event(item_id, version)])
     return None
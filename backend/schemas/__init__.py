@@ -1,14 +1,19 @@
 from .user import UserCreate, UserLogin, User, Token
 from .expense import (
-    ExpenseCreate, ExpenseUpdate, Expense,
-    GroupCreate, GroupUpdate, Group,
+    ExpenseCreate, ExpenseUpdate, Expense, ExpenseSearchResult, ExpenseReceipt,
+    GroupCreate, GroupUpdate, Group, GroupSummary,
     GroupMemberCreate, GroupMember,
     ExpenseParticipantCreate, ExpenseParticipant,
-    Balance
+    Balance, GroupBalance, MyBalances, Transfer, ExpenseImportResult,
+    MonthlyTotal, UserMonthlyTotal,
+    RecurringExpenseCreate, RecurringExpenseUpdate, RecurringExpense
 )
 from .shopping import (
-    ShoppingListCreate, ShoppingListUpdate, ShoppingList,
-    ShoppingItemCreate, ShoppingItemUpdate, ShoppingItem,
+    ShoppingListCreate, ShoppingListUpdate, ShoppingList, ShoppingListSummary, ShoppingListChanges,
+    ShoppingListToBuy,
+    ShoppingItemCreate, ShoppingItemUpdate, ShoppingItem, ShoppingItemSuggestion,
+    ShoppingItemOperation, ShoppingItemBatch, ShoppingItemOperationResult, ShoppingItemBatchResult,
+    ShoppingListMutation, ShoppingListReplay, ShoppingListMutationResult, ShoppingListReplayResult,
     UserBasic
 )
 from .gym import (
@@ -18,13 +23,18 @@ from .gym import (
 
 __all__ = [
     "UserCreate", "UserLogin", "User", "Token",
-    "ExpenseCreate", "ExpenseUpdate", "Expense",
-    "GroupCreate", "GroupUpdate", "Group",
+    "ExpenseCreate", "ExpenseUpdate", "Expense", "ExpenseSearchResult", "ExpenseReceipt",
+    "GroupCreate", "GroupUpdate", "Group", "GroupSummary",
     "GroupMemberCreate", "GroupMember",
     "ExpenseParticipantCreate", "ExpenseParticipant",
-    "Balance",
-    "ShoppingListCreate", "ShoppingListUpdate", "ShoppingList",
-    "ShoppingItemCreate", "ShoppingItemUpdate", "ShoppingItem",
+    "Balance", "GroupBalance", "MyBalances", "Transfer", "ExpenseImportResult",
+    "MonthlyTotal", "UserMonthlyTotal",
+    "RecurringExpenseCreate", "RecurringExpenseUpdate", "RecurringExpense",
+    "ShoppingListCreate", "ShoppingListUpdate", "ShoppingList", "ShoppingListSummary", "ShoppingListChanges",
+    "ShoppingListToBuy",
+    "ShoppingItemCreate", "ShoppingItemUpdate", "ShoppingItem", "ShoppingItemSuggestion",
+    "ShoppingItemOperation", "ShoppingItemBatch", "ShoppingItemOperationResult", "ShoppingItemBatchResult",
+    "ShoppingListMutation", "ShoppingListReplay", "ShoppingListMutationResult", "ShoppingListReplayResult",
     "UserBasic",
     "WorkoutCardCreate", "WorkoutCardUpdate", "WorkoutCard",
     "ExerciseCreate", "ExerciseUpdate", "Exercise"
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, field_validator
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime
 from typing import Optional, List
-from models.expense import ExpenseTag, DivisionType
+from models.expense import ExpenseTag, DivisionType, RecurrenceFrequency, parse_tag
 
 # User schema for nested relationships
 class UserBasic(BaseModel):
@@ -41,11 +41,24 @@ class ExpenseBase(BaseModel):
 class ExpenseCreate(ExpenseBase):
     participants: List[ExpenseParticipantCreate]
 
+    @field_validator('tag', mode='before')
+    @classmethod
+    def normalize_tag(cls, v):
+        """Accept tag names in any case, and legacy names, once at write time"""
+        return parse_tag(v)
+
 class ExpenseUpdate(BaseModel):
     descrizione: Optional[str] = None
     importo: Optional[float] = None
     tag: Optional[ExpenseTag] = None
     division_type: Optional[DivisionType] = None
+    participants: Optional[List[ExpenseParticipantCreate]] = None
+
+    @field_validator('tag', mode='before')
+    @classmethod
+    def normalize_tag(cls, v):
+        """Accept tag names in any case, and legacy names, once at write time"""
+        return v if v is None else parse_tag(v)
 
 class Expense(ExpenseBase):
     id: int
@@ -53,36 +66,94 @@ class Expense(ExpenseBase):
     updated_at: Optional[datetime] = None
     participants: List[ExpenseParticipant] = []
 
+    class Config:
+        from_attributes = True
+
+class ExpenseSearchResult(Expense):
+    group_name: str
+    rank: float
+
+class ExpenseReceipt(BaseModel):
+    id: int
+    expense_id: int
+    uploaded_by_id: Optional[int] = None
+    filename: str
+    content_type: str
+    size: int
+    has_thumbnail: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Recurring expenses
+class RecurringExpenseParticipant(ExpenseParticipantBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class RecurringExpenseBase(BaseModel):
+    descrizione: Optional[str] = None
+    importo: float
+    tag: ExpenseTag
+    division_type: DivisionType
+    paid_by_id: int
+    frequency: RecurrenceFrequency = RecurrenceFrequency.MENSILE
+    interval: int = Field(1, ge=1)
+    start_date: date
+    end_date: Optional[date] = None
+
+class RecurringExpenseCreate(RecurringExpenseBase):
+    participants: List[ExpenseParticipantCreate]
+
+    @field_validator('tag', mode='before')
+    @classmethod
+    def normalize_tag(cls, v):
+        """Accept tag names in any case, and legacy names, once at write time"""
+        return parse_tag(v)
+
+class RecurringExpenseUpdate(BaseModel):
+    descrizione: Optional[str] = None
+    importo: Optional[float] = None
+    tag: Optional[ExpenseTag] = None
+    division_type: Optional[DivisionType] = None
+    paid_by_id: Optional[int] = None
+    frequency: Optional[RecurrenceFrequency] = None
+    interval: Optional[int] = Field(None, ge=1)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    active: Optional[bool] = None
+    participants: Optional[List[ExpenseParticipantCreate]] = None
+
     @field_validator('tag', mode='before')
     @classmethod
     def normalize_tag(cls, v):
-        """Normalize tag values from database to match enum values"""
-        if isinstance(v, str):
-            # Mapping of old/wrong case tags to correct enum values
-            tag_mapping = {
-                'ALTRO': 'Altro',
-                'BOLLETTA': 'Altro',
-                'SPESA': 'Spesa Alimentare',
-                'CANI': 'Animali Domestici',
-                'PRANZO/CENA': 'Pranzo/Cena',
-                # Add uppercase versions
-                'BOLLETTA ACQUA': 'Bolletta Acqua',
-                'BOLLETTA LUCE': 'Bolletta Luce',
-                'BOLLETTA GAS': 'Bolletta Gas',
-                'INTERNET/TELEFONO': 'Internet/Telefono',
-                'AFFITTO': 'Affitto',
-                'SPESA ALIMENTARE': 'Spesa Alimentare',
-                'TRASPORTI': 'Trasporti',
-                'SALUTE': 'Salute',
-                'ANIMALI DOMESTICI': 'Animali Domestici',
-                'SVAGO/INTRATTENIMENTO': 'Svago/Intrattenimento',
-            }
-            return tag_mapping.get(v, v)
-        return v
+        """Accept tag names in any case, and legacy names, once at write time"""
+        return v if v is None else parse_tag(v)
+
+class RecurringExpense(RecurringExpenseBase):
+    id: int
+    group_id: int
+    creator_id: Optional[int] = None
+    next_run: date
+    active: bool
+    created_at: datetime
+    participants: List[RecurringExpenseParticipant] = []
 
     class Config:
         from_attributes = True
 
+# Bulk import
+class ExpenseImportError(BaseModel):
+    row: int
+    error: str
+
+class ExpenseImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ExpenseImportError] = []
+
 # Groups
 class GroupBase(BaseModel):
     nome: str
@@ -119,7 +190,21 @@ class Group(GroupBase):
     creator: Optional[UserBasic] = None
     members: List[GroupMember] = []
     member_users: List[UserBasic] = []
-    expenses: List[Expense] = []
+
+    class Config:
+        from_attributes = True
+
+class GroupSummary(GroupBase):
+    """Lightweight group representation for lists: counts instead of nested collections"""
+    id: int
+    creator_id: int
+    share_token: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    member_count: int = 0
+    expense_count: int = 0
+    last_activity: Optional[datetime] = None
+    my_balance: float = 0
 
     class Config:
         from_attributes = True
@@ -131,3 +216,39 @@ class Balance(BaseModel):
     total_paid: float
     total_owed: float
     balance: float
+
+class GroupBalance(BaseModel):
+    group_id: int
+    group_name: str
+    total_paid: float
+    total_owed: float
+    balance: float
+
+class MyBalances(BaseModel):
+    groups: List[GroupBalance]
+    total_paid: float
+    total_owed: float
+    balance: float
+
+# Analytics
+class MonthlyTotal(BaseModel):
+    month: date
+    tag: str
+    user_id: int
+    user_name: str
+    total_paid: float
+    total_owed: float
+
+class UserMonthlyTotal(BaseModel):
+    month: date
+    tag: str
+    total_paid: float
+    total_owed: float
+
+# Settlement
+class Transfer(BaseModel):
+    from_user_id: int
+    from_user_name: str
+    to_user_id: int
+    to_user_name: str
+    amount: float
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional, List, TYPE_CHECKING
+from typing import Optional, List, Literal, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .user import User
@@ -30,17 +30,98 @@ class ShoppingItemUpdate(BaseModel):
     quantita: Optional[str] = None
     note: Optional[str] = None
     completato: Optional[bool] = None
+    version: Optional[int] = None  # Item version read by the client: 409 if it changed since
 
 class ShoppingItem(ShoppingItemBase):
     id: int
     shopping_list_id: int
     completed_by_id: Optional[int] = None
+    version: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class ShoppingItemSuggestion(BaseModel):
+    nome: str
+    count: int  # Times the item was added to the user's lists
+
+# Batch item operations
+class ShoppingItemOperation(BaseModel):
+    op: Literal["add", "update", "complete", "delete"]
+    item_id: Optional[int] = None  # Required for update, complete and delete
+    nome: Optional[str] = None  # Required for add
+    quantita: Optional[str] = None
+    note: Optional[str] = None
+    completato: Optional[bool] = None
+
+    @model_validator(mode='after')
+    def check_required_fields(self):
+        if self.op == "add" and not (self.nome and self.nome.strip()):
+            raise ValueError("nome è obbligatorio per 'add'")
+        if self.op != "add" and self.item_id is None:
+            raise ValueError(f"item_id è obbligatorio per '{self.op}'")
+        return self
+
+class ShoppingItemBatch(BaseModel):
+    operations: List[ShoppingItemOperation] = Field(..., min_length=1, max_length=200)
+
+class ShoppingItemOperationResult(BaseModel):
+    index: int
+    op: str
+    success: bool
+    item: Optional[ShoppingItem] = None  # Not set for deletes and failures
+    error: Optional[str] = None
+
+class ShoppingItemBatchResult(BaseModel):
+    applied: int
+    failed: int
+    results: List[ShoppingItemOperationResult]
+
+# Offline replay
+class ShoppingListMutation(BaseModel):
+    client_id: str = Field(..., min_length=1, max_length=64)  # Unique per list, makes retries harmless
+    timestamp: datetime  # When the change was made on the client
+    op: Literal["add", "update", "complete", "delete"]
+    item_id: Optional[int] = None  # Items added offline have no id yet: they are referenced by nome
+    nome: Optional[str] = None
+    quantita: Optional[str] = None
+    note: Optional[str] = None
+    completato: Optional[bool] = None
+
+    @model_validator(mode='after')
+    def check_required_fields(self):
+        if self.op == "add" and not (self.nome and self.nome.strip()):
+            raise ValueError("nome è obbligatorio per 'add'")
+        if self.op != "add" and self.item_id is None and not (self.nome and self.nome.strip()):
+            raise ValueError(f"item_id o nome è obbligatorio per '{self.op}'")
+        return self
+
+class ShoppingListReplay(BaseModel):
+    mutations: List[ShoppingListMutation] = Field(..., min_length=1, max_length=500)
+
+class ShoppingListMutationResult(BaseModel):
+    client_id: str
+    # applied; superseded: newer values already on the server; duplicate: replayed before; rejected: see error
+    status: Literal["applied", "superseded", "duplicate", "rejected"]
+    item_id: Optional[int] = None
+    error: Optional[str] = None
+
+class ShoppingListReplayResult(BaseModel):
+    version: int
+    nome: str
+    items: List[ShoppingItem]  # The whole list after the replay: replace the local copy
+    results: List[ShoppingListMutationResult]
+
+# Delta sync
+class ShoppingListChanges(BaseModel):
+    version: int  # Pass it as since on the next call
+    nome: str
+    full: bool  # True when items is the whole list: replace the local copy
+    items: List[ShoppingItem]  # Created or updated since the requested version
+    deleted_item_ids: List[int]
+
 # Shopping Lists
 class ShoppingListBase(BaseModel):
     nome: str
@@ -59,10 +140,29 @@ class SharedListMember(BaseModel):
     class Config:
         from_attributes = True
 
+class ShoppingListSummary(ShoppingListBase):
+    id: int
+    owner_id: int
+    share_token: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    owner: Optional[UserBasic] = None
+    item_count: int
+    completed_count: int
+
+    class Config:
+        from_attributes = True
+
+class ShoppingListToBuy(ShoppingListBase):
+    id: int
+    owner_id: int
+    items: List[ShoppingItem]  # Uncompleted items only
+
 class ShoppingList(ShoppingListBase):
     id: int
     owner_id: int
     share_token: str
+    version: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
     items: List[ShoppingItem] = []
@@ -0,0 +1,70 @@
+"""
+Fixtures for the API tests: the app runs against a throwaway SQLite database,
+emptied before every test. Run from backend/ with: python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+# Before importing the app: database.py reads DATABASE_URL at import time
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gestionale-tests-'), 'test.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import contextmanager
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from auth import create_access_token
+from database import Base, SessionLocal, engine
+from models.user import User
+from utils.settlement import settlement_cache
+from utils.suggestions import suggestion_cache
+import main
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # The in-process caches are keyed by ids, which start over with every database
+    settlement_cache.__init__()
+    suggestion_cache.__init__()
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def make_user():
+    """Create a user, returning (id, auth headers)"""
+    def make(n: int):
+        db = SessionLocal()
+        try:
+            user = User(email=f"user{n}@example.com", nome=f"Nome{n}", cognome=f"Cognome{n}", hashed_password="x")
+            db.add(user)
+            db.commit()
+            return user.id, {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+        finally:
+            db.close()
+    return make
+
+
+@pytest.fixture
+def statements():
+    """Context manager collecting the SQL statements executed inside it"""
+    @contextmanager
+    def collect():
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield executed
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return collect
@@ -0,0 +1,56 @@
+from rebuild_analytics import rebuild_analytics
+from rebuild_balances import rebuild_balances
+
+
+def _group(client, make_user):
+    users = [make_user(n) for n in range(3)]
+    headers = users[0][1]
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    for user_id, _ in users[1:]:
+        client.post(f"/api/expenses/groups/{group['id']}/members", json={"user_id": user_id}, headers=headers)
+    return group["id"], [user_id for user_id, _ in users], [user_headers for _, user_headers in users]
+
+
+def _balances(client, group_id, headers):
+    return {
+        balance["user_id"]: round(balance["balance"], 2)
+        for balance in client.get(f"/api/expenses/groups/{group_id}/balances", headers=headers).json()
+    }
+
+
+def test_ledger_follows_expense_changes(client, make_user):
+    group_id, (a, b, c), (headers, b_headers, _) = _group(client, make_user)
+    equal = client.post("/api/expenses/expenses", json={
+        "importo": 90, "tag": "Affitto", "division_type": "Uguale", "paid_by_id": a, "group_id": group_id,
+        "participants": [{"user_id": a}, {"user_id": b}, {"user_id": c}],
+    }, headers=headers).json()
+    exact = client.post("/api/expenses/expenses", json={
+        "importo": 50, "tag": "Altro", "division_type": "Importi esatti", "paid_by_id": b, "group_id": group_id,
+        "participants": [{"user_id": a, "importo": 20}, {"user_id": c, "importo": 30}],
+    }, headers=b_headers).json()
+    assert _balances(client, group_id, headers) == {a: 40.0, b: 20.0, c: -60.0}
+
+    client.put(f"/api/expenses/expenses/{equal['id']}", json={"importo": 120}, headers=headers)
+    assert _balances(client, group_id, headers) == {a: 60.0, b: 10.0, c: -70.0}
+
+    assert client.delete(f"/api/expenses/expenses/{exact['id']}", headers=b_headers).status_code == 204
+    assert _balances(client, group_id, headers) == {a: 80.0, b: -40.0, c: -40.0}
+
+    # The ledger and the monthly rollup match a recomputation from the expense history
+    assert rebuild_balances(fix=False) == 0
+    assert rebuild_analytics(fix=False) == 0
+
+
+def test_settlement_is_recomputed_after_a_change(client, make_user):
+    group_id, (a, b, c), (headers, b_headers, _) = _group(client, make_user)
+    expense = {
+        "importo": 30, "tag": "Altro", "division_type": "Uguale", "paid_by_id": a, "group_id": group_id,
+        "participants": [{"user_id": a}, {"user_id": b}, {"user_id": c}],
+    }
+    client.post("/api/expenses/expenses", json=expense, headers=headers)
+    first = client.get(f"/api/expenses/groups/{group_id}/settlement", headers=headers).json()
+    assert sorted((t["from_user_id"], t["to_user_id"], t["amount"]) for t in first) == [(b, a, 10.0), (c, a, 10.0)]
+
+    client.post("/api/expenses/expenses", json={**expense, "paid_by_id": b}, headers=b_headers)
+    second = client.get(f"/api/expenses/groups/{group_id}/settlement", headers=headers).json()
+    assert sorted((t["from_user_id"], t["to_user_id"], t["amount"]) for t in second) == [(c, a, 10.0), (c, b, 10.0)]
@@ -0,0 +1,83 @@
+from sqlalchemy import func
+from database import SessionLocal
+from models.expense import Expense, ExpenseParticipant, GroupMember, GroupMemberBalance, ExpenseMonthlyTotal
+from models.gym import WorkoutDay, Exercise
+from models.shopping import ShoppingItem, ShoppingItemTombstone, SharedList
+
+
+def _count(model):
+    db = SessionLocal()
+    try:
+        return db.query(func.count(model.id)).scalar()
+    finally:
+        db.close()
+
+
+def _deletes(executed):
+    return [statement for statement in executed if statement.lstrip().upper().startswith("DELETE")]
+
+
+def test_group_delete_cascades_in_the_database(client, make_user, statements):
+    (a, headers), (b, _) = make_user(1), make_user(2)
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    client.post(f"/api/expenses/groups/{group['id']}/members", json={"user_id": b}, headers=headers)
+    for importo in (10, 20):
+        client.post("/api/expenses/expenses", json={
+            "importo": importo, "tag": "Altro", "division_type": "Uguale", "paid_by_id": a,
+            "group_id": group["id"], "participants": [{"user_id": a}, {"user_id": b}],
+        }, headers=headers)
+
+    with statements() as executed:
+        assert client.delete(f"/api/expenses/groups/{group['id']}", headers=headers).status_code == 204
+
+    assert len(_deletes(executed)) == 1
+    for model in (Expense, ExpenseParticipant, GroupMember, GroupMemberBalance, ExpenseMonthlyTotal):
+        assert _count(model) == 0, model.__name__
+
+
+def test_list_delete_cascades_in_the_database(client, make_user, statements):
+    (_, headers), (_, other) = make_user(1), make_user(2)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    url = f"/api/shopping-lists/{shopping_list['id']}"
+    client.get(f"/api/shopping-lists/shared/{shopping_list['share_token']}", headers=other)
+    for nome in ("Latte", "Pane"):
+        client.post(f"{url}/items", json={"nome": nome}, headers=headers)
+
+    with statements() as executed:
+        assert client.delete(url, headers=headers).status_code == 204
+
+    assert len(_deletes(executed)) == 1
+    assert (_count(ShoppingItem), _count(SharedList)) == (0, 0)
+
+
+def test_workout_card_delete_cascades_in_the_database(client, make_user):
+    _, headers = make_user(1)
+    card = client.post("/api/gym/cards", json={"nome": "Forza", "days": [
+        {"nome": "A", "exercises": [{"nome": "Squat"}, {"nome": "Panca"}]},
+        {"nome": "B", "exercises": [{"nome": "Stacco"}]},
+    ]}, headers=headers).json()
+
+    assert client.delete(f"/api/gym/cards/{card['id']}", headers=headers).status_code == 204
+    assert (_count(WorkoutDay), _count(Exercise)) == (0, 0)
+
+
+def test_clear_completed_items(client, make_user):
+    _, headers = make_user(1)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    url = f"/api/shopping-lists/{shopping_list['id']}"
+    items = [client.post(f"{url}/items", json={"nome": nome}, headers=headers).json() for nome in ("Latte", "Pane", "Uova")]
+    for item in items[:2]:
+        client.put(f"{url}/items/{item['id']}", json={"completato": True}, headers=headers)
+    version = client.get(url, headers=headers).json()["version"]
+
+    assert client.delete(f"{url}/items/completed", headers=headers).status_code == 204
+
+    changes = client.get(f"{url}/changes", params={"since": version}, headers=headers).json()
+    assert changes["version"] == version + 1
+    assert sorted(changes["deleted_item_ids"]) == sorted(item["id"] for item in items[:2])
+    assert [item["nome"] for item in client.get(url, headers=headers).json()["items"]] == ["Uova"]
+    assert _count(ShoppingItemTombstone) == 2
+
+    # Nothing left to clear: the list version stays
+    assert client.delete(f"{url}/items/completed", headers=headers).status_code == 204
+    assert client.get(url, headers=headers).json()["version"] == version + 1
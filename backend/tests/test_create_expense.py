@@ -0,0 +1,37 @@
+def _group_with_members(client, make_user, count):
+    users = [make_user(n) for n in range(count)]
+    owner_id, headers = users[0]
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    for user_id, _ in users[1:]:
+        response = client.post(f"/api/expenses/groups/{group['id']}/members", json={"user_id": user_id}, headers=headers)
+        assert response.status_code in (200, 201)
+    return group["id"], [user_id for user_id, _ in users], headers
+
+
+def _create(client, headers, group_id, payer_id, participant_ids):
+    response = client.post("/api/expenses/expenses", json={
+        "descrizione": "Spesa",
+        "importo": 100,
+        "tag": "Altro",
+        "division_type": "Uguale",
+        "paid_by_id": payer_id,
+        "group_id": group_id,
+        "participants": [{"user_id": user_id} for user_id in participant_ids],
+    }, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_statement_count_does_not_grow_with_participants(client, make_user, statements):
+    group_id, user_ids, headers = _group_with_members(client, make_user, 20)
+    # Warm up: the first expense creates the ledger and rollup rows of every member
+    _create(client, headers, group_id, user_ids[0], user_ids)
+
+    counts = {}
+    for num_participants in (1, 20):
+        with statements() as executed:
+            expense = _create(client, headers, group_id, user_ids[0], user_ids[:num_participants])
+        assert len(expense["participants"]) == num_participants
+        counts[num_participants] = len(executed)
+
+    assert counts[1] == counts[20]
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+
+def _group(client, headers, member_id):
+    group_id = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()["id"]
+    client.post(f"/api/expenses/groups/{group_id}/members", json={"user_id": member_id}, headers=headers)
+    return group_id
+
+
+def _balances(client, group_id, headers):
+    return {
+        balance["user_id"]: round(balance["balance"], 2)
+        for balance in client.get(f"/api/expenses/groups/{group_id}/balances", headers=headers).json()
+    }
+
+
+def _fill(client, headers, group_id, a, b):
+    client.post("/api/expenses/expenses", json={
+        "descrizione": "Affitto", "importo": 100, "tag": "Affitto", "division_type": "Uguale",
+        "paid_by_id": a, "group_id": group_id, "participants": [{"user_id": a}, {"user_id": b}],
+    }, headers=headers)
+    client.post("/api/expenses/expenses", json={
+        "descrizione": "Luce, gas", "importo": 30, "tag": "Bolletta Luce", "division_type": "Percentuale",
+        "paid_by_id": a, "group_id": group_id,
+        "participants": [{"user_id": a, "percentuale": 20}, {"user_id": b, "percentuale": 80}],
+    }, headers=headers)
+
+
+def test_csv_export_imports_back(client, make_user):
+    (a, headers), (b, _) = make_user(1), make_user(2)
+    group_id = _group(client, headers, b)
+    _fill(client, headers, group_id, a, b)
+
+    export = client.get(f"/api/expenses/groups/{group_id}/expenses/export", headers=headers)
+    assert export.status_code == 200
+    assert export.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(export.text)))
+    assert [(row["descrizione"], row["tag"], row["participants"]) for row in rows] == [
+        ("Affitto", "Affitto", f"{a};{b}"),
+        ("Luce, gas", "Bolletta Luce", f"{a}:20.0;{b}:80.0"),
+    ]
+
+    copy_id = _group(client, headers, b)
+    result = client.post(
+        f"/api/expenses/groups/{copy_id}/expenses/import",
+        files={"file": ("spese.csv", export.content)},
+        headers=headers
+    ).json()
+    assert (result["imported"], result["failed"]) == (2, 0)
+    assert _balances(client, copy_id, headers) == _balances(client, group_id, headers) == {a: 74.0, b: -74.0}
+
+
+def test_ndjson_export(client, make_user):
+    (a, headers), (b, _) = make_user(1), make_user(2)
+    group_id = _group(client, headers, b)
+    _fill(client, headers, group_id, a, b)
+
+    export = client.get(f"/api/expenses/groups/{group_id}/expenses/export", params={"format": "ndjson"}, headers=headers)
+
+    records = [json.loads(line) for line in export.text.splitlines()]
+    assert [(record["importo"], len(record["participants"])) for record in records] == [(100.0, 2), (30.0, 2)]
+
+
+def test_export_requires_membership(client, make_user):
+    (_, headers), (b, _), (_, stranger) = make_user(1), make_user(2), make_user(3)
+    group_id = _group(client, headers, b)
+
+    assert client.get(f"/api/expenses/groups/{group_id}/expenses/export", headers=stranger).status_code == 403
@@ -0,0 +1,76 @@
+def _group(client, make_user):
+    (a, headers), (b, _) = make_user(1), make_user(2)
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    client.post(f"/api/expenses/groups/{group['id']}/members", json={"user_id": b}, headers=headers)
+    return group["id"], a, b, headers
+
+
+def _import(client, group_id, headers, filename, content, **params):
+    return client.post(
+        f"/api/expenses/groups/{group_id}/expenses/import",
+        params=params,
+        files={"file": (filename, content.encode("utf-8"))},
+        headers=headers
+    )
+
+
+def _balances(client, group_id, headers):
+    return {
+        balance["user_id"]: round(balance["balance"], 2)
+        for balance in client.get(f"/api/expenses/groups/{group_id}/balances", headers=headers).json()
+    }
+
+
+def test_csv_import_reports_invalid_rows(client, make_user):
+    group_id, a, b, headers = _group(client, make_user)
+    content = (
+        "descrizione,importo,tag,division_type,paid_by_id,participants,created_at\n"
+        f"Affitto,100,affitto,uguale,{a},{a};{b},2025-01-05T10:00:00\n"
+        f"Luce,30,Bolletta Luce,Importi esatti,{b},{a}:10;{b}:20,\n"
+        f"Gas,abc,Bolletta Gas,Uguale,{a},{a},\n"
+        f"Svago,10,Sconosciuto,Uguale,{a},{a},\n"
+        f"Cena,20,Pranzo/Cena,Uguale,{a},{a};999,\n"
+    )
+
+    result = _import(client, group_id, headers, "spese.csv", content).json()
+
+    assert (result["imported"], result["failed"]) == (2, 3)
+    assert [error["row"] for error in result["errors"]] == [3, 4, 5]
+    assert "999" in result["errors"][2]["error"]
+    assert _balances(client, group_id, headers) == {a: 40.0, b: -40.0}
+
+
+def test_ndjson_import_skips_lines_that_are_not_objects(client, make_user):
+    group_id, a, b, headers = _group(client, make_user)
+    content = "\n".join([
+        f'{{"importo": 50, "tag": "Altro", "division_type": "Uguale", "paid_by_id": {a}, "participants": [{{"user_id": {b}}}]}}',
+        "[1, 2]",
+        "{not json",
+        f'{{"importo": 10, "tag": "Altro", "division_type": "Uguale", "paid_by_id": {a}, "participants": [{b}]}}',
+        "",
+    ])
+
+    result = _import(client, group_id, headers, "spese.ndjson", content).json()
+
+    assert (result["imported"], result["failed"]) == (1, 3)
+    assert [error["row"] for error in result["errors"]] == [2, 3, 4]
+    assert _balances(client, group_id, headers) == {a: 50.0, b: -50.0}
+
+
+def test_dry_run_imports_nothing(client, make_user):
+    group_id, a, b, headers = _group(client, make_user)
+    content = f"importo,tag,paid_by_id,participants\n25,Altro,{a},{a};{b}\n"
+
+    result = _import(client, group_id, headers, "spese.csv", content, dry_run=True).json()
+
+    assert (result["imported"], result["failed"]) == (1, 0)
+    assert client.get("/api/expenses/expenses", params={"group_id": group_id}, headers=headers).json() == []
+    assert _balances(client, group_id, headers) == {a: 0.0, b: 0.0}
+
+
+def test_import_requires_membership(client, make_user):
+    group_id, a, _, _ = _group(client, make_user)
+    _, stranger = make_user(3)
+    content = f"importo,tag,paid_by_id,participants\n25,Altro,{a},{a}\n"
+
+    assert _import(client, group_id, stranger, "spese.csv", content).status_code == 403
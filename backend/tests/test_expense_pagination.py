@@ -0,0 +1,33 @@
+def test_expense_history_pages_move_forward(client, make_user):
+    user_id, headers = make_user(1)
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    for importo in range(1, 8):
+        response = client.post("/api/expenses/expenses", json={
+            "importo": importo,
+            "tag": "Altro",
+            "division_type": "Uguale",
+            "paid_by_id": user_id,
+            "group_id": group["id"],
+            "participants": [{"user_id": user_id}],
+        }, headers=headers)
+        assert response.status_code == 201
+
+    ids = []
+    pages = 0
+    cursor = None
+    while True:
+        params = {"group_id": group["id"], "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/expenses/expenses", params=params, headers=headers)
+        assert response.status_code == 200
+        ids.extend(expense["id"] for expense in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        assert pages < 10, "pagination does not move forward"
+
+    assert pages >= 3
+    assert len(ids) == 7
+    assert ids == sorted(set(ids), reverse=True)
@@ -0,0 +1,63 @@
+def _group(client, headers, nome):
+    return client.post("/api/expenses/groups", json={"nome": nome}, headers=headers).json()["id"]
+
+
+def _expense(client, headers, user_id, group_id, descrizione):
+    return client.post("/api/expenses/expenses", json={
+        "descrizione": descrizione, "importo": 10, "tag": "Altro", "division_type": "Uguale",
+        "paid_by_id": user_id, "group_id": group_id, "participants": [{"user_id": user_id}],
+    }, headers=headers).json()["id"]
+
+
+def _search(client, headers, **params):
+    return client.get("/api/expenses/expenses/search", params=params, headers=headers)
+
+
+def test_description_matches_rank_above_group_name_matches(client, make_user):
+    user_id, headers = make_user(1)
+    casa = _group(client, headers, "Casa")
+    pizza_group = _group(client, headers, "Pizzeria")
+    starts = _expense(client, headers, user_id, casa, "Pizza margherita")
+    contains = _expense(client, headers, user_id, casa, "Cena con pizza")
+    by_group = _expense(client, headers, user_id, pizza_group, "Bevande")
+    _expense(client, headers, user_id, casa, "Affitto")
+
+    results = _search(client, headers, q="pizz").json()
+
+    assert [result["id"] for result in results] == [starts, contains, by_group]
+    assert results[2]["group_name"] == "Pizzeria"
+
+
+def test_like_wildcards_are_matched_literally(client, make_user):
+    user_id, headers = make_user(1)
+    casa = _group(client, headers, "Casa")
+    discount = _expense(client, headers, user_id, casa, "Sconto 10%")
+    _expense(client, headers, user_id, casa, "Sconto 100 euro")
+
+    assert [result["id"] for result in _search(client, headers, q="10%").json()] == [discount]
+
+
+def test_search_only_sees_the_user_groups(client, make_user):
+    (a, a_headers), (b, b_headers) = make_user(1), make_user(2)
+    _expense(client, a_headers, a, _group(client, a_headers, "Casa"), "Pizza")
+    other = _group(client, b_headers, "Amici")
+    mine = _expense(client, b_headers, b, other, "Pizza")
+
+    assert [result["id"] for result in _search(client, b_headers, q="pizza").json()] == [mine]
+    assert _search(client, a_headers, q="pizza", group_id=other).status_code == 403
+
+
+def test_search_pages_through_equal_ranks(client, make_user):
+    user_id, headers = make_user(1)
+    casa = _group(client, headers, "Casa")
+    expected = [_expense(client, headers, user_id, casa, f"Spesa {n}") for n in range(5)][::-1]
+
+    ids, cursor = [], None
+    while True:
+        response = _search(client, headers, q="spesa", limit=2, **({"cursor": cursor} if cursor else {}))
+        ids += [result["id"] for result in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert ids == expected
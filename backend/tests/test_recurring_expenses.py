@@ -0,0 +1,72 @@
+from datetime import date, datetime, timezone
+from database import SessionLocal
+from models.expense import Expense, RecurringExpense
+from utils import recurring
+from utils.recurring import materialize_due_expenses
+
+
+def _create_recurring(client, headers, user_id, nome):
+    group = client.post("/api/expenses/groups", json={"nome": nome}, headers=headers).json()
+    response = client.post(f"/api/expenses/groups/{group['id']}/recurring", json={
+        "descrizione": "Affitto",
+        "importo": 900,
+        "tag": "Affitto",
+        "division_type": "Uguale",
+        "paid_by_id": user_id,
+        "start_date": "2025-01-31",
+        "participants": [{"user_id": user_id}],
+    }, headers=headers)
+    assert response.status_code == 201
+    return group["id"], response.json()["id"]
+
+
+def test_catch_up_creates_every_due_occurrence_once(client, make_user):
+    user_id, headers = make_user(1)
+    group_id, _ = _create_recurring(client, headers, user_id, "Casa")
+
+    db = SessionLocal()
+    try:
+        assert materialize_due_expenses(db, today=date(2025, 4, 30)) == 4
+        assert materialize_due_expenses(db, today=date(2025, 4, 30)) == 0
+        created = sorted(
+            created_at.date() for (created_at,) in db.query(Expense.created_at).filter(Expense.group_id == group_id)
+        )
+    finally:
+        db.close()
+    assert created == [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+
+
+def test_failing_group_does_not_block_the_others(client, make_user, monkeypatch):
+    user_id, headers = make_user(1)
+    broken_group_id, broken_id = _create_recurring(client, headers, user_id, "Rotto")
+    group_id, _ = _create_recurring(client, headers, user_id, "Casa")
+
+    apply_rollup_deltas = recurring.apply_rollup_deltas
+
+    def fail_for_broken_group(db, rollup_group_id, deltas):
+        if rollup_group_id == broken_group_id:
+            raise RuntimeError("rollup unavailable")
+        apply_rollup_deltas(db, rollup_group_id, deltas)
+
+    monkeypatch.setattr(recurring, "apply_rollup_deltas", fail_for_broken_group)
+
+    db = SessionLocal()
+    try:
+        assert materialize_due_expenses(db, today=date(2025, 2, 28)) == 2
+        assert db.query(Expense).filter(Expense.group_id == group_id).count() == 2
+        assert db.query(Expense).filter(Expense.group_id == broken_group_id).count() == 0
+        # Rolled back: the broken group is retried at the next pass
+        assert db.get(RecurringExpense, broken_id).next_run == date(2025, 1, 31)
+    finally:
+        db.close()
+
+
+def test_resuming_skips_the_occurrences_missed_while_paused(client, make_user):
+    user_id, headers = make_user(1)
+    _, recurring_id = _create_recurring(client, headers, user_id, "Casa")
+
+    client.put(f"/api/expenses/recurring/{recurring_id}", json={"active": False}, headers=headers)
+    resumed = client.put(f"/api/expenses/recurring/{recurring_id}", json={"active": True}, headers=headers).json()
+
+    assert date.fromisoformat(resumed["next_run"]) >= datetime.now(timezone.utc).date()
+    assert date.fromisoformat(resumed["next_run"]).day in (28, 29, 30, 31)
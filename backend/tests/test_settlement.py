@@ -0,0 +1,36 @@
+from schemas.expense import Balance
+from utils.settlement import simplify_debts
+
+
+def _balances(*amounts):
+    return [
+        Balance(user_id=user_id, user_name=f"Nome{user_id}", total_paid=0, total_owed=0, balance=amount)
+        for user_id, amount in enumerate(amounts, start=1)
+    ]
+
+
+def test_every_balance_is_settled_with_at_most_n_minus_one_transfers():
+    balances = _balances(50.0, 30.0, -20.0, -25.0, -35.0)
+
+    transfers = simplify_debts(balances)
+
+    assert len(transfers) <= len(balances) - 1
+    settled = {balance.user_id: balance.balance for balance in balances}
+    for transfer in transfers:
+        settled[transfer.from_user_id] += transfer.amount
+        settled[transfer.to_user_id] -= transfer.amount
+    assert all(abs(amount) < 0.005 for amount in settled.values())
+
+
+def test_largest_debtor_pays_largest_creditor():
+    transfers = simplify_debts(_balances(60.0, -10.0, -50.0))
+
+    assert [(t.from_user_id, t.to_user_id, t.amount) for t in transfers] == [(3, 1, 50.0), (2, 1, 10.0)]
+    assert transfers[0].from_user_name == "Nome3"
+
+
+def test_rounding_crumbs_are_ignored():
+    # Three-way split of 100: the rounded balances don't add up to zero exactly
+    transfers = simplify_debts(_balances(66.67, -33.33, -33.33, 0.001))
+
+    assert [(t.from_user_id, t.amount) for t in transfers] == [(2, 33.33), (3, 33.33)]
@@ -0,0 +1,42 @@
+def _list_with_item(client, make_user):
+    _, headers = make_user(1)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    url = f"/api/shopping-lists/{shopping_list['id']}"
+    item = client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers).json()
+    return url, headers, item
+
+
+def _list_version(client, url, headers):
+    return client.get(url, headers=headers).json()["version"]
+
+
+def test_batch_applies_operations_as_one_version(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+    version = _list_version(client, url, headers)
+
+    batch = client.post(f"{url}/items/batch", json={"operations": [
+        {"op": "add", "nome": "Pane"},
+        {"op": "complete", "item_id": latte["id"]},
+        {"op": "update", "item_id": 999, "note": "x"},
+    ]}, headers=headers).json()
+
+    assert (batch["applied"], batch["failed"]) == (2, 1)
+    assert _list_version(client, url, headers) == version + 1
+    changes = client.get(f"{url}/changes", params={"since": version}, headers=headers).json()
+    assert sorted(item["nome"] for item in changes["items"]) == ["Latte", "Pane"]
+
+
+def test_failed_batch_keeps_the_list_version(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+    version = _list_version(client, url, headers)
+
+    batch = client.post(f"{url}/items/batch", json={"operations": [
+        {"op": "update", "item_id": 999, "note": "x"},
+        {"op": "delete", "item_id": 998},
+        {"op": "add", "nome": "latte"},
+    ]}, headers=headers).json()
+
+    assert (batch["applied"], batch["failed"]) == (0, 3)
+    assert _list_version(client, url, headers) == version
+    changes = client.get(f"{url}/changes", params={"since": version}, headers=headers).json()
+    assert changes["items"] == [] and changes["deleted_item_ids"] == []
@@ -0,0 +1,58 @@
+def _list(client, make_user):
+    _, headers = make_user(1)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    return f"/api/shopping-lists/{shopping_list['id']}", headers
+
+
+def test_changes_since_a_version(client, make_user):
+    url, headers = _list(client, make_user)
+    latte = client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers).json()
+    pane = client.post(f"{url}/items", json={"nome": "Pane"}, headers=headers).json()
+
+    full = client.get(f"{url}/changes", headers=headers).json()
+    assert full["full"] is True
+    assert [item["nome"] for item in full["items"]] == ["Latte", "Pane"]
+
+    client.put(f"{url}/items/{latte['id']}", json={"completato": True}, headers=headers)
+    client.delete(f"{url}/items/{pane['id']}", headers=headers)
+    client.post(f"{url}/items", json={"nome": "Uova"}, headers=headers)
+
+    changes = client.get(f"{url}/changes", params={"since": full["version"]}, headers=headers).json()
+    assert changes["full"] is False
+    assert changes["version"] == full["version"] + 3
+    assert [(item["nome"], item["completato"]) for item in changes["items"]] == [("Latte", True), ("Uova", False)]
+    assert changes["deleted_item_ids"] == [pane["id"]]
+
+    latest = client.get(f"{url}/changes", params={"since": changes["version"]}, headers=headers).json()
+    assert (latest["items"], latest["deleted_item_ids"]) == ([], [])
+
+
+def test_cursor_from_the_future_returns_the_whole_list(client, make_user):
+    url, headers = _list(client, make_user)
+    client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers)
+
+    changes = client.get(f"{url}/changes", params={"since": 1000}, headers=headers).json()
+
+    assert changes["full"] is True
+    assert [item["nome"] for item in changes["items"]] == ["Latte"]
+
+
+def test_unchanged_list_is_not_modified(client, make_user):
+    url, headers = _list(client, make_user)
+    client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers)
+    first = client.get(f"{url}/changes", headers=headers)
+    etag = first.headers["ETag"]
+
+    assert client.get(f"{url}/changes", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.post(f"{url}/items", json={"nome": "Pane"}, headers=headers)
+    changed = client.get(f"{url}/changes", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_changes_require_access(client, make_user):
+    url, _ = _list(client, make_user)
+    _, stranger = make_user(2)
+
+    assert client.get(f"{url}/changes", headers=stranger).status_code == 403
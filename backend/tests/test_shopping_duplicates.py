@@ -0,0 +1,45 @@
+from models.shopping import normalize_item_name
+
+
+def _list(client, make_user):
+    _, headers = make_user(1)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    return f"/api/shopping-lists/{shopping_list['id']}", headers
+
+
+def test_names_are_normalized():
+    assert normalize_item_name("  Caffè   Lungo ") == "caffe lungo"
+    assert normalize_item_name("CAFFE LUNGO") == normalize_item_name("caffè lungo")
+
+
+def test_duplicate_names_are_rejected(client, make_user):
+    url, headers = _list(client, make_user)
+    client.post(f"{url}/items", json={"nome": "Caffè"}, headers=headers)
+
+    duplicate = client.post(f"{url}/items", json={"nome": " caffe "}, headers=headers)
+
+    assert duplicate.status_code == 400
+    assert "caffe" in duplicate.json()["detail"]
+    assert [item["nome"] for item in client.get(url, headers=headers).json()["items"]] == ["Caffè"]
+
+
+def test_same_name_is_allowed_in_another_list(client, make_user):
+    url, headers = _list(client, make_user)
+    other = client.post("/api/shopping-lists/", json={"nome": "Ufficio"}, headers=headers).json()
+    client.post(f"{url}/items", json={"nome": "Caffè"}, headers=headers)
+
+    assert client.post(f"/api/shopping-lists/{other['id']}/items", json={"nome": "Caffè"}, headers=headers).status_code == 201
+
+
+def test_renaming_keeps_the_name_unique(client, make_user):
+    url, headers = _list(client, make_user)
+    latte = client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers).json()
+    client.post(f"{url}/items", json={"nome": "Pane"}, headers=headers)
+
+    # Changing only the case of its own name is not a duplicate
+    assert client.put(f"{url}/items/{latte['id']}", json={"nome": "LATTE"}, headers=headers).status_code == 200
+    assert client.put(f"{url}/items/{latte['id']}", json={"nome": "PANE"}, headers=headers).status_code == 400
+    # Once deleted, the name is free again
+    pane = [item for item in client.get(url, headers=headers).json()["items"] if item["nome"] == "Pane"][0]
+    client.delete(f"{url}/items/{pane['id']}", headers=headers)
+    assert client.put(f"{url}/items/{latte['id']}", json={"nome": "Pane"}, headers=headers).status_code == 200
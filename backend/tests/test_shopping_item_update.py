@@ -0,0 +1,61 @@
+def _list_with_item(client, make_user):
+    _, headers = make_user(1)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=headers).json()
+    url = f"/api/shopping-lists/{shopping_list['id']}"
+    item = client.post(f"{url}/items", json={"nome": "Latte"}, headers=headers).json()
+    return url, headers, item
+
+
+def test_update_with_a_stale_version_is_rejected(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+
+    first = client.put(f"{url}/items/{latte['id']}", json={"quantita": "2", "version": latte["version"]}, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["version"] == latte["version"] + 1
+
+    stale = client.put(f"{url}/items/{latte['id']}", json={"quantita": "3", "version": latte["version"]}, headers=headers)
+    assert stale.status_code == 409
+    item = client.get(url, headers=headers).json()["items"][0]
+    assert (item["quantita"], item["version"]) == ("2", latte["version"] + 1)
+
+
+def test_update_without_a_version_always_applies(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+    client.put(f"{url}/items/{latte['id']}", json={"quantita": "2"}, headers=headers)
+
+    response = client.put(f"{url}/items/{latte['id']}", json={"completato": True}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["completato"] is True
+
+
+def test_update_errors(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+    client.post(f"{url}/items", json={"nome": "Pane"}, headers=headers)
+    _, stranger = make_user(2)
+
+    assert client.put(f"{url}/items/999", json={"note": "x"}, headers=headers).status_code == 404
+    assert client.put(f"{url}/items/{latte['id']}", json={"nome": "pane"}, headers=headers).status_code == 400
+    assert client.put(f"{url}/items/{latte['id']}", json={"note": "x"}, headers=stranger).status_code == 403
+    assert client.put("/api/shopping-lists/999/items/1", json={"note": "x"}, headers=headers).status_code == 404
+
+
+def test_update_bumps_the_list_version(client, make_user):
+    url, headers, latte = _list_with_item(client, make_user)
+    version = client.get(url, headers=headers).json()["version"]
+
+    client.put(f"{url}/items/{latte['id']}", json={"completato": True}, headers=headers)
+
+    changes = client.get(f"{url}/changes", params={"since": version}, headers=headers).json()
+    assert changes["version"] == version + 1
+    assert [(item["nome"], item["completato"]) for item in changes["items"]] == [("Latte", True)]
+
+
+def test_update_writes_with_single_statements(client, make_user, statements):
+    url, headers, latte = _list_with_item(client, make_user)
+
+    with statements() as executed:
+        response = client.put(f"{url}/items/{latte['id']}", json={"note": "x", "version": latte["version"]}, headers=headers)
+
+    assert response.status_code == 200
+    writes = [statement for statement in executed if not statement.lstrip().upper().startswith("SELECT")]
+    assert [statement.split()[0].upper() for statement in writes] == ["UPDATE", "UPDATE"]
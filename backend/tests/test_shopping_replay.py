@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+
+def _shared_list(client, make_user):
+    _, owner = make_user(1)
+    _, member = make_user(2)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=owner).json()
+    client.get(f"/api/shopping-lists/shared/{shopping_list['share_token']}", headers=member)
+    return f"/api/shopping-lists/{shopping_list['id']}", owner, member
+
+
+def _list_version(client, url, headers):
+    return client.get(url, headers=headers).json()["version"]
+
+
+def test_offline_change_older_than_an_online_one_is_superseded(client, make_user):
+    url, owner, member = _shared_list(client, make_user)
+    latte = client.post(f"{url}/items", json={"nome": "Latte", "quantita": "1"}, headers=owner).json()
+    offline_at = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+    client.put(f"{url}/items/{latte['id']}", json={"quantita": "3"}, headers=owner)
+
+    replay = client.post(f"{url}/replay", json={"mutations": [
+        {"client_id": "m1", "timestamp": offline_at, "op": "update", "item_id": latte["id"], "quantita": "2"},
+        {"client_id": "m2", "timestamp": offline_at, "op": "add", "nome": "Uova"},
+    ]}, headers=member).json()
+
+    assert [result["status"] for result in replay["results"]] == ["superseded", "applied"]
+    assert {item["nome"]: item["quantita"] for item in replay["items"]} == {"Latte": "3", "Uova": None}
+
+
+def test_resent_queue_keeps_the_list_version(client, make_user):
+    url, owner, member = _shared_list(client, make_user)
+    mutations = [
+        {"client_id": "m1", "timestamp": datetime.now(timezone.utc).isoformat(), "op": "add", "nome": "Pane"},
+    ]
+    first = client.post(f"{url}/replay", json={"mutations": mutations}, headers=member).json()
+    version = _list_version(client, url, owner)
+    assert first["version"] == version
+
+    resent = client.post(f"{url}/replay", json={"mutations": mutations}, headers=member).json()
+
+    assert [result["status"] for result in resent["results"]] == ["duplicate"]
+    assert resent["version"] == version
+    assert _list_version(client, url, owner) == version
+    assert [item["nome"] for item in resent["items"]] == ["Pane"]
+
+
+def test_replay_without_changes_keeps_the_list_version(client, make_user):
+    url, owner, member = _shared_list(client, make_user)
+    version = _list_version(client, url, owner)
+
+    replay = client.post(f"{url}/replay", json={"mutations": [
+        {"client_id": "m1", "timestamp": datetime.now(timezone.utc).isoformat(), "op": "update", "item_id": 999, "note": "x"},
+    ]}, headers=member).json()
+
+    assert [result["status"] for result in replay["results"]] == ["rejected"]
+    assert replay["version"] == version
+    assert _list_version(client, url, owner) == version
@@ -0,0 +1,55 @@
+from utils.suggestions import SuggestionCache, SuggestionIndex
+
+
+def _names(suggestions):
+    return [(suggestion.nome, suggestion.count) for suggestion in suggestions]
+
+
+def test_index_matches_word_starts_most_added_first():
+    index = SuggestionIndex()
+    index.add("Latte intero", 3)
+    index.add("Latte", 3)
+    index.add("latte ", 1)
+    index.add("Pane integrale", 5)
+
+    assert _names(index.search("lat", 8)) == [("Latte", 4), ("Latte intero", 3)]
+    assert _names(index.search("int", 8)) == [("Pane integrale", 5), ("Latte intero", 3)]
+    assert _names(index.search("int", 1)) == [("Pane integrale", 5)]
+    assert index.search("  ", 8) == []
+
+
+def test_cache_skips_an_index_built_across_a_change():
+    cache = SuggestionCache()
+    generation = cache.generation(1)
+    cache.add([1], ["Latte"])
+
+    cache.set(1, SuggestionIndex(), generation)
+
+    assert cache.search(1, "lat", 8) is None
+
+
+def test_cache_keeps_at_most_max_size_indexes():
+    cache = SuggestionCache(max_size=2)
+    for user_id in (1, 2, 3):
+        cache.set(user_id, SuggestionIndex(), cache.generation(user_id))
+
+    assert cache.search(1, "x", 8) is None
+    assert cache.search(3, "x", 8) == []
+
+
+def _suggest(client, headers, q):
+    return client.get("/api/shopping-lists/suggestions", params={"q": q}, headers=headers).json()
+
+
+def test_new_items_reach_the_members_cached_suggestions(client, make_user):
+    (_, owner), (_, member) = make_user(1), make_user(2)
+    shopping_list = client.post("/api/shopping-lists/", json={"nome": "Casa"}, headers=owner).json()
+    client.get(f"/api/shopping-lists/shared/{shopping_list['share_token']}", headers=member)
+    url = f"/api/shopping-lists/{shopping_list['id']}"
+    client.post(f"{url}/items", json={"nome": "Latte"}, headers=owner)
+    assert _suggest(client, member, "la") == [{"nome": "Latte", "count": 1}]
+
+    client.post(f"{url}/items", json={"nome": "Lasagne"}, headers=owner)
+
+    assert _suggest(client, member, "la") == [{"nome": "Latte", "count": 1}, {"nome": "Lasagne", "count": 1}]
+    assert _suggest(client, owner, "las") == [{"nome": "Lasagne", "count": 1}]
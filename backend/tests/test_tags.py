@@ -0,0 +1,29 @@
+import pytest
+from models.expense import ExpenseTag, TAG_IDS, parse_tag
+
+
+def test_tags_parse_in_any_case_and_legacy_names():
+    assert parse_tag("bolletta luce") is ExpenseTag.BOLLETTA_LUCE
+    assert parse_tag(" AFFITTO ") is ExpenseTag.AFFITTO
+    assert parse_tag("cani") is ExpenseTag.ANIMALI
+    with pytest.raises(ValueError):
+        parse_tag("Sconosciuto")
+
+
+def test_tag_ids_are_stable():
+    assert list(TAG_IDS.values()) == list(range(1, len(ExpenseTag) + 1))
+    assert TAG_IDS[ExpenseTag.BOLLETTA_ACQUA] == 1
+
+
+def test_expenses_store_the_canonical_tag(client, make_user):
+    user_id, headers = make_user(1)
+    group_id = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()["id"]
+    expense = client.post("/api/expenses/expenses", json={
+        "importo": 10, "tag": "spesa", "division_type": "Uguale", "paid_by_id": user_id,
+        "group_id": group_id, "participants": [{"user_id": user_id}],
+    }, headers=headers)
+
+    assert expense.status_code == 201
+    assert expense.json()["tag"] == "Spesa Alimentare"
+    listed = client.get("/api/expenses/expenses", params={"group_id": group_id, "tag": "Spesa Alimentare"}, headers=headers).json()
+    assert [item["id"] for item in listed] == [expense.json()["id"]]
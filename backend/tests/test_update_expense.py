@@ -0,0 +1,66 @@
+from rebuild_analytics import rebuild_analytics
+from rebuild_balances import rebuild_balances
+
+
+def _expense(client, make_user):
+    users = [make_user(n) for n in range(4)]
+    (a, headers), ids = users[0], [user_id for user_id, _ in users]
+    group = client.post("/api/expenses/groups", json={"nome": "Casa"}, headers=headers).json()
+    for user_id in ids[1:]:
+        client.post(f"/api/expenses/groups/{group['id']}/members", json={"user_id": user_id}, headers=headers)
+    expense = client.post("/api/expenses/expenses", json={
+        "importo": 90, "tag": "Altro", "division_type": "Uguale", "paid_by_id": a, "group_id": group["id"],
+        "participants": [{"user_id": user_id} for user_id in ids[:3]],
+    }, headers=headers).json()
+    return expense, ids, [user_headers for _, user_headers in users]
+
+
+def _writes(executed):
+    return sorted(
+        " ".join(statement.split()[:3]).upper()
+        for statement in executed
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+    )
+
+
+def test_participant_changes_are_diffed(client, make_user, statements):
+    expense, (a, b, c, d), (headers, *_) = _expense(client, make_user)
+    kept = {participant["user_id"]: participant["id"] for participant in expense["participants"]}
+
+    with statements() as executed:
+        response = client.put(f"/api/expenses/expenses/{expense['id']}", json={
+            "participants": [{"user_id": a}, {"user_id": b}, {"user_id": d}],
+        }, headers=headers)
+
+    assert response.status_code == 200
+    participants = {participant["user_id"]: participant["id"] for participant in response.json()["participants"]}
+    assert (participants[a], participants[b]) == (kept[a], kept[b])
+    assert set(participants) == {a, b, d}
+    # No rewrite of the unchanged participants: one DELETE (c) and one INSERT (d)
+    participant_writes = [write for write in _writes(executed) if "EXPENSE_PARTICIPANTS" in write]
+    assert participant_writes == ["DELETE FROM EXPENSE_PARTICIPANTS", "INSERT INTO EXPENSE_PARTICIPANTS"]
+    assert rebuild_balances(fix=False) == 0
+    assert rebuild_analytics(fix=False) == 0
+
+
+def test_unchanged_participants_are_not_written(client, make_user, statements):
+    expense, (a, b, c, _), (headers, *_) = _expense(client, make_user)
+
+    with statements() as executed:
+        client.put(f"/api/expenses/expenses/{expense['id']}", json={
+            "descrizione": "Spesa", "participants": [{"user_id": a}, {"user_id": b}, {"user_id": c}],
+        }, headers=headers)
+
+    assert not [write for write in _writes(executed) if "EXPENSE_PARTICIPANTS" in write]
+
+
+def test_update_errors(client, make_user):
+    expense, (a, *_), (headers, b_headers, *_) = _expense(client, make_user)
+    _, stranger = make_user(9)
+    url = f"/api/expenses/expenses/{expense['id']}"
+
+    assert client.put(url, json={"participants": []}, headers=headers).status_code == 400
+    assert client.put(url, json={"participants": [{"user_id": 999}]}, headers=headers).status_code == 400
+    assert client.put(url, json={"importo": 1}, headers=b_headers).status_code == 403
+    assert client.put(url, json={"importo": 1}, headers=stranger).status_code == 403
+    assert client.put("/api/expenses/expenses/999", json={"importo": 1}, headers=headers).status_code == 404
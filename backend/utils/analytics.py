@@ -0,0 +1,181 @@
+from sqlalchemy import func, update, insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from models.user import User
+from models.expense import ExpenseMonthlyTotal, ExpenseTag, TAG_IDS, TAGS_BY_ID, tag_id
+from schemas.expense import MonthlyTotal, UserMonthlyTotal
+from utils.balances import expense_deltas, per_user
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+RollupKey = Tuple[date, int, int]  # (month, tag_id, user_id)
+
+
+def month_of(created_at: Optional[datetime]) -> date:
+    """First day of the month an expense belongs to"""
+    created_at = created_at or datetime.now(timezone.utc)
+    return date(created_at.year, created_at.month, 1)
+
+
+def rollup_deltas(expense, sign: int = 1, created_at: Optional[datetime] = None) -> Dict[RollupKey, Tuple[float, float]]:
+    """
+    Signed (paid, owed) contribution of an expense to the monthly rollup.
+    created_at overrides the expense date for objects that do not carry one (e.g. ExpenseCreate).
+    """
+    month = month_of(created_at or getattr(expense, "created_at", None))
+    expense_tag_id = tag_id(expense.tag)
+    return {
+        (month, expense_tag_id, user_id): (paid, owed)
+        for user_id, (paid, owed) in expense_deltas(expense, sign).items()
+    }
+
+
+def merge_rollup_deltas(*all_deltas: Dict[RollupKey, Tuple[float, float]]) -> Dict[RollupKey, Tuple[float, float]]:
+    """Sum several rollup delta maps"""
+    merged = defaultdict(lambda: [0.0, 0.0])
+    for deltas in all_deltas:
+        for key, (paid, owed) in deltas.items():
+            merged[key][0] += paid
+            merged[key][1] += owed
+    return {key: (paid, owed) for key, (paid, owed) in merged.items()}
+
+
+def apply_rollup_deltas(db: Session, group_id: int, deltas: Dict[RollupKey, Tuple[float, float]]):
+    """
+    Add signed deltas to the monthly rollup of a group inside the current transaction:
+    one upsert on PostgreSQL, one UPDATE per (month, tag) elsewhere. The caller commits.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        rows = [
+            {
+                "group_id": group_id,
+                "month": month,
+                "tag_id": expense_tag_id,
+                "user_id": user_id,
+                "total_paid": paid,
+                "total_owed": owed,
+            }
+            for (month, expense_tag_id, user_id), (paid, owed) in deltas.items()
+            if paid or owed
+        ]
+        if not rows:
+            return
+        # Concurrent first expenses of a month/tag can't both insert the row
+        statement = postgresql.insert(ExpenseMonthlyTotal).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[
+                ExpenseMonthlyTotal.group_id, ExpenseMonthlyTotal.month,
+                ExpenseMonthlyTotal.tag_id, ExpenseMonthlyTotal.user_id
+            ],
+            set_={
+                "total_paid": ExpenseMonthlyTotal.total_paid + statement.excluded.total_paid,
+                "total_owed": ExpenseMonthlyTotal.total_owed + statement.excluded.total_owed,
+            }
+        ))
+        return
+
+    # SQLite serializes writers: update the existing rows, then insert the missing ones
+    buckets = defaultdict(dict)
+    for (month, expense_tag_id, user_id), (paid, owed) in deltas.items():
+        if paid or owed:
+            buckets[(month, expense_tag_id)][user_id] = (paid, owed)
+
+    for (month, expense_tag_id), user_deltas in buckets.items():
+        bucket = (
+            ExpenseMonthlyTotal.group_id == group_id,
+            ExpenseMonthlyTotal.month == month,
+            ExpenseMonthlyTotal.tag_id == expense_tag_id,
+        )
+        result = db.execute(
+            update(ExpenseMonthlyTotal)
+            .where(*bucket, ExpenseMonthlyTotal.user_id.in_(user_deltas))
+            .values(
+                total_paid=ExpenseMonthlyTotal.total_paid + per_user(
+                    ExpenseMonthlyTotal.user_id, {user_id: paid for user_id, (paid, _) in user_deltas.items()}
+                ),
+                total_owed=ExpenseMonthlyTotal.total_owed + per_user(
+                    ExpenseMonthlyTotal.user_id, {user_id: owed for user_id, (_, owed) in user_deltas.items()}
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount < len(user_deltas):
+            existing = {
+                user_id for (user_id,) in db.query(ExpenseMonthlyTotal.user_id)
+                .filter(*bucket, ExpenseMonthlyTotal.user_id.in_(user_deltas))
+            }
+            db.execute(insert(ExpenseMonthlyTotal).values([
+                {
+                    "group_id": group_id,
+                    "month": month,
+                    "tag_id": expense_tag_id,
+                    "user_id": user_id,
+                    "total_paid": paid,
+                    "total_owed": owed,
+                }
+                for user_id, (paid, owed) in user_deltas.items()
+                if user_id not in existing
+            ]))
+
+
+def _month_range(query, year: Optional[int], tag: Optional[ExpenseTag]):
+    if year:
+        query = query.filter(
+            ExpenseMonthlyTotal.month >= date(year, 1, 1),
+            ExpenseMonthlyTotal.month < date(year + 1, 1, 1)
+        )
+    if tag:
+        query = query.filter(ExpenseMonthlyTotal.tag_id == TAG_IDS[tag])
+    return query
+
+
+def group_monthly_totals(db: Session, group_id: int, year: Optional[int] = None, tag: Optional[ExpenseTag] = None) -> List[MonthlyTotal]:
+    """Per month, tag and member totals of a group, read from the rollup"""
+    query = db.query(
+        ExpenseMonthlyTotal.month,
+        ExpenseMonthlyTotal.tag_id,
+        ExpenseMonthlyTotal.user_id,
+        User.nome,
+        User.cognome,
+        ExpenseMonthlyTotal.total_paid,
+        ExpenseMonthlyTotal.total_owed
+    ).join(User, User.id == ExpenseMonthlyTotal.user_id)\
+        .filter(ExpenseMonthlyTotal.group_id == group_id)
+
+    rows = _month_range(query, year, tag)\
+        .order_by(ExpenseMonthlyTotal.month, ExpenseMonthlyTotal.tag_id, ExpenseMonthlyTotal.user_id)\
+        .all()
+
+    return [
+        MonthlyTotal(
+            month=month,
+            tag=TAGS_BY_ID[row_tag_id].value,
+            user_id=user_id,
+            user_name=f"{nome} {cognome}",
+            total_paid=total_paid,
+            total_owed=total_owed
+        )
+        for month, row_tag_id, user_id, nome, cognome, total_paid, total_owed in rows
+    ]
+
+
+def user_monthly_totals(db: Session, user_id: int, year: Optional[int] = None, tag: Optional[ExpenseTag] = None) -> List[UserMonthlyTotal]:
+    """Per month and tag totals of a user summed across all their groups"""
+    query = db.query(
+        ExpenseMonthlyTotal.month,
+        ExpenseMonthlyTotal.tag_id,
+        func.sum(ExpenseMonthlyTotal.total_paid),
+        func.sum(ExpenseMonthlyTotal.total_owed)
+    ).filter(ExpenseMonthlyTotal.user_id == user_id)
+
+    rows = _month_range(query, year, tag)\
+        .group_by(ExpenseMonthlyTotal.month, ExpenseMonthlyTotal.tag_id)\
+        .order_by(ExpenseMonthlyTotal.month, ExpenseMonthlyTotal.tag_id)\
+        .all()
+
+    return [
+        UserMonthlyTotal(month=month, tag=TAGS_BY_ID[row_tag_id].value, total_paid=total_paid, total_owed=total_owed)
+        for month, row_tag_id, total_paid, total_owed in rows
+    ]
@@ -0,0 +1,306 @@
+from sqlalchemy import and_, case, func, insert, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from models.user import User
+from models.expense import Expense, ExpenseGroup, GroupMember, ExpenseParticipant, GroupMemberBalance, DivisionType
+from schemas.expense import Balance, GroupBalance, MyBalances
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def expense_share(head_counts):
+    """
+    SQL expression with the amount owed by a single ExpenseParticipant row.
+    The query using it must join Expense and the head_counts subquery.
+    """
+    return case(
+        (Expense.division_type == DivisionType.UGUALE, Expense.importo / head_counts.c.num_participants),
+        (Expense.division_type == DivisionType.IMPORTI_ESATTI, func.coalesce(ExpenseParticipant.importo, 0)),
+        (
+            Expense.division_type == DivisionType.PERCENTUALE,
+            Expense.importo * func.coalesce(ExpenseParticipant.percentuale, 0) / 100
+        ),
+        else_=0
+    )
+
+
+def participant_counts(db: Session, *criteria):
+    """Subquery with the number of participants of every expense matching criteria"""
+    return db.query(
+        ExpenseParticipant.expense_id,
+        func.count(ExpenseParticipant.id).label("num_participants")
+    ).join(Expense, Expense.id == ExpenseParticipant.expense_id)\
+        .filter(*criteria)\
+        .group_by(ExpenseParticipant.expense_id)\
+        .subquery()
+
+
+def paid_totals(db: Session, *criteria, user_id: int = None):
+    """Subquery with the total paid per (group_id, user_id) for expenses matching criteria"""
+    query = db.query(
+        Expense.group_id,
+        Expense.paid_by_id.label("user_id"),
+        func.sum(Expense.importo).label("total_paid")
+    ).filter(*criteria)
+
+    if user_id is not None:
+        query = query.filter(Expense.paid_by_id == user_id)
+
+    return query.group_by(Expense.group_id, Expense.paid_by_id).subquery()
+
+
+def owed_totals(db: Session, *criteria, user_id: int = None):
+    """
+    Subquery with the total owed per (group_id, user_id) for expenses matching criteria.
+    criteria must only reference Expense columns: head counts are computed on the same set.
+    """
+    heads = participant_counts(db, *criteria)
+    query = db.query(
+        Expense.group_id,
+        ExpenseParticipant.user_id,
+        func.sum(expense_share(heads)).label("total_owed")
+    ).join(Expense, Expense.id == ExpenseParticipant.expense_id)\
+        .join(heads, heads.c.expense_id == ExpenseParticipant.expense_id)\
+        .filter(*criteria)
+
+    if user_id is not None:
+        query = query.filter(ExpenseParticipant.user_id == user_id)
+
+    return query.group_by(Expense.group_id, ExpenseParticipant.user_id).subquery()
+
+
+def compute_group_balances(db: Session, group_id: int) -> List[Balance]:
+    """
+    Compute paid, owed and net balance of every member of a group
+    from the full expense history, with a single aggregate query
+    """
+    paid = paid_totals(db, Expense.group_id == group_id)
+    owed = owed_totals(db, Expense.group_id == group_id)
+
+    rows = db.query(
+        GroupMember.user_id,
+        User.nome,
+        User.cognome,
+        func.coalesce(paid.c.total_paid, 0),
+        func.coalesce(owed.c.total_owed, 0)
+    ).join(User, User.id == GroupMember.user_id)\
+        .outerjoin(paid, paid.c.user_id == GroupMember.user_id)\
+        .outerjoin(owed, owed.c.user_id == GroupMember.user_id)\
+        .filter(GroupMember.group_id == group_id)\
+        .order_by(GroupMember.id)\
+        .all()
+
+    return _to_balances(rows)
+
+
+def read_group_balances(db: Session, group_id: int) -> List[Balance]:
+    """Read the balances of every member of a group from the group_member_balances ledger"""
+    rows = db.query(
+        GroupMember.user_id,
+        User.nome,
+        User.cognome,
+        func.coalesce(GroupMemberBalance.total_paid, 0),
+        func.coalesce(GroupMemberBalance.total_owed, 0)
+    ).join(User, User.id == GroupMember.user_id)\
+        .outerjoin(GroupMemberBalance, and_(
+            GroupMemberBalance.group_id == GroupMember.group_id,
+            GroupMemberBalance.user_id == GroupMember.user_id
+        ))\
+        .filter(GroupMember.group_id == group_id)\
+        .order_by(GroupMember.id)\
+        .all()
+
+    return _to_balances(rows)
+
+
+def read_user_balances(db: Session, user_id: int) -> MyBalances:
+    """Totals of a user in every group they belong to, plus the grand total, from the ledger in one query"""
+    rows = db.query(
+        ExpenseGroup.id,
+        ExpenseGroup.nome,
+        func.coalesce(GroupMemberBalance.total_paid, 0),
+        func.coalesce(GroupMemberBalance.total_owed, 0)
+    ).join(GroupMember, GroupMember.group_id == ExpenseGroup.id)\
+        .outerjoin(GroupMemberBalance, and_(
+            GroupMemberBalance.group_id == GroupMember.group_id,
+            GroupMemberBalance.user_id == GroupMember.user_id
+        ))\
+        .filter(GroupMember.user_id == user_id)\
+        .order_by(ExpenseGroup.id)\
+        .all()
+
+    groups = [
+        GroupBalance(
+            group_id=group_id,
+            group_name=nome,
+            total_paid=total_paid,
+            total_owed=total_owed,
+            balance=total_paid - total_owed
+        )
+        for group_id, nome, total_paid, total_owed in rows
+    ]
+    total_paid = sum(group.total_paid for group in groups)
+    total_owed = sum(group.total_owed for group in groups)
+
+    return MyBalances(groups=groups, total_paid=total_paid, total_owed=total_owed, balance=total_paid - total_owed)
+
+
+def _to_balances(rows) -> List[Balance]:
+    return [
+        Balance(
+            user_id=user_id,
+            user_name=f"{nome} {cognome}",
+            total_paid=total_paid,
+            total_owed=total_owed,
+            balance=total_paid - total_owed
+        )
+        for user_id, nome, cognome, total_paid, total_owed in rows
+    ]
+
+
+# Ledger maintenance
+def expense_deltas(expense: Expense, sign: int = 1) -> Dict[int, Tuple[float, float]]:
+    """
+    Signed (paid, owed) contribution of an expense to each user's totals.
+    Use sign=1 when the expense is added and sign=-1 when it is removed.
+    """
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    deltas[expense.paid_by_id][0] += sign * expense.importo
+
+    num_participants = len(expense.participants)
+    for participant in expense.participants:
+        if expense.division_type == DivisionType.UGUALE:
+            share = expense.importo / num_participants
+        elif expense.division_type == DivisionType.IMPORTI_ESATTI:
+            share = participant.importo or 0
+        elif expense.division_type == DivisionType.PERCENTUALE:
+            share = (expense.importo * (participant.percentuale or 0)) / 100
+        else:
+            share = 0
+        deltas[participant.user_id][1] += sign * share
+
+    return {user_id: (paid, owed) for user_id, (paid, owed) in deltas.items()}
+
+
+def merge_deltas(*all_deltas: Dict[int, Tuple[float, float]]) -> Dict[int, Tuple[float, float]]:
+    """Sum several delta maps, e.g. the removal of the old version of an expense and the addition of the new one"""
+    merged = defaultdict(lambda: [0.0, 0.0])
+    for deltas in all_deltas:
+        for user_id, (paid, owed) in deltas.items():
+            merged[user_id][0] += paid
+            merged[user_id][1] += owed
+    return {user_id: (paid, owed) for user_id, (paid, owed) in merged.items()}
+
+
+def new_delta_totals():
+    """Running (paid, owed) totals per key, for accumulate_deltas"""
+    return defaultdict(lambda: [0.0, 0.0])
+
+
+def accumulate_deltas(totals, deltas):
+    """
+    Add a delta map (balance or rollup) to running totals in place: unlike merge_deltas,
+    the cost doesn't grow with the keys already accumulated, for imports and catch-ups.
+    """
+    for key, (paid, owed) in deltas.items():
+        totals[key][0] += paid
+        totals[key][1] += owed
+
+
+def per_user(user_id_column, values: Dict[int, float]):
+    """CASE expression picking each user's value, so one UPDATE can apply different amounts per row"""
+    return case(values, value=user_id_column, else_=0)
+
+
+def apply_balance_deltas(db: Session, group_id: int, deltas: Dict[int, Tuple[float, float]]):
+    """
+    Add signed deltas to the ledger rows of a group inside the current transaction,
+    with one statement whatever the number of members involved.
+    Missing rows are created for group members only. The caller commits.
+    """
+    deltas = {user_id: (paid, owed) for user_id, (paid, owed) in deltas.items() if paid or owed}
+    if not deltas:
+        return
+
+    def member_rows(member_deltas: Dict[int, Tuple[float, float]]):
+        return select(
+            GroupMember.group_id,
+            GroupMember.user_id,
+            per_user(GroupMember.user_id, {user_id: paid for user_id, (paid, _) in member_deltas.items()}),
+            per_user(GroupMember.user_id, {user_id: owed for user_id, (_, owed) in member_deltas.items()})
+        ).where(
+            GroupMember.group_id == group_id,
+            GroupMember.user_id.in_(member_deltas)
+        ).group_by(GroupMember.group_id, GroupMember.user_id)
+
+    columns = ["group_id", "user_id", "total_paid", "total_owed"]
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Upsert: concurrent first expenses of a member can't both insert the row
+        statement = postgresql.insert(GroupMemberBalance).from_select(columns, member_rows(deltas))
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[GroupMemberBalance.group_id, GroupMemberBalance.user_id],
+            set_={
+                "total_paid": GroupMemberBalance.total_paid + statement.excluded.total_paid,
+                "total_owed": GroupMemberBalance.total_owed + statement.excluded.total_owed,
+            }
+        ))
+        return
+
+    # SQLite serializes writers: update the existing rows, then insert the missing ones
+    result = db.execute(
+        update(GroupMemberBalance)
+        .where(
+            GroupMemberBalance.group_id == group_id,
+            GroupMemberBalance.user_id.in_(deltas)
+        )
+        .values(
+            total_paid=GroupMemberBalance.total_paid + per_user(
+                GroupMemberBalance.user_id, {user_id: paid for user_id, (paid, _) in deltas.items()}
+            ),
+            total_owed=GroupMemberBalance.total_owed + per_user(
+                GroupMemberBalance.user_id, {user_id: owed for user_id, (_, owed) in deltas.items()}
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    if result.rowcount < len(deltas):
+        existing = {
+            user_id for (user_id,) in db.query(GroupMemberBalance.user_id).filter(
+                GroupMemberBalance.group_id == group_id,
+                GroupMemberBalance.user_id.in_(deltas)
+            )
+        }
+        missing = {user_id: delta for user_id, delta in deltas.items() if user_id not in existing}
+        db.execute(insert(GroupMemberBalance).from_select(columns, member_rows(missing)))
+
+
+def seed_member_balance(db: Session, group_id: int, user_id: int):
+    """
+    Create the ledger row of a (re)joining member from the group history.
+    The caller commits.
+    """
+    paid = paid_totals(db, Expense.group_id == group_id, user_id=user_id)
+    owed = owed_totals(db, Expense.group_id == group_id, user_id=user_id)
+    total_paid = db.query(func.coalesce(func.sum(paid.c.total_paid), 0)).scalar()
+    total_owed = db.query(func.coalesce(func.sum(owed.c.total_owed), 0)).scalar()
+
+    db.query(GroupMemberBalance).filter(
+        GroupMemberBalance.group_id == group_id,
+        GroupMemberBalance.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.add(GroupMemberBalance(
+        group_id=group_id,
+        user_id=user_id,
+        total_paid=total_paid,
+        total_owed=total_owed
+    ))
+
+
+def remove_member_balance(db: Session, group_id: int, user_id: int):
+    """Drop the ledger row of a member leaving the group. The caller commits."""
+    db.query(GroupMemberBalance).filter(
+        GroupMemberBalance.group_id == group_id,
+        GroupMemberBalance.user_id == user_id
+    ).delete(synchronize_session=False)
@@ -0,0 +1,137 @@
+from sqlalchemy.orm import aliased
+from database import SessionLocal
+from models.user import User
+from models.expense import Expense, ExpenseParticipant, DivisionType, TAGS_BY_ID
+from typing import Iterator
+import csv
+import io
+import json
+
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 200
+
+# Same columns as the bulk import, plus readable names: an export can be imported back
+CSV_COLUMNS = [
+    "id", "descrizione", "importo", "tag", "division_type", "paid_by_id",
+    "participants", "created_at", "paid_by", "participant_names"
+]
+
+
+def _expense_rows(db, group_id: int) -> Iterator[dict]:
+    """
+    Yield one dict per expense of the group, oldest first.
+    Payer and participant names are joined in the query and streamed
+    with a server-side cursor, so memory does not grow with the history.
+    """
+    payer = aliased(User)
+    participant_user = aliased(User)
+
+    query = db.query(
+        Expense.id,
+        Expense.descrizione,
+        Expense.importo,
+        Expense.tag_id,
+        Expense.division_type,
+        Expense.paid_by_id,
+        Expense.created_at,
+        payer.nome,
+        payer.cognome,
+        ExpenseParticipant.user_id,
+        ExpenseParticipant.importo,
+        ExpenseParticipant.percentuale,
+        participant_user.nome,
+        participant_user.cognome
+    ).outerjoin(payer, payer.id == Expense.paid_by_id)\
+        .outerjoin(ExpenseParticipant, ExpenseParticipant.expense_id == Expense.id)\
+        .outerjoin(participant_user, participant_user.id == ExpenseParticipant.user_id)\
+        .filter(Expense.group_id == group_id)\
+        .order_by(Expense.created_at, Expense.id, ExpenseParticipant.id)\
+        .execution_options(yield_per=YIELD_PER)
+
+    current = None
+    for (expense_id, descrizione, importo, tag_id, division_type, paid_by_id, created_at,
+         payer_nome, payer_cognome, user_id, quota, percentuale, nome, cognome) in query:
+        # Rows of the same expense are consecutive: group them into one record
+        if current is None or current["id"] != expense_id:
+            if current is not None:
+                yield current
+            current = {
+                "id": expense_id,
+                "descrizione": descrizione,
+                "importo": importo,
+                "tag": TAGS_BY_ID[tag_id].value,
+                "division_type": division_type.value if division_type else None,
+                "paid_by_id": paid_by_id,
+                "paid_by": f"{payer_nome} {payer_cognome}" if payer_nome else None,
+                "created_at": created_at.isoformat() if created_at else None,
+                "participants": [],
+            }
+        if user_id is not None:
+            current["participants"].append({
+                "user_id": user_id,
+                "nome": f"{nome} {cognome}" if nome else None,
+                "importo": quota,
+                "percentuale": percentuale,
+            })
+
+    if current is not None:
+        yield current
+
+
+def _participants_cell(expense: dict) -> str:
+    """Participants in the bulk import notation: '1;2' or '1:20;2:40'"""
+    if expense["division_type"] == DivisionType.IMPORTI_ESATTI.value:
+        return ";".join(f"{p['user_id']}:{p['importo'] or 0}" for p in expense["participants"])
+    if expense["division_type"] == DivisionType.PERCENTUALE.value:
+        return ";".join(f"{p['user_id']}:{p['percentuale'] or 0}" for p in expense["participants"])
+    return ";".join(str(p["user_id"]) for p in expense["participants"])
+
+
+def stream_expenses_csv(group_id: int) -> Iterator[str]:
+    """CSV export of a group's expenses, yielded in small chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    db = SessionLocal()
+    try:
+        for count, expense in enumerate(_expense_rows(db, group_id), start=1):
+            writer.writerow([
+                expense["id"],
+                expense["descrizione"] or "",
+                expense["importo"],
+                expense["tag"],
+                expense["division_type"],
+                expense["paid_by_id"],
+                _participants_cell(expense),
+                expense["created_at"] or "",
+                expense["paid_by"] or "",
+                ";".join(p["nome"] or "" for p in expense["participants"]),
+            ])
+            if count % ROWS_PER_CHUNK == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+def stream_expenses_ndjson(group_id: int) -> Iterator[str]:
+    """NDJSON export of a group's expenses: one JSON object per line"""
+    db = SessionLocal()
+    try:
+        lines = []
+        for count, expense in enumerate(_expense_rows(db, group_id), start=1):
+            lines.append(json.dumps(expense, ensure_ascii=False))
+            # Send the first record right away, then in chunks
+            if count == 1 or len(lines) >= ROWS_PER_CHUNK:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,193 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from models.expense import Expense, ExpenseParticipant, GroupMember, DivisionType, TAG_IDS
+from schemas.expense import ExpenseCreate, ExpenseImportError, ExpenseImportResult
+from utils.balances import expense_deltas, new_delta_totals, accumulate_deltas, apply_balance_deltas
+from utils.analytics import rollup_deltas, apply_rollup_deltas
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+import csv
+import json
+
+BATCH_SIZE = 500
+
+# Accept division types regardless of case, as spreadsheets rarely match exactly (ExpenseCreate does the same for tags)
+_DIVISION_TYPES = {division_type.value.lower(): division_type.value for division_type in DivisionType}
+
+
+def read_csv_rows(stream: TextIO) -> Iterator[dict]:
+    """
+    Read expenses from a CSV file, one row at a time.
+    Columns: descrizione, importo, tag, division_type, paid_by_id, participants, created_at.
+    participants is a ';' separated list of user ids, or user_id:value pairs
+    for 'Importi esatti' (amount) and 'Percentuale' (percentage) splits.
+    """
+    for row in csv.DictReader(stream):
+        participants = []
+        for entry in (row.get("participants") or "").split(";"):
+            entry = entry.strip()
+            if not entry:
+                continue
+            user_id, _, value = entry.partition(":")
+            participants.append({"user_id": user_id.strip(), "value": value.strip() or None})
+
+        yield {
+            "descrizione": row.get("descrizione") or None,
+            "importo": row.get("importo"),
+            "tag": row.get("tag"),
+            "division_type": row.get("division_type") or DivisionType.UGUALE.value,
+            "paid_by_id": row.get("paid_by_id"),
+            "participants": participants,
+            "created_at": row.get("created_at") or None,
+        }
+
+
+def read_ndjson_rows(stream: TextIO) -> Iterator[dict]:
+    """Read expenses from a newline-delimited JSON file: one ExpenseCreate object per line"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_error": f"JSON non valido: {e.msg}"}
+            continue
+        if not isinstance(row, dict):
+            yield {"_error": "ogni riga deve essere un oggetto JSON"}
+            continue
+        yield row
+
+
+def _validate_row(raw: dict, group_id: int) -> Tuple[ExpenseCreate, Optional[datetime]]:
+    """Validate a raw row against ExpenseCreate. Raises ValueError with a readable message."""
+    if not isinstance(raw, dict):
+        raise ValueError("ogni riga deve essere un oggetto JSON")
+    if "_error" in raw:
+        raise ValueError(raw["_error"])
+
+    data = dict(raw)
+    data["group_id"] = group_id
+    if isinstance(data.get("division_type"), str):
+        data["division_type"] = _DIVISION_TYPES.get(data["division_type"].strip().lower(), data["division_type"])
+
+    # CSV participants carry a generic value, mapped on the field the division type uses
+    participants = []
+    if not isinstance(data.get("participants") or [], list):
+        raise ValueError("participants: deve essere una lista")
+    for position, participant in enumerate(data.get("participants") or []):
+        if not isinstance(participant, dict):
+            raise ValueError(f"participants.{position}: ogni partecipante deve essere un oggetto")
+        if "value" in participant:
+            participant = dict(participant)
+            value = participant.pop("value")
+            if data.get("division_type") == DivisionType.IMPORTI_ESATTI.value:
+                participant["importo"] = value
+            elif data.get("division_type") == DivisionType.PERCENTUALE.value:
+                participant["percentuale"] = value
+        participants.append(participant)
+    data["participants"] = participants
+
+    created_at = data.pop("created_at", None)
+
+    try:
+        expense = ExpenseCreate.model_validate(data)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ))
+
+    if not expense.participants:
+        raise ValueError("participants: almeno un partecipante è obbligatorio")
+
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            raise ValueError(f"created_at: data non valida '{created_at}'")
+
+    return expense, created_at
+
+
+def insert_expense_batch(db: Session, batch: List[Tuple[ExpenseCreate, datetime]]):
+    """Insert a batch of expenses and their participants with two multi-row INSERTs"""
+    expense_ids = db.execute(
+        insert(Expense).returning(Expense.id, sort_by_parameter_order=True),
+        [
+            {
+                "descrizione": expense.descrizione,
+                "importo": expense.importo,
+                "tag_id": TAG_IDS[expense.tag],
+                "division_type": expense.division_type,
+                "paid_by_id": expense.paid_by_id,
+                "group_id": expense.group_id,
+                "created_at": created_at,
+            }
+            for expense, created_at in batch
+        ]
+    ).scalars().all()
+
+    db.execute(
+        insert(ExpenseParticipant),
+        [
+            {"expense_id": expense_id, **participant.dict()}
+            for expense_id, (expense, _) in zip(expense_ids, batch)
+            for participant in expense.participants
+        ]
+    )
+
+
+def import_expenses(
+    db: Session,
+    group_id: int,
+    rows: Iterable[dict],
+    batch_size: int = BATCH_SIZE,
+    dry_run: bool = False
+) -> ExpenseImportResult:
+    """
+    Validate and insert expenses in batches inside the current transaction.
+    Invalid rows are skipped and reported; the caller commits (or rolls back on dry runs).
+    """
+    members = {
+        user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)
+    }
+    now = datetime.now(timezone.utc)
+
+    imported = 0
+    errors = []
+    deltas = new_delta_totals()
+    monthly_deltas = new_delta_totals()
+    batch = []
+
+    for row_number, raw in enumerate(rows, start=1):
+        try:
+            expense, created_at = _validate_row(raw, group_id)
+            outsiders = {expense.paid_by_id, *(p.user_id for p in expense.participants)} - members
+            if outsiders:
+                raise ValueError(f"utenti non membri del gruppo: {', '.join(str(u) for u in sorted(outsiders))}")
+        except ValueError as e:
+            errors.append(ExpenseImportError(row=row_number, error=str(e)))
+            continue
+
+        batch.append((expense, created_at or now))
+        accumulate_deltas(deltas, expense_deltas(expense))
+        accumulate_deltas(monthly_deltas, rollup_deltas(expense, created_at=created_at or now))
+
+        if len(batch) >= batch_size:
+            if not dry_run:
+                insert_expense_batch(db, batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        if not dry_run:
+            insert_expense_batch(db, batch)
+        imported += len(batch)
+
+    if not dry_run:
+        apply_balance_deltas(db, group_id, deltas)
+        apply_rollup_deltas(db, group_id, monthly_deltas)
+
+    return ExpenseImportResult(imported=imported, failed=len(errors), errors=errors)
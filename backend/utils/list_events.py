@@ -0,0 +1,82 @@
+from sqlalchemy.orm import Session
+from schemas.shopping import (
+    ShoppingItem as ShoppingItemSchema, ShoppingItemOperation, ShoppingItemOperationResult,
+    ShoppingListMutation, ShoppingListMutationResult
+)
+from models.shopping import ShoppingItem
+from utils.notifications import shopping_list_member_ids
+from websocket_manager import manager
+from typing import List
+
+ITEM_ADDED = "item_added"
+ITEM_UPDATED = "item_updated"
+ITEM_COMPLETED = "item_completed"
+ITEM_DELETED = "item_deleted"
+
+OPERATION_EVENTS = {"add": ITEM_ADDED, "update": ITEM_UPDATED, "complete": ITEM_COMPLETED}
+
+
+def item_event(event_type: str, item, version: int) -> dict:
+    """Realtime event carrying the item as the API returns it (ORM object, row or schema)"""
+    if not isinstance(item, ShoppingItemSchema):
+        item = ShoppingItemSchema.model_validate(item)
+    return {"type": event_type, "item_id": item.id, "version": version, "item": item.model_dump(mode="json")}
+
+
+def item_deleted_event(item_id: int, version: int) -> dict:
+    return {"type": ITEM_DELETED, "item_id": item_id, "version": version, "item": None}
+
+
+def operation_events(
+    operations: List[ShoppingItemOperation],
+    results: List[ShoppingItemOperationResult],
+    version: int
+) -> List[dict]:
+    """Events of the successful operations of a batch"""
+    events = []
+    for result in results:
+        if not result.success:
+            continue
+        if result.op == "delete":
+            events.append(item_deleted_event(operations[result.index].item_id, version))
+        else:
+            events.append(item_event(OPERATION_EVENTS[result.op], result.item, version))
+    return events
+
+
+def replay_events(
+    mutations: List[ShoppingListMutation],
+    results: List[ShoppingListMutationResult],
+    items: List[ShoppingItem],
+    added: List[ShoppingItem],
+    completed: List[ShoppingItem],
+    version: int
+) -> List[dict]:
+    """Events of an offline replay: the items it changed, then the ones it deleted"""
+    added_ids = {item.id for item in added}
+    completed_ids = {item.id for item in completed}
+    events = [
+        item_event(
+            ITEM_ADDED if item.id in added_ids else ITEM_COMPLETED if item.id in completed_ids else ITEM_UPDATED,
+            item,
+            version
+        )
+        for item in items if item.list_version == version
+    ]
+    events.extend(
+        item_deleted_event(result.item_id, version)
+        for mutation, result in zip(mutations, results)
+        if mutation.op == "delete" and result.status == "applied" and result.item_id is not None
+    )
+    return events
+
+
+def publish_list_events(db: Session, list_id: int, events: List[dict]):
+    """
+    Send item events to every member of the list connected via WebSocket, the author
+    included (other tabs and devices). Call it after committing; members are only
+    looked up when someone is connected to this instance.
+    """
+    if not events or not manager.get_connected_users():
+        return
+    manager.publish_list_events(list_id, shopping_list_member_ids(db, list_id), events)
@@ -1,9 +1,9 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from models.notification import Notification
 from models.shopping import ShoppingList, SharedList
-from models.expense import ExpenseGroup, GroupMember
+from models.expense import GroupMember
 from typing import List
-import asyncio
 from websocket_manager import manager
 import logging
 
@@ -33,34 +33,85 @@ def create_notification(
     db.refresh(notification)
 
     # Send push notification via WebSocket if user is connected
-    if manager.is_user_connected(user_id):
-        notification_data = {
-            "type": "notification",
-            "id": notification.id,
-            "title": notification.title,
-            "message": notification.message,
-            "notification_type": notification.type,
-            "reference_id": notification.reference_id,
-            "reference_type": notification.reference_type,
-            "created_at": notification.created_at.isoformat(),
-            "is_read": notification.is_read
-        }
-
-        # Try to send WebSocket message
-        try:
-            # Get the running event loop
-            loop = asyncio.get_running_loop()
-            # Schedule the coroutine in the event loop
-            asyncio.ensure_future(manager.send_personal_message(notification_data, user_id), loop=loop)
-        except RuntimeError:
-            # No event loop running, this is expected in sync context
-            # The notification is still saved in DB and will be fetched on next poll
-            logger.debug(f"No event loop available to send WebSocket notification to user {user_id}")
-        except Exception as e:
-            logger.error(f"Error sending WebSocket notification: {e}")
+    _push_notification(notification)
 
     return notification
 
+def _push_notification(notification):
+    """Send a saved notification via WebSocket if its user is connected"""
+    if not manager.is_user_connected(notification.user_id):
+        return
+
+    notification_data = {
+        "type": "notification",
+        "id": notification.id,
+        "title": notification.title,
+        "message": notification.message,
+        "notification_type": notification.type,
+        "reference_id": notification.reference_id,
+        "reference_type": notification.reference_type,
+        "created_at": notification.created_at.isoformat(),
+        "is_read": notification.is_read
+    }
+
+    # Try to send WebSocket message, on the connections' loop: sync endpoints run in the threadpool
+    try:
+        manager.send_soon(notification_data, notification.user_id)
+    except Exception as e:
+        logger.error(f"Error sending WebSocket notification: {e}")
+
+def enqueue_notifications(
+    db: Session,
+    user_ids: List[int],
+    notification_type: str,
+    title: str,
+    message: str,
+    reference_id: int = None,
+    reference_type: str = None
+) -> list:
+    """
+    Insert one notification per user with a single INSERT, inside the caller's transaction.
+    After committing, pass the returned rows to push_notifications.
+    """
+    if not user_ids:
+        return []
+
+    return db.execute(
+        insert(Notification).values([
+            {
+                "user_id": user_id,
+                "type": notification_type,
+                "title": title,
+                "message": message,
+                "reference_id": reference_id,
+                "reference_type": reference_type,
+                "is_read": False,
+            }
+            for user_id in user_ids
+        ]).returning(
+            Notification.id,
+            Notification.user_id,
+            Notification.type,
+            Notification.title,
+            Notification.message,
+            Notification.reference_id,
+            Notification.reference_type,
+            Notification.is_read,
+            Notification.created_at
+        )
+    ).all()
+
+def push_notifications(notifications: list):
+    """Send committed notifications to the recipients connected via WebSocket"""
+    for notification in notifications:
+        _push_notification(notification)
+
+def shopping_list_member_ids(db: Session, shopping_list_id: int, exclude_user_id: int = None) -> List[int]:
+    """Owner and shared users of a shopping list, in one query"""
+    member_ids = db.query(ShoppingList.owner_id).filter(ShoppingList.id == shopping_list_id)\
+        .union(db.query(SharedList.shared_with_id).filter(SharedList.shopping_list_id == shopping_list_id))
+    return [user_id for (user_id,) in member_ids if user_id is not None and user_id != exclude_user_id]
+
 def notify_shopping_list_members(
     db: Session,
     shopping_list_id: int,
@@ -70,40 +121,17 @@ def notify_shopping_list_members(
     exclude_user_id: int = None
 ):
     """Notify all members of a shopping list except the one who performed the action"""
-    shopping_list = db.query(ShoppingList).filter(ShoppingList.id == shopping_list_id).first()
-    if not shopping_list:
-        return
-
-    # Get all shared users
-    shared_users = db.query(SharedList).filter(SharedList.shopping_list_id == shopping_list_id).all()
-
-    # Get owner ID
-    owner_id = shopping_list.owner_id
-
-    # Notify owner if not excluded
-    if owner_id != exclude_user_id:
-        create_notification(
-            db=db,
-            user_id=owner_id,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            reference_id=shopping_list_id,
-            reference_type="shopping_list"
-        )
-
-    # Notify shared users
-    for shared in shared_users:
-        if shared.shared_with_id != exclude_user_id:
-            create_notification(
-                db=db,
-                user_id=shared.shared_with_id,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                reference_id=shopping_list_id,
-                reference_type="shopping_list"
-            )
+    notifications = enqueue_notifications(
+        db=db,
+        user_ids=shopping_list_member_ids(db, shopping_list_id, exclude_user_id),
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        reference_id=shopping_list_id,
+        reference_type="shopping_list"
+    )
+    db.commit()
+    push_notifications(notifications)
 
 def notify_expense_group_members(
     db: Session,
@@ -114,22 +142,19 @@ def notify_expense_group_members(
     exclude_user_id: int = None
 ):
     """Notify all members of an expense group except the one who performed the action"""
-    group = db.query(ExpenseGroup).filter(ExpenseGroup.id == group_id).first()
-    if not group:
-        return
-
-    # Get all group members
-    members = db.query(GroupMember).filter(GroupMember.group_id == group_id).all()
+    member_ids = [
+        user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)
+        if user_id != exclude_user_id
+    ]
 
-    # Notify all members except the one who performed the action
-    for member in members:
-        if member.user_id != exclude_user_id:
-            create_notification(
-                db=db,
-                user_id=member.user_id,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                reference_id=group_id,
-                reference_type="expense_group"
-            )
+    notifications = enqueue_notifications(
+        db=db,
+        user_ids=member_ids,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        reference_id=group_id,
+        reference_type="expense_group"
+    )
+    db.commit()
+    push_notifications(notifications)
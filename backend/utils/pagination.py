@@ -0,0 +1,73 @@
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+from datetime import datetime
+from typing import Optional, Tuple
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for keyset pagination, built from the sort key of the last row of a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor produced by encode_cursor, raising 400 if it was tampered with"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursore non valido"
+        )
+
+
+def decode_time_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a (created_at, id) cursor"""
+    values = decode_cursor(cursor)
+    try:
+        created_at, row_id = values
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursore non valido"
+        )
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a (rank, id) cursor"""
+    values = decode_cursor(cursor)
+    try:
+        rank, row_id = values
+        return float(rank), int(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursore non valido"
+        )
+
+
+def before_keyset(created_at_column, id_column, created_at: datetime, row_id: int):
+    """Rows that come after (created_at, id) when sorting by created_at DESC, id DESC"""
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < row_id)
+    )
+
+
+def below_rank_keyset(rank, id_column, last_rank: float, row_id: int):
+    """Rows that come after (rank, id) when sorting by rank DESC, id DESC"""
+    return or_(
+        rank < last_rank,
+        and_(rank == last_rank, id_column < row_id)
+    )
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Expose the cursor of the next page, if any, in the response headers"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
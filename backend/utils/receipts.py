@@ -0,0 +1,200 @@
+from fastapi import HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
+from database import SessionLocal
+from models.expense import ExpenseReceipt
+from utils.storage import ReceiptStorage
+from utils.thumbnails import make_thumbnail, get_thumbnail_pool
+from utils.http_cache import etag_matches
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Uploads and downloads move through memory one chunk at a time
+CHUNK_SIZE = 1024 * 1024
+
+RECEIPT_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif", "application/pdf"}
+
+
+def store_receipt(storage: ReceiptStorage, key: str, upload: UploadFile, max_size: int) -> Tuple[int, str]:
+    """
+    Copy the upload to storage chunk by chunk, hashing it on the way.
+    Returns (size, sha256). Raises 413 past max_size, leaving nothing in storage.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Lo scontrino supera il limite di {max_size // (1024 * 1024)} MB"
+    )
+    if upload.size is not None and upload.size > max_size:
+        raise too_large
+
+    digest = hashlib.sha256()
+    size = 0
+
+    def chunks() -> Iterator[bytes]:
+        nonlocal size
+        while True:
+            chunk = upload.file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            size += len(chunk)
+            if size > max_size:
+                raise too_large
+            digest.update(chunk)
+            yield chunk
+
+    storage.write(key, chunks())
+    return size, digest.hexdigest()
+
+
+def thumbnail_key_for(key: str) -> str:
+    return f"{key}.thumb.jpg"
+
+
+def _save_thumbnail_key(receipt_id: int, thumbnail_key: str) -> bool:
+    db = SessionLocal()
+    try:
+        saved = db.execute(
+            update(ExpenseReceipt)
+            .where(ExpenseReceipt.id == receipt_id)
+            .values(thumbnail_key=thumbnail_key)
+        ).rowcount
+        db.commit()
+        return bool(saved)
+    finally:
+        db.close()
+
+
+async def generate_receipt_thumbnail(receipt_id: int, storage: ReceiptStorage, key: str):
+    """
+    Background task run after the upload response: the thumbnail is made in the
+    process pool, so neither the event loop nor the request threadpool waits for it.
+    """
+    thumbnail_key = thumbnail_key_for(key)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(get_thumbnail_pool(), make_thumbnail, storage, key, thumbnail_key)
+    except Exception as e:
+        logger.warning(f"Thumbnail of receipt {receipt_id} not generated: {e}")
+        return
+
+    if not await asyncio.to_thread(_save_thumbnail_key, receipt_id, thumbnail_key):
+        # The receipt was deleted in the meantime
+        await asyncio.to_thread(storage.delete, thumbnail_key)
+
+
+def delete_receipt_files(storage: ReceiptStorage, keys: Iterable[Tuple[str, Optional[str]]]):
+    """Remove (storage_key, thumbnail_key) files after their rows have been deleted"""
+    for storage_key, thumbnail_key in keys:
+        for key in (storage_key, thumbnail_key):
+            if key is None:
+                continue
+            try:
+                storage.delete(key)
+            except Exception as e:
+                logger.error(f"Error deleting receipt file {key}: {e}")
+
+
+def _byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single 'bytes=' range, None to send the whole file
+    (malformed or multiple ranges). Raises 416 when the range is past the end.
+    """
+    unit, _, spec = range_header.partition("=")
+    first, separator, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not separator:
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+        return None
+    if first and last and int(last) < int(first):
+        return None
+
+    if first:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        first, last = max(size - int(last), 0), size - 1
+
+    if first > last:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Intervallo non valido",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, last
+
+
+def _read_chunks(f: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def receipt_response(
+    request: Request,
+    storage: ReceiptStorage,
+    key: str,
+    etag: str,
+    content_type: str,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Stream a stored file with a strong ETag, answering If-None-Match with 304
+    and single Range requests (honouring If-Range) with 206.
+    The files never change once stored, so clients may cache them for good.
+    """
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        f = storage.open(key)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File non trovato"
+        )
+
+    try:
+        size = f.seek(0, 2)
+        first, last = 0, size - 1
+        status_code = status.HTTP_200_OK
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = _byte_range(range_header, size)
+            if byte_range:
+                first, last = byte_range
+                status_code = status.HTTP_206_PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    except BaseException:
+        f.close()
+        raise
+
+    headers["Content-Length"] = str(last - first + 1)
+    if filename:
+        headers["Content-Disposition"] = f"inline; filename*=UTF-8''{quote(filename)}"
+
+    return StreamingResponse(
+        _read_chunks(f, first, last - first + 1),
+        status_code=status_code,
+        headers=headers,
+        media_type=content_type
+    )
@@ -0,0 +1,207 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload
+from database import SessionLocal
+from models.expense import ExpenseGroup, GroupMember, RecurringExpense, RecurrenceFrequency
+from schemas.expense import ExpenseCreate
+from utils.balances import expense_deltas, new_delta_totals, accumulate_deltas, apply_balance_deltas
+from utils.analytics import rollup_deltas, apply_rollup_deltas
+from utils.expense_import import insert_expense_batch, BATCH_SIZE
+from utils.notifications import enqueue_notifications, push_notifications
+from utils.settlement import settlement_cache
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+import asyncio
+import calendar
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often the in-process scheduler looks for due occurrences
+SCHEDULER_INTERVAL = 3600
+
+
+def _add_months(day: date, months: int, day_of_month: int) -> date:
+    """Same day of the month, months later, clamped to the month length (31 → 28/29/30)"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(template: RecurringExpense, occurrence: date) -> date:
+    """Occurrence following the given one"""
+    if template.frequency == RecurrenceFrequency.SETTIMANALE:
+        return occurrence + timedelta(weeks=template.interval)
+    months = template.interval * (12 if template.frequency == RecurrenceFrequency.ANNUALE else 1)
+    return _add_months(occurrence, months, template.start_date.day)
+
+
+def first_occurrence_from(template: RecurringExpense, day: date) -> date:
+    """
+    First occurrence of the schedule (anchored on start_date) on or after day.
+    Used as next_run when a template is resumed or rescheduled, so the occurrences
+    it skipped meanwhile are not created all at once.
+    """
+    start = template.start_date
+    if start >= day:
+        return start
+
+    if template.frequency == RecurrenceFrequency.SETTIMANALE:
+        step = 7 * template.interval
+        periods = -(-(day - start).days // step)  # ceil
+        return start + timedelta(days=periods * step)
+
+    months = template.interval * (12 if template.frequency == RecurrenceFrequency.ANNUALE else 1)
+    periods = ((day.year - start.year) * 12 + day.month - start.month) // months
+    occurrence = _add_months(start, periods * months, start.day)
+    if occurrence < day:
+        occurrence = _add_months(start, (periods + 1) * months, start.day)
+    return occurrence
+
+
+def due_occurrences(template: RecurringExpense, today: date) -> List[date]:
+    """Occurrences from next_run up to today (included) that are still to be created"""
+    occurrences = []
+    occurrence = template.next_run
+    while occurrence <= today and (template.end_date is None or occurrence <= template.end_date):
+        occurrences.append(occurrence)
+        occurrence = next_occurrence(template, occurrence)
+    return occurrences
+
+
+def _as_expense(template: RecurringExpense) -> ExpenseCreate:
+    return ExpenseCreate(
+        descrizione=template.descrizione,
+        importo=template.importo,
+        tag=template.tag,
+        division_type=template.division_type,
+        paid_by_id=template.paid_by_id,
+        group_id=template.group_id,
+        participants=[
+            {"user_id": participant.user_id, "importo": participant.importo, "percentuale": participant.percentuale}
+            for participant in template.participants
+        ]
+    )
+
+
+def _materialize_group(db: Session, group_id: int, templates: List[RecurringExpense], today: date):
+    """
+    Create the due occurrences of a group's templates and commit them with the ledger,
+    the rollup and one notification. Returns (created expenses, notifications to push).
+    """
+    batch = []
+    deltas = new_delta_totals()
+    monthly_deltas = new_delta_totals()
+
+    for template in templates:
+        occurrences = due_occurrences(template, today)
+        next_run = next_occurrence(template, occurrences[-1]) if occurrences else template.next_run
+        is_finished = template.end_date is not None and next_run > template.end_date
+
+        claimed = db.execute(
+            update(RecurringExpense)
+            .where(RecurringExpense.id == template.id, RecurringExpense.next_run == template.next_run)
+            .values(next_run=next_run, active=not is_finished)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            continue  # Already materialized by another worker
+
+        expense = _as_expense(template)
+        for occurrence in occurrences:
+            created_at = datetime(occurrence.year, occurrence.month, occurrence.day, tzinfo=timezone.utc)
+            batch.append((expense, created_at))
+            accumulate_deltas(deltas, expense_deltas(expense))
+            accumulate_deltas(monthly_deltas, rollup_deltas(expense, created_at=created_at))
+
+    for start in range(0, len(batch), BATCH_SIZE):
+        insert_expense_batch(db, batch[start:start + BATCH_SIZE])
+    apply_balance_deltas(db, group_id, deltas)
+    apply_rollup_deltas(db, group_id, monthly_deltas)
+
+    notifications = []
+    if batch:
+        group_name = db.query(ExpenseGroup.nome).filter(ExpenseGroup.id == group_id).scalar()
+        member_ids = [
+            user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)
+        ]
+        notifications = enqueue_notifications(
+            db=db,
+            user_ids=member_ids,
+            notification_type="expense_group",
+            title="Spese ricorrenti aggiunte",
+            message=(
+                f"Aggiunta 1 spesa ricorrente in '{group_name}'" if len(batch) == 1
+                else f"Aggiunte {len(batch)} spese ricorrenti in '{group_name}'"
+            ),
+            reference_id=group_id,
+            reference_type="expense_group"
+        )
+
+    db.commit()
+    return batch, notifications
+
+
+def materialize_due_expenses(db: Session, today: Optional[date] = None) -> int:
+    """
+    Create every due occurrence of the active templates, catching up after downtime.
+    Each group is one transaction with one notification. next_run is advanced with
+    a compare-and-set in the same transaction, so an occurrence is never created twice.
+    A group that fails is rolled back and logged, and retried at the next pass.
+    Returns the number of expenses created.
+    """
+    today = today or datetime.now(timezone.utc).date()
+
+    templates = db.query(RecurringExpense)\
+        .options(selectinload(RecurringExpense.participants))\
+        .filter(RecurringExpense.active.is_(True), RecurringExpense.next_run <= today)\
+        .order_by(RecurringExpense.group_id, RecurringExpense.id)\
+        .all()
+
+    by_group = defaultdict(list)
+    for template in templates:
+        by_group[template.group_id].append(template)
+
+    created = 0
+    for group_id, group_templates in by_group.items():
+        try:
+            batch, notifications = _materialize_group(db, group_id, group_templates, today)
+        except Exception:
+            # A broken group must not hold back the groups after it, at every pass
+            db.rollback()
+            logger.exception(f"Error creating recurring expenses of group {group_id}")
+            continue
+        if batch:
+            settlement_cache.invalidate(group_id)
+            push_notifications(notifications)
+        created += len(batch)
+
+    return created
+
+
+def run_due_recurring_expenses() -> int:
+    """Materialize due recurring expenses with a dedicated session"""
+    db = SessionLocal()
+    try:
+        created = materialize_due_expenses(db)
+        if created:
+            logger.info(f"Created {created} recurring expenses")
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_scheduler(interval: int = SCHEDULER_INTERVAL):
+    """
+    Background loop started with the app: catches up right away (the instance may
+    have been asleep), then checks again every interval seconds.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(run_due_recurring_expenses)
+        except Exception as e:
+            logger.error(f"Error creating recurring expenses: {e}")
+        await asyncio.sleep(interval)
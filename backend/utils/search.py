@@ -0,0 +1,57 @@
+from sqlalchemy import Float, case, cast, func, literal_column, or_
+from sqlalchemy.orm import Session
+from models.expense import Expense, ExpenseGroup
+
+# Text search configuration of the full-text index (see migrate_search_indexes.py)
+TEXT_SEARCH_CONFIG = "italian"
+
+
+def _like_pattern(q: str) -> str:
+    """%q% with LIKE wildcards in q escaped"""
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def expense_search(db: Session, q: str):
+    """
+    (match, rank) SQL expressions searching q in the expense description and the group name.
+    On PostgreSQL: full-text and trigram matches, served by the GIN indexes of migrate_search_indexes.py.
+    Elsewhere (SQLite): a LIKE fallback, ranking description matches above group name matches.
+    The query must join ExpenseGroup.
+    """
+    pattern = _like_pattern(q)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Literals, not bound parameters, so the expression matches the GIN index
+        config = literal_column(f"'{TEXT_SEARCH_CONFIG}'")
+        description = func.coalesce(Expense.descrizione, literal_column("''"))
+        document = func.to_tsvector(config, description)
+        query = func.plainto_tsquery(config, q)
+
+        match = or_(
+            document.bool_op("@@")(query),
+            Expense.descrizione.op("%")(q),
+            Expense.descrizione.ilike(pattern, escape="\\"),
+            ExpenseGroup.nome.op("%")(q),
+            ExpenseGroup.nome.ilike(pattern, escape="\\"),
+        )
+        # ts_rank and similarity are real: as double precision the rank round-trips
+        # exactly through the JSON cursor, so the keyset comparison finds the last row again
+        rank = cast(func.greatest(
+            func.ts_rank(document, query),
+            func.similarity(description, q),
+            func.similarity(ExpenseGroup.nome, q) / 2
+        ), Float(53))
+        return match, rank
+
+    match = or_(
+        Expense.descrizione.ilike(pattern, escape="\\"),
+        ExpenseGroup.nome.ilike(pattern, escape="\\"),
+    )
+    starts_with = pattern[1:]  # q%
+    rank = case(
+        (Expense.descrizione.ilike(starts_with, escape="\\"), 1.0),
+        (Expense.descrizione.ilike(pattern, escape="\\"), 0.75),
+        else_=0.5
+    )
+    return match, rank
@@ -0,0 +1,91 @@
+from sqlalchemy.orm import Session
+from schemas.expense import Balance, Transfer
+from utils.balances import read_group_balances
+from typing import Dict, List
+import heapq
+import threading
+
+
+def simplify_debts(balances: List[Balance]) -> List[Transfer]:
+    """
+    Turn net balances into a short list of transfers (greedy min cash flow).
+    The largest debtor always pays the largest creditor, so every transfer
+    settles at least one member: at most n - 1 transfers for n members.
+    """
+    names = {balance.user_id: balance.user_name for balance in balances}
+
+    # Work in cents to avoid leaving floating point crumbs behind
+    creditors = []
+    debtors = []
+    for balance in balances:
+        cents = round(balance.balance * 100)
+        if cents > 0:
+            heapq.heappush(creditors, (-cents, balance.user_id))
+        elif cents < 0:
+            heapq.heappush(debtors, (cents, balance.user_id))
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debt, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+
+        transfers.append(Transfer(
+            from_user_id=debtor_id,
+            from_user_name=names[debtor_id],
+            to_user_id=creditor_id,
+            to_user_name=names[creditor_id],
+            amount=amount / 100
+        ))
+
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+
+    return transfers
+
+
+class SettlementCache:
+    """In-process cache of settlement plans, one entry per group"""
+
+    def __init__(self):
+        self._plans: Dict[int, List[Transfer]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, group_id: int) -> int:
+        with self._lock:
+            return self._generations.get(group_id, 0)
+
+    def get(self, group_id: int):
+        with self._lock:
+            return self._plans.get(group_id)
+
+    def set(self, group_id: int, transfers: List[Transfer], generation: int):
+        """Store a plan unless the group was invalidated while it was being computed"""
+        with self._lock:
+            if self._generations.get(group_id, 0) == generation:
+                self._plans[group_id] = transfers
+
+    def invalidate(self, group_id: int):
+        """Drop the plan of a group. Call it after committing any change to its balances."""
+        with self._lock:
+            self._plans.pop(group_id, None)
+            self._generations[group_id] = self._generations.get(group_id, 0) + 1
+
+
+# Global instance
+settlement_cache = SettlementCache()
+
+
+def get_settlement(db: Session, group_id: int) -> List[Transfer]:
+    """Return the cached settlement plan of a group, computing it from the balance ledger if needed"""
+    transfers = settlement_cache.get(group_id)
+    if transfers is not None:
+        return transfers
+
+    generation = settlement_cache.generation(group_id)
+    transfers = simplify_debts(read_group_balances(db, group_id))
+    settlement_cache.set(group_id, transfers, generation)
+    return transfers
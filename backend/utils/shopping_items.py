@@ -0,0 +1,486 @@
+from sqlalchemy import String, case, cast, insert, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.shopping import (
+    ShoppingList, ShoppingItem, ShoppingItemTombstone, ShoppingClientMutation, SharedList, normalize_item_name
+)
+from schemas.shopping import (
+    ShoppingItemOperation, ShoppingItemOperationResult, ShoppingItem as ShoppingItemSchema,
+    ShoppingListMutation, ShoppingListMutationResult
+)
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+ITEM_COLUMNS = (
+    ShoppingItem.id,
+    ShoppingItem.shopping_list_id,
+    ShoppingItem.nome,
+    ShoppingItem.normalized_name,
+    ShoppingItem.quantita,
+    ShoppingItem.note,
+    ShoppingItem.completato,
+    ShoppingItem.completed_by_id,
+    ShoppingItem.version,
+    ShoppingItem.list_version,
+    ShoppingItem.completato_changed_at,
+    ShoppingItem.quantita_changed_at,
+    ShoppingItem.created_at,
+    ShoppingItem.updated_at,
+)
+
+
+def duplicate_item_error(nome: str) -> str:
+    return f"L'articolo '{nome}' è già presente nella lista"
+
+
+def accessible_lists(user_id: int):
+    """Filter on ShoppingList: lists owned by or shared with the user"""
+    return or_(
+        ShoppingList.owner_id == user_id,
+        ShoppingList.id.in_(
+            select(SharedList.shopping_list_id).where(SharedList.shared_with_id == user_id)
+        )
+    )
+
+
+def bump_list_version(db: Session, list_id: int, user_id: Optional[int] = None) -> Optional[int]:
+    """
+    Next version of a list, for the items changed by the current transaction.
+    Call it before touching the items: the list row stays locked until commit,
+    so versions become visible in order and a since cursor never skips a change.
+    With user_id the access check is part of the UPDATE: None if the user can't access the list.
+    """
+    statement = update(ShoppingList).where(ShoppingList.id == list_id)
+    if user_id is not None:
+        statement = statement.where(accessible_lists(user_id))
+    return db.execute(
+        statement
+        .values(version=ShoppingList.version + 1)
+        .returning(ShoppingList.version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+
+def record_deletions(db: Session, list_id: int, item_ids: List[int], version: int):
+    """Leave a tombstone for each deleted item, with one INSERT"""
+    if item_ids:
+        db.execute(insert(ShoppingItemTombstone).values([
+            {"shopping_list_id": list_id, "item_id": item_id, "list_version": version}
+            for item_id in item_ids
+        ]))
+
+
+def _dialect_insert(db: Session):
+    """INSERT construct of the session's dialect, for ON CONFLICT ... DO NOTHING"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def insert_items(db: Session, items: List[dict]) -> list:
+    """
+    Insert items with a single INSERT ... ON CONFLICT DO NOTHING on (shopping_list_id, normalized_name).
+    The unique index makes the duplicate check an index lookup and safe under concurrent adds.
+    Returns the inserted rows: items whose name is already in the list are missing.
+    """
+    if not items:
+        return []
+
+    now = datetime.now(timezone.utc)
+    return db.execute(
+        _dialect_insert(db)(ShoppingItem)
+        .values([
+            {
+                "completato_changed_at": now,
+                "quantita_changed_at": now,
+                **item,
+                "normalized_name": normalize_item_name(item["nome"]),
+            }
+            for item in items
+        ])
+        .on_conflict_do_nothing(index_elements=["shopping_list_id", "normalized_name"])
+        .returning(*ITEM_COLUMNS)
+    ).all()
+
+
+def update_item(
+    db: Session,
+    list_id: int,
+    item_id: int,
+    changes: dict,
+    expected_version: Optional[int],
+    list_version: int,
+    user_id: int
+):
+    """
+    Apply ShoppingItemUpdate fields with a single UPDATE ... RETURNING, only if the item
+    is still at expected_version (any version when None). The columns kept by the model
+    validators (normalized_name, *_changed_at) are computed in the statement.
+    Returns (row, just completed), or (None, False) when no item matched.
+    """
+    now = datetime.now(timezone.utc)
+    values = {"version": ShoppingItem.version + 1, "list_version": list_version}
+    if changes.get("nome") is not None:
+        key = normalize_item_name(changes["nome"])
+        values["nome"] = changes["nome"]
+        # Keep the id-suffixed key of a legacy duplicate (see migrate_item_names.py) when
+        # the name keeps its key, e.g. an edit form that always sends nome
+        values["normalized_name"] = case(
+            (ShoppingItem.normalized_name == literal(f"{key}#").concat(cast(ShoppingItem.id, String)),
+             ShoppingItem.normalized_name),
+            else_=key
+        )
+    for field in ("quantita", "note"):
+        if field in changes:
+            values[field] = changes[field]
+    if changes.get("completato") is not None:
+        values["completato"] = changes["completato"]
+        # If marking as completed, save who completed it
+        if changes["completato"]:
+            values["completed_by_id"] = user_id
+    for field in LAST_WRITER_WINS_FIELDS:
+        if field in values:
+            changed_at = getattr(ShoppingItem, f"{field}_changed_at")
+            values[changed_at.key] = case(
+                (getattr(ShoppingItem, field).is_distinct_from(values[field]), now),
+                else_=changed_at
+            )
+
+    statement = update(ShoppingItem).where(ShoppingItem.id == item_id, ShoppingItem.shopping_list_id == list_id)
+    if expected_version is not None:
+        statement = statement.where(ShoppingItem.version == expected_version)
+    row = db.execute(
+        statement
+        .values(values)
+        .returning(*ITEM_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None, False
+
+    # completato_changed_at is only moved to now when completato actually changed
+    just_completed = bool(changes.get("completato")) and _as_utc(row.completato_changed_at) == now
+    return row, just_completed
+
+
+def apply_item_operations(
+    db: Session,
+    list_id: int,
+    operations: List[ShoppingItemOperation],
+    user_id: int
+) -> Tuple[Optional[int], List[ShoppingItemOperationResult], list, List[ShoppingItem]]:
+    """
+    Apply add/update/complete/delete operations inside the caller's transaction, as one list version.
+    Referenced items are loaded with one query; updates and deletes are applied in order,
+    then all additions are inserted with one INSERT ... ON CONFLICT. Failed operations
+    are reported and skipped. The list version is bumped before the first read or write;
+    the caller rolls back a batch where nothing went through, bump included.
+    Returns (list version, None when nothing was bumped, results, added rows, completed items).
+    """
+    version = None
+
+    def next_version() -> int:
+        nonlocal version
+        if version is None:
+            version = bump_list_version(db, list_id)
+        return version
+
+    item_ids = {operation.item_id for operation in operations if operation.item_id is not None}
+    items = {}
+    if item_ids:
+        # Lock the list row before reading the items, so concurrent batches see each other's changes
+        next_version()
+        items = {
+            item.id: item for item in db.query(ShoppingItem).filter(
+                ShoppingItem.shopping_list_id == list_id,
+                ShoppingItem.id.in_(item_ids)
+            )
+        }
+
+    results: List[Optional[ShoppingItemOperationResult]] = [None] * len(operations)
+    changed = []
+    deleted_ids = []
+    additions = {}  # normalized name → (index, operation)
+    completed = []
+
+    def fail(index: int, operation: ShoppingItemOperation, error: str):
+        results[index] = ShoppingItemOperationResult(index=index, op=operation.op, success=False, error=error)
+
+    for index, operation in enumerate(operations):
+        if operation.op == "add":
+            key = normalize_item_name(operation.nome)
+            if key in additions:
+                fail(index, operation, duplicate_item_error(operation.nome.strip()))
+            else:
+                additions[key] = (index, operation)
+            continue
+
+        item = items.get(operation.item_id)
+        if item is None:
+            fail(index, operation, "Articolo non trovato")
+            continue
+
+        if operation.op == "delete":
+            db.delete(item)
+            del items[item.id]
+            deleted_ids.append(item.id)
+            results[index] = ShoppingItemOperationResult(index=index, op=operation.op, success=True)
+            continue
+
+        if operation.op == "complete":
+            values = {"completato": True}
+        else:
+            values = operation.model_dump(exclude_unset=True, exclude={"op", "item_id"})
+            if values.get("nome") is None:
+                values.pop("nome", None)
+
+        if "nome" in values and normalize_item_name(values["nome"]) != normalize_item_name(item.nome):
+            # A rename may hit the unique name index: check it in a savepoint
+            try:
+                with db.begin_nested():
+                    item.nome = values.pop("nome")
+            except IntegrityError:
+                fail(index, operation, duplicate_item_error(operation.nome))
+                continue
+
+        was_completed = item.completato
+        for field, value in values.items():
+            setattr(item, field, value)
+
+        # If marking as completed, save who completed it
+        if values.get("completato") is True:
+            item.completed_by_id = user_id
+            if not was_completed:
+                completed.append(item)
+
+        item.list_version = version
+        item.version += 1
+        changed.append((index, operation, item))
+
+    # Updates and deletes go first, so a deleted name can be added again in the same batch
+    db.flush()
+    record_deletions(db, list_id, deleted_ids, version)
+    for index, operation, item in changed:
+        results[index] = ShoppingItemOperationResult(
+            index=index,
+            op=operation.op,
+            success=True,
+            item=ShoppingItemSchema.model_validate(item)
+        )
+
+    added = insert_items(db, [
+        {
+            "shopping_list_id": list_id,
+            "nome": operation.nome.strip(),
+            "quantita": operation.quantita,
+            "note": operation.note,
+            "completato": bool(operation.completato),
+            "completed_by_id": user_id if operation.completato else None,
+            "list_version": next_version(),
+        }
+        for index, operation in additions.values()
+    ])
+    added_by_name = {row.normalized_name: row for row in added}
+    for key, (index, operation) in additions.items():
+        row = added_by_name.get(key)
+        if row is None:
+            fail(index, operation, duplicate_item_error(operation.nome.strip()))
+        else:
+            results[index] = ShoppingItemOperationResult(
+                index=index,
+                op=operation.op,
+                success=True,
+                item=ShoppingItemSchema.model_validate(row)
+            )
+
+    return version, results, added, completed
+
+
+# Fields merged last-writer-wins by replay_mutations, each with its <field>_changed_at column
+LAST_WRITER_WINS_FIELDS = ("completato", "quantita")
+
+
+def _as_utc(moment: datetime) -> datetime:
+    """Aware UTC datetime: SQLite returns naive ones, and clients may send them"""
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def _claim_client_ids(db: Session, list_id: int, client_ids: List[str], user_id: int) -> set:
+    """Record the mutation ids with one INSERT ... ON CONFLICT DO NOTHING, returning the ones not replayed before"""
+    return set(db.execute(
+        _dialect_insert(db)(ShoppingClientMutation)
+        .values([
+            {"shopping_list_id": list_id, "client_id": client_id, "user_id": user_id}
+            for client_id in dict.fromkeys(client_ids)
+        ])
+        .on_conflict_do_nothing(index_elements=["shopping_list_id", "client_id"])
+        .returning(ShoppingClientMutation.client_id)
+    ).scalars())
+
+
+def replay_mutations(
+    db: Session,
+    list_id: int,
+    mutations: List[ShoppingListMutation],
+    user_id: int
+) -> Tuple[int, bool, List[ShoppingListMutationResult], List[ShoppingItem], List[ShoppingItem], List[ShoppingItem]]:
+    """
+    Apply a log of offline changes inside the caller's transaction, as one list version.
+    Mutations are idempotent: a client_id already replayed is skipped, so the client can
+    resend its queue after a lost response. Conflicts are settled by the data, not by who
+    reconnects first: completato and quantita keep the value with the latest timestamp
+    (online changes included), nome and note follow the log, deleted items stay deleted.
+    The list version is only bumped by the first mutation that changes something: a resent
+    queue of duplicates leaves it, and every member's sync cursor, untouched.
+    Returns (list version, whether anything changed, results, items of the list, added items,
+    completed items).
+    """
+    now = datetime.now(timezone.utc)
+    new_ids = _claim_client_ids(db, list_id, [mutation.client_id for mutation in mutations], user_id)
+    version = None
+
+    def next_version() -> int:
+        # Before the first write to the items: the list row lock orders concurrent replays
+        nonlocal version
+        if version is None:
+            version = bump_list_version(db, list_id)
+        return version
+
+    items = db.query(ShoppingItem).filter(ShoppingItem.shopping_list_id == list_id).all()
+    by_id = {item.id: item for item in items}
+    by_name = {item.normalized_name: item for item in items}
+    freed_names = set()  # Names of deleted or renamed items, not flushed yet
+    deleted_ids = []
+    added = []
+    completed = []
+    outcomes = []  # (mutation, status, item, error)
+
+    def take_name(key: str):
+        # The unit of work runs INSERTs and UPDATEs before DELETEs: free the name in the database first
+        if key in freed_names:
+            db.flush()
+            freed_names.clear()
+
+    for mutation in mutations:
+        if mutation.client_id not in new_ids:
+            outcomes.append((mutation, "duplicate", None, None))
+            continue
+        new_ids.discard(mutation.client_id)  # A repeated id in the same log is a duplicate too
+
+        # A clock ahead of the server mustn't win every later conflict
+        timestamp = min(_as_utc(mutation.timestamp), now)
+        if mutation.op != "add" and mutation.item_id is not None:
+            item = by_id.get(mutation.item_id)
+        else:
+            item = by_name.get(normalize_item_name(mutation.nome))
+
+        if item is None:
+            if mutation.op == "add":
+                key = normalize_item_name(mutation.nome)
+                take_name(key)
+                item = ShoppingItem(
+                    shopping_list_id=list_id,
+                    nome=mutation.nome.strip(),
+                    quantita=mutation.quantita,
+                    note=mutation.note,
+                    completato=bool(mutation.completato),
+                    completed_by_id=user_id if mutation.completato else None,
+                    list_version=next_version()
+                )
+                item.completato_changed_at = item.quantita_changed_at = timestamp
+                db.add(item)
+                by_name[key] = item
+                added.append(item)
+                if item.completato:
+                    completed.append(item)
+                outcomes.append((mutation, "applied", item, None))
+            elif mutation.op == "delete":
+                outcomes.append((mutation, "applied", None, None))  # Already deleted
+            else:
+                outcomes.append((mutation, "rejected", None, "Articolo non trovato"))
+            continue
+
+        if mutation.op == "delete":
+            del by_name[item.normalized_name]
+            if item.id is None:
+                db.expunge(item)  # Added earlier in the same log
+            else:
+                next_version()
+                db.delete(item)
+                freed_names.add(item.normalized_name)
+                del by_id[item.id]
+                deleted_ids.append(item.id)
+            outcomes.append((mutation, "applied", item, None))
+            continue
+
+        if mutation.op == "complete":
+            values = {"completato": True}
+        else:
+            values = {
+                field: value for field, value in mutation.model_dump(
+                    exclude_unset=True, include={"nome", "quantita", "note", "completato"}
+                ).items()
+                if value is not None or field in ("quantita", "note")
+            }
+            if mutation.op == "add":
+                values.pop("nome", None)  # Same item added on both sides: merge the other fields
+
+        changed = False
+        superseded = False
+
+        if "nome" in values and normalize_item_name(values["nome"]) != normalize_item_name(item.nome):
+            key = normalize_item_name(values["nome"])
+            if key in by_name:
+                outcomes.append((mutation, "rejected", item, duplicate_item_error(values["nome"].strip())))
+                continue
+            take_name(key)
+            del by_name[item.normalized_name]
+            freed_names.add(item.normalized_name)
+            item.nome = values["nome"].strip()
+            by_name[key] = item
+            changed = True
+
+        if "note" in values and values["note"] != item.note:
+            item.note = values["note"]
+            changed = True
+
+        for field in LAST_WRITER_WINS_FIELDS:
+            if field not in values:
+                continue
+            changed_at = getattr(item, f"{field}_changed_at")
+            if changed_at is not None and _as_utc(changed_at) > timestamp:
+                superseded = True
+                continue
+            if values[field] != getattr(item, field):
+                setattr(item, field, values[field])
+                changed = True
+                if field == "completato" and values[field]:
+                    item.completed_by_id = user_id
+                    completed.append(item)
+            setattr(item, f"{field}_changed_at", timestamp)
+
+        if changed:
+            item.list_version = next_version()
+            if item.id is not None:
+                item.version += 1
+        outcomes.append((mutation, "superseded" if superseded and not changed else "applied", item, None))
+
+    db.flush()
+    bumped = version is not None
+    if bumped:
+        record_deletions(db, list_id, deleted_ids, version)
+    else:
+        version = db.query(ShoppingList.version).filter(ShoppingList.id == list_id).scalar()
+
+    results = [
+        ShoppingListMutationResult(
+            client_id=mutation.client_id,
+            status=status,
+            item_id=item.id if item is not None else None,
+            error=error
+        )
+        for mutation, status, item, error in outcomes
+    ]
+    # Items deleted later in the same log are no longer in the session
+    added = [item for item in added if item in db]
+    completed = [item for item in dict.fromkeys(completed) if item in db and item.completato]
+    return version, bumped, results, sorted(by_name.values(), key=lambda item: item.id), added, completed
@@ -0,0 +1,68 @@
+from abc import ABC, abstractmethod
+from config import settings
+from typing import BinaryIO, Iterable
+import os
+
+
+class ReceiptStorage(ABC):
+    """
+    Where receipt files and thumbnails are kept, by key.
+    Subclass it to use object storage (S3, R2, ...) and override get_receipt_storage.
+    Instances are passed to the thumbnail worker process, so they must be picklable.
+    """
+
+    @abstractmethod
+    def write(self, key: str, chunks: Iterable[bytes]):
+        """Store the chunks under key. If the iteration raises, nothing must be left behind."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Seekable binary file object with the content stored under key"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove the file stored under key, if any"""
+
+
+class LocalReceiptStorage(ReceiptStorage):
+    """Files on the local disk, under root"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def write(self, key: str, chunks: Iterable[bytes]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.part"
+        try:
+            with open(partial_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(partial_path, path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+_receipt_storage = LocalReceiptStorage(settings.RECEIPT_STORAGE_DIR)
+
+
+def get_receipt_storage() -> ReceiptStorage:
+    """Dependency returning the configured receipt storage"""
+    return _receipt_storage
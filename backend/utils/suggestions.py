@@ -0,0 +1,160 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models.shopping import ShoppingList, ShoppingItem, SharedList, normalize_item_name
+from schemas.shopping import ShoppingItemSuggestion
+from utils.notifications import shopping_list_member_ids
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+import bisect
+import threading
+
+# Users whose index is kept in memory, least recently used ones are dropped first
+SUGGESTION_CACHE_SIZE = 1000
+
+
+class SuggestionIndex:
+    """
+    Item names bought by a user, ranked by how many times they were added.
+    Every word start of a name is a key of a sorted array, so "lat" and "int"
+    both find "Latte intero" with a bisect.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []  # (name from a word start, normalized name), sorted
+        self._names: Dict[str, Tuple[str, int]] = {}  # normalized name → (display name, count)
+
+    def add(self, nome: str, count: int = 1):
+        name_key = normalize_item_name(nome)
+        if not name_key:
+            return
+        display, previous = self._names.get(name_key, (nome.strip(), 0))
+        self._names[name_key] = (display, previous + count)
+        if previous:
+            return
+
+        words = name_key.split(" ")
+        for start in range(len(words)):
+            bisect.insort(self._keys, (" ".join(words[start:]), name_key))
+
+    def search(self, q: str, limit: int) -> List[ShoppingItemSuggestion]:
+        prefix = normalize_item_name(q)
+        if not prefix:
+            return []
+
+        matches = set()
+        position = bisect.bisect_left(self._keys, (prefix, ""))
+        while position < len(self._keys) and self._keys[position][0].startswith(prefix):
+            matches.add(self._keys[position][1])
+            position += 1
+
+        # Most bought first, then the shortest name: "Latte" before "Latte intero"
+        ranked = sorted(matches, key=lambda name_key: (-self._names[name_key][1], len(name_key), name_key))
+        return [
+            ShoppingItemSuggestion(nome=self._names[name_key][0], count=self._names[name_key][1])
+            for name_key in ranked[:limit]
+        ]
+
+
+class SuggestionCache:
+    """
+    In-process LRU of suggestion indexes, one entry per user.
+    Changes to a user's names are stamped with a global generation counter; only the
+    latest max_size stamps are kept, older ones count as the newest pruned stamp.
+    Memory stays bounded, and an index built across a pruned change is just not cached.
+    """
+
+    def __init__(self, max_size: int = SUGGESTION_CACHE_SIZE):
+        self._indexes: "OrderedDict[int, SuggestionIndex]" = OrderedDict()
+        self._changes: "OrderedDict[int, int]" = OrderedDict()  # user → generation of their last change
+        self._generation = 0
+        self._pruned_generation = 0
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> int:
+        """Generation to pass to set() for an index whose build starts now"""
+        with self._lock:
+            return self._generation
+
+    def search(self, user_id: int, q: str, limit: int):
+        """Suggestions for q, None when the user's index isn't built"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return None
+            self._indexes.move_to_end(user_id)
+            return index.search(q, limit)
+
+    def set(self, user_id: int, index: SuggestionIndex, generation: int):
+        """Store an index unless names were added for the user while it was being built"""
+        with self._lock:
+            if self._changes.get(user_id, self._pruned_generation) > generation:
+                return
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self._max_size:
+                self._indexes.popitem(last=False)
+
+    def _changed(self, user_id: int):
+        self._generation += 1
+        self._changes[user_id] = self._generation
+        self._changes.move_to_end(user_id)
+        while len(self._changes) > self._max_size:
+            _, self._pruned_generation = self._changes.popitem(last=False)
+
+    def add(self, user_ids: Iterable[int], names: List[str]):
+        """Add item names to the built indexes of the users. Call it after committing."""
+        with self._lock:
+            for user_id in user_ids:
+                self._changed(user_id)
+                index = self._indexes.get(user_id)
+                if index is not None:
+                    for nome in names:
+                        index.add(nome)
+
+    def invalidate(self, user_id: int):
+        """Drop the index of a user, e.g. after joining a list with its own history"""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            self._changed(user_id)
+
+
+# Global instance
+suggestion_cache = SuggestionCache()
+
+
+def build_suggestion_index(db: Session, user_id: int) -> SuggestionIndex:
+    """Index of the items of every list the user owns or is shared on, with one query"""
+    list_ids = select(ShoppingList.id).where(ShoppingList.owner_id == user_id).union(
+        select(SharedList.shopping_list_id).where(SharedList.shared_with_id == user_id)
+    )
+    # min: capitalized spellings ("Latte") sort before lowercase ones
+    names = db.query(func.min(ShoppingItem.nome), func.count())\
+        .filter(ShoppingItem.shopping_list_id.in_(list_ids))\
+        .group_by(ShoppingItem.normalized_name)
+
+    index = SuggestionIndex()
+    for nome, count in names:
+        index.add(nome, count)
+    return index
+
+
+def get_suggestions(db: Session, user_id: int, q: str, limit: int) -> List[ShoppingItemSuggestion]:
+    """
+    Item names starting with q, from the user's purchase history. The index is built
+    from the database on the first call, then answered from memory.
+    """
+    suggestions = suggestion_cache.search(user_id, q, limit)
+    if suggestions is not None:
+        return suggestions
+
+    generation = suggestion_cache.generation(user_id)
+    index = build_suggestion_index(db, user_id)
+    suggestion_cache.set(user_id, index, generation)
+    return index.search(q, limit)
+
+
+def record_item_names(db: Session, list_id: int, names: List[str]):
+    """Add the names of new items to the indexes of the list members. Call it after committing."""
+    if names:
+        suggestion_cache.add(shopping_list_member_ids(db, list_id), names)
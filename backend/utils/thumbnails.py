@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import io
+import multiprocessing
+
+THUMBNAIL_SIZE = (320, 320)
+# Formats Pillow reads out of the box (HEIC and PDF receipts have no thumbnail)
+THUMBNAIL_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
+# One worker is enough for a small instance and bounds the memory used by decoding
+THUMBNAIL_WORKERS = 1
+
+_thumbnail_pool: Optional[ProcessPoolExecutor] = None
+
+
+def make_thumbnail(storage, key: str, thumbnail_key: str):
+    """
+    Write a JPEG thumbnail of the image stored under key. Runs in the thumbnail process pool.
+    JPEGs are decoded at a reduced scale (draft mode), so large phone photos
+    never get fully decoded in memory.
+    """
+    from PIL import Image, ImageOps
+
+    with storage.open(key) as f:
+        with Image.open(f) as image:
+            image.draft("RGB", THUMBNAIL_SIZE)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(THUMBNAIL_SIZE)
+            output = io.BytesIO()
+            image.convert("RGB").save(output, "JPEG", quality=80)
+
+    storage.write(thumbnail_key, [output.getvalue()])
+
+
+def get_thumbnail_pool() -> ProcessPoolExecutor:
+    """Process pool for thumbnails, created on first use"""
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        # spawn: forking a process that runs threads (the request threadpool) is unsafe
+        _thumbnail_pool = ProcessPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _thumbnail_pool
+
+
+def shutdown_thumbnail_pool():
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
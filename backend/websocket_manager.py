@@ -1,17 +1,33 @@
-from typing import Dict, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from fastapi import WebSocket
+import asyncio
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Item events of a list within this many seconds are merged into one frame
+LIST_EVENTS_WINDOW = 0.2
+
+def merge_item_events(previous: dict, event: dict) -> Optional[dict]:
+    """Single event with the latest state of an item, None when it was added and deleted in the same window"""
+    first, last = sorted((previous, event), key=lambda item_event: item_event["version"])
+    if first["type"] == "item_added":
+        return None if last["type"] == "item_deleted" else {**last, "type": "item_added"}
+    return last
+
 class ConnectionManager:
     def __init__(self):
         # Store active connections: {user_id: Set[WebSocket]}
         self.active_connections: Dict[int, Set[WebSocket]] = {}
+        # Loop serving the connections, to reach them from sync endpoints running in the threadpool
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Item events waiting for their list's window to end: {list_id: (user_ids, {item_id: event})}
+        self.pending_list_events: Dict[int, Tuple[Set[int], Dict[int, dict]]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: int):
         """Accept and store a new WebSocket connection for a user"""
+        self.loop = asyncio.get_running_loop()
         await websocket.accept()
 
         if user_id not in self.active_connections:
@@ -52,6 +68,54 @@ class ConnectionManager:
         for user_id in user_ids:
             await self.send_personal_message(message, user_id)
 
+    def call_soon(self, callback, *args) -> bool:
+        """Run callback on the connections' loop, from any thread. False if no connection was ever made"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(callback, *args)
+        return True
+
+    def send_soon(self, message: dict, user_id: int):
+        """Send a message to all connections of a user from any thread, without waiting for it"""
+        self.call_soon(lambda: asyncio.ensure_future(self.send_personal_message(message, user_id)))
+
+    def publish_list_events(self, list_id: int, user_ids: Iterable[int], events: List[dict]):
+        """
+        Queue item events for the members of a list, from any thread. Events arriving within
+        LIST_EVENTS_WINDOW are merged per item and sent as one frame to each connected member.
+        """
+        self.call_soon(self._queue_list_events, list_id, set(user_ids), events)
+
+    def _queue_list_events(self, list_id: int, user_ids: Set[int], events: List[dict]):
+        if list_id not in self.pending_list_events:
+            self.pending_list_events[list_id] = (set(), {})
+            self.loop.call_later(LIST_EVENTS_WINDOW, self._flush_list_events, list_id)
+
+        recipients, by_item = self.pending_list_events[list_id]
+        recipients.update(user_ids)
+        for event in events:
+            previous = by_item.pop(event["item_id"], None)
+            merged = event if previous is None else merge_item_events(previous, event)
+            if merged is not None:
+                by_item[event["item_id"]] = merged
+
+    def _flush_list_events(self, list_id: int):
+        recipients, by_item = self.pending_list_events.pop(list_id)
+        if not by_item:
+            return
+
+        events = sorted(by_item.values(), key=lambda event: (event["version"], event["item_id"]))
+        frame = {
+            "type": "shopping_list_changes",
+            "list_id": list_id,
+            "version": events[-1]["version"],
+            "events": events
+        }
+        connected = [user_id for user_id in recipients if self.is_user_connected(user_id)]
+        if connected:
+            asyncio.ensure_future(self.broadcast_to_users(frame, connected))
+
     def get_connected_users(self) -> Set[int]:
         """Get set of currently connected user IDs"""
         return set(self.active_connections.keys())
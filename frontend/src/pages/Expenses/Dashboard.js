@@ -49,7 +49,7 @@ const Dashboard = () => {
                            (group.descrizione && group.descrizione.toLowerCase().includes(searchTerm.toLowerCase()));
 
       // Filter by minimum members
-      const matchesMembers = minMembers === '' || (group.members?.length || 0) >= parseInt(minMembers);
+      const matchesMembers = minMembers === '' || (group.member_count || 0) >= parseInt(minMembers);
 
       return matchesSearch && matchesMembers;
     })
@@ -156,13 +156,13 @@ const Dashboard = () => {
                   <span className="expenses-group-stat-icon">
                     <UsersIcon size={18} />
                   </span>
-                  <span>{group.members?.length || 0} membri</span>
+                  <span>{group.member_count || 0} membri</span>
                 </div>
                 <div className="expenses-group-stat">
                   <span className="expenses-group-stat-icon">
                     <BarChartIcon size={18} />
                   </span>
-                  <span>{group.expenses?.length || 0} spese</span>
+                  <span>{group.expense_count || 0} spese</span>
                 </div>
               </div>
             </Link>
@@ -45,7 +45,7 @@ const Summary = () => {
     let totalExpenses = 0;
 
     groups.forEach(group => {
-      totalExpenses += group.expenses?.length || 0;
+      totalExpenses += group.expense_count || 0;
 
       const groupBalances = balances[group.id] || [];
       const userBalance = groupBalances.find(b => b.user_id === currentUser?.id);
@@ -286,7 +286,7 @@ const Summary = () => {
                     <div style={{ flex: '1 1 200px' }}>
                       <h3 style={{ margin: 0, color: '#2c3e50', fontSize: '1.1rem' }}>{group.nome}</h3>
                       <p style={{ margin: '0.25rem 0 0 0', color: '#7f8c8d', fontSize: '0.85rem' }}>
-                        {group.members?.length || 0} membri • {group.expenses?.length || 0} spese
+                        {group.member_count || 0} membri • {group.expense_count || 0} spese
                       </p>
                     </div>
                     {userBalance && (
@@ -88,7 +88,7 @@ const ShoppingListDetail = () => {
     if (item.completato) {
       // If item is completed, unflag it
       try {
-        await shoppingAPI.updateItem(listId, item.id, { completato: false });
+        await shoppingAPI.updateItem(listId, item.id, { completato: false, version: item.version });
         setNewItem({ nome: '', quantita: '', note: '' });
         setShowModal(false);
         setSuggestions([]);
@@ -96,6 +96,7 @@ const ShoppingListDetail = () => {
         loadList();
       } catch (error) {
         console.error('Error updating item:', error);
+        handleConflict(error);
       }
     } else {
       // Item is already in the list and not completed
@@ -114,7 +115,13 @@ const ShoppingListDetail = () => {
     if (existingItem) {
       if (existingItem.completato) {
         // Unflag it
-        await shoppingAPI.updateItem(listId, existingItem.id, { completato: false });
+        try {
+          await shoppingAPI.updateItem(listId, existingItem.id, { completato: false, version: existingItem.version });
+        } catch (error) {
+          console.error('Error updating item:', error);
+          handleConflict(error);
+          return;
+        }
       } else {
         alert(`L'articolo "${existingItem.nome}" è già presente nella lista.`);
         return;
@@ -148,7 +155,8 @@ const ShoppingListDetail = () => {
       await shoppingAPI.updateItem(listId, editingItem.id, {
         nome: newItem.nome,
         quantita: newItem.quantita,
-        note: newItem.note
+        note: newItem.note,
+        version: editingItem.version
       });
       setNewItem({ nome: '', quantita: '', note: '' });
       setEditingItem(null);
@@ -158,7 +166,9 @@ const ShoppingListDetail = () => {
       loadList();
     } catch (error) {
       console.error('Error updating item:', error);
-      alert('Errore durante l\'aggiornamento dell\'articolo');
+      if (!handleConflict(error)) {
+        alert('Errore durante l\'aggiornamento dell\'articolo');
+      }
     }
   };
 
@@ -172,12 +182,25 @@ const ShoppingListDetail = () => {
     setShowModal(true);
   };
 
-  const handleToggleItem = async (itemId, completed) => {
+  // The item was changed by someone else since the list was loaded: show the current one
+  const handleConflict = (error) => {
+    if (error.response && error.response.status === 409) {
+      alert(error.response.data.detail);
+      setEditingItem(null);
+      setShowModal(false);
+      loadList();
+      return true;
+    }
+    return false;
+  };
+
+  const handleToggleItem = async (item) => {
     try {
-      await shoppingAPI.updateItem(listId, itemId, { completato: !completed });
+      await shoppingAPI.updateItem(listId, item.id, { completato: !item.completato, version: item.version });
       loadList();
     } catch (error) {
       console.error('Error updating item:', error);
+      handleConflict(error);
     }
   };
 
@@ -456,7 +479,7 @@ Clicca sul link per accedere: ${shareUrl}`;
                 <input
                   type="checkbox"
                   checked={item.completato}
-                  onChange={() => handleToggleItem(item.id, item.completato)}
+                  onChange={() => handleToggleItem(item)}
                   className="shopping-item-checkbox"
                 />
                 <div className="shopping-item-details">
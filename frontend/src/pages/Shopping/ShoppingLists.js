@@ -19,7 +19,7 @@ const ShoppingLists = () => {
 
   const loadLists = async () => {
     try {
-      const response = await shoppingAPI.getLists();
+      const response = await shoppingAPI.getListsSummary();
       setLists(response.data);
     } catch (error) {
       console.error('Error loading lists:', error);
@@ -96,7 +96,7 @@ const ShoppingLists = () => {
                   <span className="shopping-list-stat-icon">
                     <ShoppingBagIcon size={18} />
                   </span>
-                  <span>{list.items?.length || 0} articoli</span>
+                  <span>{list.item_count} articoli</span>
                 </div>
               </div>
             </Link>
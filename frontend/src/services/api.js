@@ -54,28 +54,70 @@ export const expensesAPI = {
 
   // Expenses
   createExpense: (data) => api.post('/api/expenses/expenses', data),
-  getExpenses: (groupId) => api.get('/api/expenses/expenses', { params: { group_id: groupId } }),
+  // params: cursor (from the X-Next-Cursor header), limit, tag, paid_by_id, participant_id,
+  // min_importo, max_importo, date_from, date_to
+  getExpenses: (groupId, params = {}) => api.get('/api/expenses/expenses', { params: { group_id: groupId, ...params } }),
+  searchExpenses: (q, params = {}) => api.get('/api/expenses/expenses/search', { params: { q, ...params } }),
   getExpense: (id) => api.get(`/api/expenses/expenses/${id}`),
   updateExpense: (id, data) => api.put(`/api/expenses/expenses/${id}`, data),
   deleteExpense: (id) => api.delete(`/api/expenses/expenses/${id}`),
+  importExpenses: (groupId, file, params = {}) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post(`/api/expenses/groups/${groupId}/expenses/import`, formData, { params });
+  },
+  // Receipts
+  uploadReceipt: (expenseId, file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post(`/api/expenses/expenses/${expenseId}/receipts`, formData);
+  },
+  getReceipts: (expenseId) => api.get(`/api/expenses/expenses/${expenseId}/receipts`),
+  downloadReceipt: (expenseId, receiptId) => api.get(`/api/expenses/expenses/${expenseId}/receipts/${receiptId}`, { responseType: 'blob' }),
+  getReceiptThumbnail: (expenseId, receiptId) => api.get(`/api/expenses/expenses/${expenseId}/receipts/${receiptId}/thumbnail`, { responseType: 'blob' }),
+  deleteReceipt: (expenseId, receiptId) => api.delete(`/api/expenses/expenses/${expenseId}/receipts/${receiptId}`),
+  exportExpenses: (groupId, format = 'csv') => api.get(`/api/expenses/groups/${groupId}/expenses/export`, { params: { format }, responseType: 'blob' }),
 
   // Balances
   getBalances: (groupId) => api.get(`/api/expenses/groups/${groupId}/balances`),
+  getMyBalances: () => api.get('/api/expenses/balances'),
+  getSettlement: (groupId) => api.get(`/api/expenses/groups/${groupId}/settlement`),
+
+  // Recurring expenses
+  getRecurringExpenses: (groupId) => api.get(`/api/expenses/groups/${groupId}/recurring`),
+  createRecurringExpense: (groupId, data) => api.post(`/api/expenses/groups/${groupId}/recurring`, data),
+  updateRecurringExpense: (id, data) => api.put(`/api/expenses/recurring/${id}`, data),
+  deleteRecurringExpense: (id) => api.delete(`/api/expenses/recurring/${id}`),
+
+  // Analytics
+  getGroupAnalytics: (groupId, params = {}) => api.get(`/api/expenses/groups/${groupId}/analytics`, { params }),
+  getMyAnalytics: (params = {}) => api.get('/api/expenses/analytics', { params }),
 };
 
 // Shopping Lists APIs
 export const shoppingAPI = {
   createList: (data) => api.post('/api/shopping-lists/', data),
   getLists: () => api.get('/api/shopping-lists/'),
+  getListsSummary: () => api.get('/api/shopping-lists/summary'),
+  getItemsToBuy: () => api.get('/api/shopping-lists/to-buy'),
+  getItemSuggestions: (q, limit = 8) => api.get('/api/shopping-lists/suggestions', { params: { q, limit } }),
   getList: (id) => api.get(`/api/shopping-lists/${id}`),
+  getListChanges: (id, since = 0, etag) => api.get(`/api/shopping-lists/${id}/changes`, {
+    params: { since },
+    headers: etag ? { 'If-None-Match': etag } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  }),
   getListByToken: (token) => api.get(`/api/shopping-lists/shared/${token}`),
   updateList: (id, data) => api.put(`/api/shopping-lists/${id}`, data),
   deleteList: (id) => api.delete(`/api/shopping-lists/${id}`),
 
   // Items
   createItem: (listId, data) => api.post(`/api/shopping-lists/${listId}/items`, data),
+  applyItemOperations: (listId, operations) => api.post(`/api/shopping-lists/${listId}/items/batch`, { operations }),
+  replayMutations: (listId, mutations) => api.post(`/api/shopping-lists/${listId}/replay`, { mutations }),
   updateItem: (listId, itemId, data) => api.put(`/api/shopping-lists/${listId}/items/${itemId}`, data),
   deleteItem: (listId, itemId) => api.delete(`/api/shopping-lists/${listId}/items/${itemId}`),
+  clearCompletedItems: (listId) => api.delete(`/api/shopping-lists/${listId}/items/completed`),
 };
 
 // Gym APIs